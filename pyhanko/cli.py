@@ -1,22 +1,28 @@
 import click
+import json
 import logging
 import getpass
+import os
+from concurrent import futures
 
-from certvalidator import ValidationContext
 from pyhanko.config import (
     init_validation_context_kwargs, parse_cli_config,
     CLIConfig,
 )
 
 from pyhanko.sign import signers
-from pyhanko.sign.timestamps import HTTPTimeStamper
+from pyhanko.sign.timestamps import (
+    HTTPTimeStamper, MultiTimeStamper, TSAMetadataCache,
+)
 from pyhanko.sign import validation, beid, fields
+from pyhanko.sign.revinfo import (
+    RevocationInfoCache, shared_revinfo_cache, build_validation_context
+)
 from pyhanko.pdf_utils.reader import PdfFileReader
 from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
-from pyhanko.sign.validation import (
-    SignatureValidationError, RevocationInfoValidationType
-)
-from pyhanko.stamp import QRStampStyle
+from pyhanko.sign.validation import RevocationInfoValidationType
+from pyhanko import stamp
+from pyhanko.stamp import QRStampStyle, TextStampStyle
 
 
 __all__ = ['cli']
@@ -39,7 +45,7 @@ DEFAULT_CONFIG_FILE = 'pyhanko.yml'
 
 SIG_META = 'SIG_META'
 EXISTING_ONLY = 'EXISTING_ONLY'
-TIMESTAMP_URL = 'TIMESTAMP_URL'
+TIMESTAMPER = 'TIMESTAMPER'
 CLI_CONFIG = 'CLI_CONFIG'
 STAMP_STYLE = 'STAMP_STYLE'
 QR_URL = 'QR_URL'
@@ -92,7 +98,8 @@ readable_file = click.Path(exists=True, readable=True, dir_okay=False)
 
 # TODO user-friendly error handling for KeyErrors etc.
 def _build_vc_kwargs(ctx, validation_context, trust,
-                     trust_replace, other_certs, allow_fetching=None):
+                     trust_replace, other_certs, revinfo_cache_dir=None,
+                     allow_fetching=None):
     cli_config: CLIConfig = ctx.obj.get(CLI_CONFIG, None)
     if validation_context is not None:
         # load the desired context from config
@@ -115,6 +122,11 @@ def _build_vc_kwargs(ctx, validation_context, trust,
     if allow_fetching is not None:
         result['allow_fetching'] = allow_fetching
 
+    if revinfo_cache_dir is not None:
+        result['revinfo_cache'] = RevocationInfoCache(revinfo_cache_dir)
+    else:
+        result['revinfo_cache'] = shared_revinfo_cache()
+
     return result
 
 
@@ -137,6 +149,32 @@ def trust_options(f):
         '--other-certs', help='other certs relevant for validation',
         required=False, multiple=True, type=readable_file
     )(f)
+    f = click.option(
+        '--revinfo-cache-dir',
+        help='directory to cache OCSP responses and CRLs in',
+        required=False, type=click.Path(file_okay=False)
+    )(f)
+    return f
+
+
+def _build_timestamper(ctx, timestamp_urls, cache_dir=None):
+    if not timestamp_urls:
+        return None
+    cache = TSAMetadataCache(cache_dir) if cache_dir is not None else None
+    if len(timestamp_urls) == 1:
+        return HTTPTimeStamper(timestamp_urls[0], metadata_cache=cache)
+    timestamper = MultiTimeStamper(
+        HTTPTimeStamper(url, metadata_cache=cache) for url in timestamp_urls
+    )
+    ctx.call_on_close(timestamper.close)
+    return timestamper
+
+
+def timestamp_options(f):
+    f = click.option(
+        '--tsa-cache-dir', help='directory to cache TSA metadata in',
+        required=False, type=click.Path(file_okay=False)
+    )(f)
     return f
 
 
@@ -182,17 +220,47 @@ def _select_style(ctx, style_name, qr_url):
               help='Fail trust validation if a certificate has no known CRL '
                    'or OCSP endpoints.',
               type=bool, is_flag=True, default=False, show_default=True)
+@click.option('--workers',
+              help='number of signatures to validate in parallel',
+              type=int, default=1, show_default=True)
+@click.option('--use-processes',
+              help='validate signatures in worker processes instead of '
+                   'threads',
+              type=bool, is_flag=True, default=False, show_default=True)
 @click.pass_context
 def list_sigfields(ctx, infile, skip_status, validate, executive_summary,
                    validation_context, trust, trust_replace, other_certs,
-                   ltv_profile, ltv_obsessive):
+                   revinfo_cache_dir, ltv_profile, ltv_obsessive, workers,
+                   use_processes):
     r = PdfFileReader(infile)
     if validate and ltv_profile is not None:
         ltv_profile = RevocationInfoValidationType(ltv_profile)
 
-    vc_kwargs = _build_vc_kwargs(
-        ctx, validation_context, trust, trust_replace, other_certs
-    )
+    results = {}
+    if validate and not skip_status:
+        vc_kwargs = _build_vc_kwargs(
+            ctx, validation_context, trust, trust_replace, other_certs,
+            revinfo_cache_dir
+        )
+        executor = None
+        if workers > 1:
+            executor_cls = (
+                futures.ProcessPoolExecutor if use_processes
+                else futures.ThreadPoolExecutor
+            )
+            executor = executor_cls(max_workers=workers)
+        try:
+            results = {
+                result.field_name: result
+                for result in validation.validate_all_signatures(
+                    r, vc_kwargs, ltv_profile=ltv_profile,
+                    force_revinfo=ltv_obsessive, executor=executor
+                )
+            }
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
     for name, value, field_ref in fields.enumerate_sig_fields(r):
         if skip_status:
             print(name)
@@ -200,51 +268,105 @@ def list_sigfields(ctx, infile, skip_status, validate, executive_summary,
         status_str = 'EMPTY'
         if value is not None:
             if validate:
-                try:
-                    if ltv_profile is None:
-                        vc = ValidationContext(**vc_kwargs)
-                        status = validation.validate_pdf_signature(
-                            validation.EmbeddedPdfSignature(r, field_ref),
-                            signer_validation_context=vc
-                        )
-                    else:
-                        status = validation.validate_pdf_ltv_signature(
-                            validation.EmbeddedPdfSignature(r, field_ref),
-                            ltv_profile, force_revinfo=ltv_obsessive,
-                            validation_context_kwargs=vc_kwargs
-                        )
-                    if executive_summary:
-                        status_str = (
-                            'VALID' if status.bottom_line else 'INVALID'
-                        )
-                    else:
-                        status_str = status.summary()
-                except validation.ValidationInfoReadingError:
-                    status_str = 'REVINFO_FAILURE'
-                except SignatureValidationError:
-                    status_str = 'INVALID'
-                except ValueError:
-                    status_str = 'MALFORMED'
+                result = results[name]
+                status = result.status
+                if status is None:
+                    status_str = result.error_code
+                elif executive_summary:
+                    status_str = 'VALID' if status.bottom_line else 'INVALID'
+                else:
+                    status_str = status.summary()
             else:
                 status_str = 'FILLED'
         print('%s:%s' % (name, status_str))
 
 
+def _batch_input_paths(infiles, manifest):
+    for path in infiles:
+        if os.path.isdir(path):
+            for dirpath, _, filenames in os.walk(path):
+                for filename in sorted(filenames):
+                    if filename.lower().endswith('.pdf'):
+                        yield os.path.join(dirpath, filename)
+        else:
+            yield path
+    if manifest is not None:
+        for line in manifest:
+            line = line.strip()
+            if line:
+                yield line
+
+
+@signing.command(name='validate-batch',
+                 help='validate signatures in a batch of files, and write '
+                      'a JSON report line for every signature')
+@click.argument('infiles', type=click.Path(exists=True), nargs=-1)
+@click.option('--manifest', help='file listing the files to validate, '
+                                 'one per line',
+              required=False, type=click.File('r'))
+@click.option('--output', help='file to write the report to',
+              type=click.File('w'), default='-', show_default=True)
+@trust_options
+@click.option('--ltv-profile',
+              help='LTV signature validation profile',
+              type=click.Choice(RevocationInfoValidationType.as_tuple()),
+              required=False)
+@click.option('--ltv-obsessive',
+              help='Fail trust validation if a certificate has no known CRL '
+                   'or OCSP endpoints.',
+              type=bool, is_flag=True, default=False, show_default=True)
+@click.option('--workers', help='number of worker processes '
+                                '[default: number of processors]',
+              type=int, required=False)
+@click.option('--max-pending',
+              help='maximal number of files queued for validation '
+                   '[default: twice the number of workers]',
+              type=int, required=False)
+@click.option('--fail-fast', help='stop after the first failure',
+              type=bool, is_flag=True, default=False, show_default=True)
+@click.pass_context
+def validate_batch(ctx, infiles, manifest, output, validation_context, trust,
+                   trust_replace, other_certs, revinfo_cache_dir, ltv_profile,
+                   ltv_obsessive, workers, max_pending, fail_fast):
+    if ltv_profile is not None:
+        ltv_profile = RevocationInfoValidationType(ltv_profile)
+    vc_kwargs = _build_vc_kwargs(
+        ctx, validation_context, trust, trust_replace, other_certs,
+        revinfo_cache_dir
+    )
+    reports = validation.validate_documents(
+        _batch_input_paths(infiles, manifest), vc_kwargs,
+        ltv_profile=ltv_profile, force_revinfo=ltv_obsessive,
+        max_workers=workers, max_pending=max_pending, fail_fast=fail_fast
+    )
+    all_ok = True
+    for report in reports:
+        all_ok &= report.bottom_line
+        for record in report.as_json_records():
+            output.write(json.dumps(record) + '\n')
+        output.flush()
+    if not all_ok:
+        ctx.exit(1)
+
+
 @signing.command(name='ltaupdate', help='update LTA timestamp')
 @click.argument('infile', type=click.File('r+b'))
-@click.option('--timestamp-url', help='URL for timestamp server',
-              required=False, type=str, default=None)
+@click.option('--timestamp-url', help='URL for timestamp server (multiple '
+                                      'allowed, in order of preference)',
+              required=True, type=str, multiple=True)
+@timestamp_options
 @trust_options
 @click.pass_context
 def lta_update(ctx, infile, validation_context, trust, trust_replace,
-               other_certs, timestamp_url):
+               other_certs, revinfo_cache_dir, timestamp_url, tsa_cache_dir):
     vc_kwargs = _build_vc_kwargs(
-        ctx, validation_context, trust, trust_replace, other_certs
+        ctx, validation_context, trust, trust_replace, other_certs,
+        revinfo_cache_dir
     )
-    timestamper = HTTPTimeStamper(timestamp_url)
+    timestamper = _build_timestamper(ctx, timestamp_url, tsa_cache_dir)
     r = PdfFileReader(infile)
     signers.PdfTimestamper(timestamper).update_archival_timestamp_chain(
-        r, ValidationContext(**vc_kwargs)
+        r, build_validation_context(vc_kwargs)
     )
 
 
@@ -258,8 +380,10 @@ def lta_update(ctx, infile, validation_context, trust, trust_replace,
 @click.option('--existing-only', help='never create signature fields', 
               required=False, default=False, is_flag=True, type=bool, 
               show_default=True)
-@click.option('--timestamp-url', help='URL for timestamp server',
-              required=False, type=str, default=None)
+@click.option('--timestamp-url', help='URL for timestamp server (multiple '
+                                      'allowed, in order of preference)',
+              required=False, type=str, multiple=True)
+@timestamp_options
 @click.option('--use-pades', help='sign PAdES-style [level B/B-T/B-LT]',
               required=False, default=False, is_flag=True, type=bool,
               show_default=True)
@@ -277,11 +401,13 @@ def lta_update(ctx, infile, validation_context, trust, trust_replace,
 @trust_options
 @click.pass_context
 def addsig(ctx, field, name, reason, location, certify, existing_only,
-           timestamp_url, use_pades, with_validation_info,
+           timestamp_url, tsa_cache_dir, use_pades, with_validation_info,
            validation_context, trust_replace, trust, other_certs,
-           style_name, qr_url):
+           revinfo_cache_dir, style_name, qr_url):
     ctx.obj[EXISTING_ONLY] = existing_only or field is None
-    ctx.obj[TIMESTAMP_URL] = timestamp_url
+    ctx.obj[TIMESTAMPER] = _build_timestamper(
+        ctx, timestamp_url, tsa_cache_dir
+    )
 
     if use_pades:
         subfilter = fields.SigSeedSubFilter.PADES
@@ -291,9 +417,9 @@ def addsig(ctx, field, name, reason, location, certify, existing_only,
     if with_validation_info:
         vc_kwargs = _build_vc_kwargs(
             ctx, validation_context, trust, trust_replace, other_certs,
-            allow_fetching=True
+            revinfo_cache_dir, allow_fetching=True
         )
-        vc = ValidationContext(**vc_kwargs)
+        vc = build_validation_context(vc_kwargs)
     else:
         vc = None
     ctx.obj[SIG_META] = signers.PdfSignatureMetadata(
@@ -307,12 +433,8 @@ def addsig(ctx, field, name, reason, location, certify, existing_only,
 
 
 def addsig_simple_signer(signer: signers.SimpleSigner, infile, outfile,
-                         timestamp_url, signature_meta, existing_fields_only,
+                         timestamper, signature_meta, existing_fields_only,
                          style, qr_url):
-    if timestamp_url is not None:
-        timestamper = HTTPTimeStamper(timestamp_url)
-    else:
-        timestamper = None
     writer = IncrementalPdfFileWriter(infile)
 
     # TODO make this an option higher up the tree
@@ -356,7 +478,7 @@ def addsig_simple_signer(signer: signers.SimpleSigner, infile, outfile,
 def addsig_pemder(ctx, infile, outfile, key, cert, chain, passfile):
     signature_meta = ctx.obj[SIG_META]
     existing_fields_only = ctx.obj[EXISTING_ONLY]
-    timestamp_url = ctx.obj[TIMESTAMP_URL]
+    timestamper = ctx.obj[TIMESTAMPER]
 
     if passfile is None:
         passphrase = getpass.getpass(prompt='Key passphrase: ').encode('utf-8')
@@ -369,7 +491,7 @@ def addsig_pemder(ctx, infile, outfile, key, cert, chain, passfile):
         ca_chain_files=chain
     )
     return addsig_simple_signer(
-        signer, infile, outfile, timestamp_url=timestamp_url,
+        signer, infile, outfile, timestamper=timestamper,
         signature_meta=signature_meta,
         existing_fields_only=existing_fields_only, style=ctx.obj[STAMP_STYLE],
         qr_url=ctx.obj[STAMP_STYLE]
@@ -395,7 +517,7 @@ def addsig_pkcs12(ctx, infile, outfile, pfx, chain, passfile):
     #  user-friendly)
     signature_meta = ctx.obj[SIG_META]
     existing_fields_only = ctx.obj[EXISTING_ONLY]
-    timestamp_url = ctx.obj[TIMESTAMP_URL]
+    timestamper = ctx.obj[TIMESTAMPER]
 
     if passfile is None:
         passphrase = getpass.getpass(prompt='Export passphrase: ')\
@@ -408,7 +530,7 @@ def addsig_pkcs12(ctx, infile, outfile, pfx, chain, passfile):
         pfx_file=pfx, passphrase=passphrase, ca_chain_files=chain
     )
     return addsig_simple_signer(
-        signer, infile, outfile, timestamp_url=timestamp_url,
+        signer, infile, outfile, timestamper=timestamper,
         signature_meta=signature_meta,
         existing_fields_only=existing_fields_only, style=ctx.obj[STAMP_STYLE],
         qr_url=ctx.obj[QR_URL]
@@ -429,13 +551,9 @@ def addsig_pkcs12(ctx, infile, outfile, pfx, chain, passfile):
 def addsig_beid(ctx, infile, outfile, lib, use_auth_cert, slot_no):
     signature_meta = ctx.obj[SIG_META]
     existing_fields_only = ctx.obj[EXISTING_ONLY]
-    timestamp_url = ctx.obj[TIMESTAMP_URL]
+    timestamper = ctx.obj[TIMESTAMPER]
     session = beid.open_beid_session(lib, slot_no=slot_no)
     label = 'Authentication' if use_auth_cert else 'Signature'
-    if timestamp_url is not None:
-        timestamper = HTTPTimeStamper(timestamp_url)
-    else:
-        timestamper = None
     signer = beid.BEIDSigner(
         session, label
     )
@@ -490,3 +608,84 @@ def add_sig_field(infile, outfile, specs):
     writer.write(outfile)
     infile.close()
     outfile.close()
+
+
+def _parse_page_ranges(spec, page_count):
+    # parse a (one-indexed) page range specification of the form
+    # 1-3,5,8- into a list of page indices
+    if not spec:
+        return list(range(page_count))
+    result = []
+    for part in spec.split(','):
+        start, sep, end = part.strip().partition('-')
+        try:
+            start = int(start) if start else 1
+            end = (int(end) if end else page_count) if sep else start
+        except ValueError:
+            raise click.ClickException(
+                f"Could not parse page range '{part}'."
+            )
+        if not (1 <= start <= end <= page_count):
+            raise click.ClickException(
+                f"Page range '{part}' is out of bounds; the document has "
+                f"{page_count} pages."
+            )
+        result.extend(range(start - 1, end))
+    return result
+
+
+@cli.command(help='stamp PDF files', name='stamp')
+@click.argument('infile', type=click.File('rb'))
+@click.argument('outfile', type=click.File('wb'))
+@click.argument('x', type=int)
+@click.argument('y', type=int)
+@click.option(
+    '--pages', help='pages to stamp, e.g. 1-3,5,8- [default: all pages]',
+    required=False, type=str
+)
+@click.option('--style-name', help='stamp style name', required=False,
+              type=str)
+@click.option('--qr-url', help='QR code URL to use in QR stamp style',
+              required=False, type=str)
+@click.option('--text-param', help='text parameter for the stamp, '
+                                   'as KEY=VALUE (multiple allowed)',
+              required=False, type=str, multiple=True)
+@click.option('--number-from',
+              help='number the stamped pages starting from this value; '
+                   'the number is available as the text parameter n',
+              required=False, type=int)
+@click.pass_context
+def add_stamps(ctx, infile, outfile, x, y, pages, style_name, qr_url,
+               text_param, number_from):
+    style = _select_style(ctx, style_name, qr_url)
+    if style is None:
+        style = QRStampStyle() if qr_url else TextStampStyle()
+
+    text_params = {}
+    for param in text_param:
+        key, sep, value = param.partition('=')
+        if not sep:
+            raise click.ClickException(
+                "Text parameters should be of the form KEY=VALUE."
+            )
+        text_params[key] = value
+
+    writer = IncrementalPdfFileWriter(infile)
+    page_count = writer.root['/Pages']['/Count']
+    page_ixs = _parse_page_ranges(pages, page_count)
+    if number_from is None:
+        placements = [
+            stamp.StampPlacement(page_ix, x, y) for page_ix in page_ixs
+        ]
+    else:
+        placements = [
+            stamp.StampPlacement(
+                page_ix, x, y, text_params={'n': number_from + ix}
+            ) for ix, page_ix in enumerate(page_ixs)
+        ]
+    stamp.stamp_pages(
+        writer, style, placements, url=qr_url, text_params=text_params
+    )
+    writer.write(outfile)
+    infile.close()
+    outfile.close()
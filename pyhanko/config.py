@@ -3,9 +3,9 @@ from typing import Dict
 from dataclasses import dataclass
 
 import yaml
-from certvalidator import ValidationContext
 from pyhanko.misc import check_config_keys, ConfigurationError
 from pyhanko.sign import signers
+from pyhanko.sign.revinfo import build_validation_context
 
 
 # TODO add stamp styles etc.
@@ -28,7 +28,7 @@ class CLIConfig:
         vc_kwargs = parse_trust_config(
             self.validation_contexts[name], self.time_tolerance
         )
-        return vc_kwargs if as_dict else ValidationContext(**vc_kwargs)
+        return vc_kwargs if as_dict else build_validation_context(vc_kwargs)
 
     def get_stamp_style(self, name=None) -> TextStampStyle:
         name = name or self.default_stamp_style
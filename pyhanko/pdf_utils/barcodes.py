@@ -1,8 +1,14 @@
+from functools import lru_cache
+from typing import NamedTuple, Iterator, Tuple
+
+import qrcode
 from qrcode.image.base import BaseImage
 import barcode
 from barcode.writer import BaseWriter
 
+from pyhanko.pdf_utils import generic
 from pyhanko.pdf_utils.content import PdfContent
+from pyhanko.pdf_utils.generic import pdf_name
 from pyhanko.pdf_utils.misc import rd, BoxConstraints
 
 
@@ -21,23 +27,141 @@ class PdfStreamQRImage(BaseImage):
     def drawrect(self, row, col):
         self._img.append((row, col))
 
+    def module_rectangles(self) -> Iterator[Tuple[int, int, int, int]]:
+        """
+        Cover the dark modules with rectangles.
+        Adjacent dark modules in the same row are merged into runs, and
+        identical runs in consecutive rows are merged into a single
+        rectangle.
+
+        :return:
+            An iterator of ``(row, col, rows, cols)`` tuples, in module
+            units.
+        """
+        by_row = {}
+        for row, col in self._img:
+            by_row.setdefault(row, []).append(col)
+
+        # open rectangles, indexed by (first col, last col + 1)
+        open_rects = {}
+        prev_row = None
+        for row in sorted(by_row):
+            runs = []
+            cols = sorted(by_row[row])
+            start = prev = cols[0]
+            for col in cols[1:]:
+                if col != prev + 1:
+                    runs.append((start, prev + 1))
+                    start = col
+                prev = col
+            runs.append((start, prev + 1))
+
+            contiguous = prev_row is not None and row == prev_row + 1
+            still_open = {}
+            for run in runs:
+                start_row = open_rects.pop(run, None) if contiguous else None
+                still_open[run] = row if start_row is None else start_row
+            # everything that wasn't extended is finished
+            for (c0, c1), start_row in open_rects.items():
+                yield start_row, c0, prev_row + 1 - start_row, c1 - c0
+            open_rects = still_open
+            prev_row = row
+        for (c0, c1), start_row in open_rects.items():
+            yield start_row, c0, prev_row + 1 - start_row, c1 - c0
+
     def render_command_stream(self):
         # start a command stream with fill colour set to black
         command_stream = ['0 0 0 rg']
-        for row, col in self._img:
+        box_size = self.box_size
+        for row, col, rows, cols in self.module_rectangles():
             (x, y), _ = self.pixel_box(row, col)
-            # paint a rectangle
             command_stream.append(
-                '%g %g %g %g re f' % (
-                    rd(x), rd(y), rd(self.box_size), rd(self.box_size)
+                '%g %g %g %g re' % (
+                    rd(x), rd(y), rd(cols * box_size), rd(rows * box_size)
                 )
             )
+        # fill all rectangles in one go
+        command_stream.append('f')
         return ' '.join(command_stream).encode('ascii')
 
+    def render_image_mask(self) -> generic.StreamObject:
+        """
+        Render the QR code as a 1-bit image mask, with one sample per
+        module (including the quiet zone).
+        The image mask paints the dark modules in the current fill colour.
+
+        :return:
+            An image XObject.
+        """
+        size = self.width + 2 * self.border
+        row_bytes = (size + 7) // 8
+        # 0 bits are painted, so start with an image that's entirely blank
+        data = bytearray(b'\xff' * (row_bytes * size))
+        border = self.border
+        for row, col in self._img:
+            x = col + border
+            data[(row + border) * row_bytes + x // 8] &= ~(0x80 >> (x % 8))
+        img = generic.StreamObject({
+            pdf_name('/Type'): pdf_name('/XObject'),
+            pdf_name('/Subtype'): pdf_name('/Image'),
+            pdf_name('/Width'): generic.NumberObject(size),
+            pdf_name('/Height'): generic.NumberObject(size),
+            pdf_name('/ImageMask'): generic.BooleanObject(True),
+            pdf_name('/BitsPerComponent'): generic.NumberObject(1),
+        }, stream_data=bytes(data))
+        img.compress()
+        return img
+
     def save(self, stream, kind=None):
         stream.write(self.render_command_stream())
 
 
+class RenderedQR(NamedTuple):
+    """
+    A QR code rendered to PDF graphics operators.
+    """
+
+    command_stream: bytes
+    """
+    Graphics operators painting the dark modules.
+    The origin is in the top left corner of the code, and the y-axis
+    points downwards.
+    """
+
+    bbox_size: int
+    """
+    Width and height of the code, including the quiet zone.
+    """
+
+
+@lru_cache(maxsize=256)
+def render_qr(data: str, error_correction=qrcode.constants.ERROR_CORRECT_M,
+              box_size=10, border=4) -> RenderedQR:
+    """
+    Render a QR code as a PDF command stream.
+    The result is cached, so encoding the same data repeatedly is cheap.
+
+    :param data:
+        The data to encode.
+    :param error_correction:
+        The error correction level, as defined in :mod:`qrcode.constants`.
+    :param box_size:
+        The size of a module, in user units.
+    :param border:
+        The width of the quiet zone, in modules.
+    :return:
+        A :class:`.RenderedQR` object.
+    """
+    qr = qrcode.QRCode(
+        error_correction=error_correction, box_size=box_size, border=border
+    )
+    qr.add_data(data)
+    qr.make()
+    img = qr.make_image(image_factory=PdfStreamQRImage)
+    bbox_size = (qr.modules_count + 2 * qr.border) * qr.box_size
+    return RenderedQR(img.render_command_stream(), bbox_size)
+
+
 def barcode_colour_to_pdf(colour) -> bytes:
     # TODO there has to be an index of common colour names somewhere, use
     #  that instead.
@@ -73,21 +197,50 @@ class PdfStreamBarcodeWriter(BaseWriter):
             self, self._init, self._paint_module, dummy, self._finish
         )
         self._command_stream = None
+        self._pending_module = None
+        self._current_colour = None
 
     def _init(self, code):
         self.size = self.calculate_size(len(code[0]), len(code), PDF_UUPI)
         self._command_stream = [b'q']
+        self._pending_module = None
+        self._current_colour = None
 
     def _paint_module(self, xpos, ypos, width, color):
+        # merge adjacent modules of the same colour and height into a single
+        # bar (python-barcode varies module_height between modules, e.g. for
+        # the guard bars in EAN codes)
+        height = self.module_height
+        pending = self._pending_module
+        if pending is not None:
+            p_xpos, p_ypos, p_width, p_height, p_color = pending
+            if p_ypos == ypos and p_color == color and p_height == height \
+                    and abs(p_xpos + p_width - xpos) < 1e-6:
+                self._pending_module = (
+                    p_xpos, p_ypos, p_width + width, height, color
+                )
+                return
+            self._flush_module()
+        self._pending_module = (xpos, ypos, width, height, color)
+
+    def _flush_module(self):
+        pending = self._pending_module
+        if pending is None:
+            return
+        xpos, ypos, width, height, color = pending
+        colour = barcode_colour_to_pdf(color)
+        if colour != self._current_colour:
+            self._command_stream.append(b'%s rg' % colour)
+            self._current_colour = colour
         self._command_stream.append(
-            b'%s rg %g %g %g %g re f' % (
-                barcode_colour_to_pdf(color),
-                mm2uu(xpos), mm2uu(ypos), mm2uu(width),
-                mm2uu(self.module_height)
+            b'%g %g %g %g re f' % (
+                mm2uu(xpos), mm2uu(ypos), mm2uu(width), mm2uu(height)
             )
         )
+        self._pending_module = None
 
     def _finish(self) -> bytes:
+        self._flush_module()
         self._command_stream.append(b'Q')
         return self.command_stream
 
@@ -103,6 +256,14 @@ class PdfStreamBarcodeWriter(BaseWriter):
         pass
 
 
+@lru_cache(maxsize=256)
+def _render_barcode(barcode_type, code):
+    writer = PdfStreamBarcodeWriter()
+    b = barcode.get_barcode(barcode_type, code=code, writer=writer)
+    commands = b.render()
+    return commands, writer.size
+
+
 class BarcodeBox(PdfContent):
     """
     Thin wrapper around python-barcode functionality.
@@ -113,16 +274,10 @@ class BarcodeBox(PdfContent):
         self.barcode_type = barcode_type
         self.code = code
 
-        writer = PdfStreamBarcodeWriter()
-
         # render everything here, since we need part of the rendering
         # operation's results to determine the box parameters to pass to
         # the parent
-        b = barcode.get_barcode(
-            self.barcode_type, code=code, writer=writer
-        )
-        self._barcode_commands = b.render()
-        (w, h) = writer.size
+        self._barcode_commands, (w, h) = _render_barcode(barcode_type, code)
         super().__init__(box=BoxConstraints(width=w, height=h))
 
     def render(self) -> bytes:
@@ -13,12 +13,85 @@ import struct
 import zlib
 
 __all__ = [
-    'Decoder', 'ASCII85Decode', 'ASCIIHexDecode', 'FlateDecode', 'DECODERS'
+    'Decoder', 'ASCII85Decode', 'ASCIIHexDecode', 'FlateDecode', 'DECODERS',
+    'flate_compress', 'DEFAULT_FLATE_CHUNK_SIZE'
 ]
 
 decompress = zlib.decompress
 compress = zlib.compress
 
+DEFAULT_FLATE_CHUNK_SIZE = 1024 * 1024
+"""
+Default chunk size for Flate compression of large streams in parallel.
+"""
+
+# size of the deflate window; chunks are primed with this much data
+# from the end of the previous chunk
+_DEFLATE_WINDOW = 32 * 1024
+
+
+def _deflate_chunk(data, level, strategy, zdict, final):
+    # produce a raw deflate stream, primed with the tail of the previous chunk
+    # (if any). Non-final chunks are sync-flushed, which guarantees that they
+    # end on a byte boundary without an end-of-stream marker, so the
+    # results can simply be concatenated.
+    kwargs = {'zdict': zdict} if zdict else {}
+    compressor = zlib.compressobj(
+        level, zlib.DEFLATED, -zlib.MAX_WBITS, 8, strategy, **kwargs
+    )
+    flush_mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+    return compressor.compress(data) + compressor.flush(flush_mode)
+
+
+def flate_compress(data, level=None, strategy=None, chunk_map=None,
+                   chunk_size=DEFAULT_FLATE_CHUNK_SIZE) -> bytes:
+    """
+    Compress data into a zlib stream.
+
+    :param data:
+        The data to compress.
+    :param level:
+        The zlib compression level. If ``None``, use zlib's default.
+    :param strategy:
+        The zlib compression strategy. If ``None``, use zlib's default.
+    :param chunk_map:
+        A function with the signature of :func:`map`
+        (e.g. :meth:`concurrent.futures.Executor.map`).
+        If specified, and the data is larger than `chunk_size`, the input
+        will be divided into chunks that are compressed separately through
+        `chunk_map`, and then combined into a single zlib stream.
+        Since zlib releases the GIL, this allows large streams to be
+        compressed in parallel.
+    :param chunk_size:
+        The chunk size to use when compressing in chunks.
+    :return:
+        The compressed data.
+    """
+    if level is None:
+        level = zlib.Z_DEFAULT_COMPRESSION
+    if strategy is None:
+        strategy = zlib.Z_DEFAULT_STRATEGY
+    data = memoryview(data)
+    if chunk_map is None or len(data) <= chunk_size:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS,
+                                      8, strategy)
+        return compressor.compress(data) + compressor.flush()
+
+    chunk_starts = range(0, len(data), chunk_size)
+    last_start = chunk_starts[-1]
+
+    def _compress_chunk(start):
+        zdict = data[max(0, start - _DEFLATE_WINDOW):start]
+        return _deflate_chunk(
+            data[start:start + chunk_size], level, strategy,
+            zdict=zdict, final=start == last_start
+        )
+
+    deflated = b''.join(chunk_map(_compress_chunk, chunk_starts))
+    # zlib header (deflate with a 32K window, no preset dictionary) +
+    # the raw deflate data + the Adler-32 checksum of the entire input
+    return b'\x78\x9c' + deflated + struct.pack('>I', zlib.adler32(data))
+
 
 class Decoder:
 
@@ -31,11 +104,27 @@ class Decoder:
         raise NotImplementedError
 
 
-def _png_decode(data: memoryview, columns):
+def _paeth(left, up, up_left):
+    p = left + up - up_left
+    pa = abs(p - left)
+    pb = abs(p - up)
+    pc = abs(p - up_left)
+    if pa <= pb and pa <= pc:
+        return left
+    elif pb <= pc:
+        return up
+    else:
+        return up_left
+
+
+def _png_decode(data: memoryview, columns, colors=1, bits_per_component=8):
 
     output = BytesIO()
     # PNG prediction can vary from row to row
-    rowlength = columns + 1
+    bits_per_pixel = colors * bits_per_component
+    rowlength = (columns * bits_per_pixel + 7) // 8 + 1
+    # filters operate on bytes, with an offset of (at least) one pixel
+    bpp = max(1, bits_per_pixel // 8)
     assert len(data) % rowlength == 0
 
     prev_result = bytes(rowlength - 1)
@@ -44,16 +133,31 @@ def _png_decode(data: memoryview, columns):
         filter_byte = rowdata[0]
         result_row = bytearray(rowlength - 1)
         if filter_byte == 0:
-            pass
+            result_row[:] = rowdata[1:]
         elif filter_byte == 1:
-            pairs = zip(rowdata[2:], rowdata[1:])
-            result_row[0] = rowdata[1]
-            for i, (x, y) in enumerate(pairs):
-                result_row[i + 1] = (x + y) % 256
+            result_row[:bpp] = rowdata[1:bpp + 1]
+            for i in range(bpp, rowlength - 1):
+                result_row[i] = (rowdata[i + 1] + result_row[i - bpp]) % 256
         elif filter_byte == 2:
             pairs = zip(rowdata[1:], prev_result)
             for i, (x, y) in enumerate(pairs):
                 result_row[i] = (x + y) % 256
+        elif filter_byte == 3:
+            for i in range(rowlength - 1):
+                left = result_row[i - bpp] if i >= bpp else 0
+                result_row[i] = (
+                    rowdata[i + 1] + (left + prev_result[i]) // 2
+                ) % 256
+        elif filter_byte == 4:
+            for i in range(rowlength - 1):
+                if i >= bpp:
+                    left = result_row[i - bpp]
+                    up_left = prev_result[i - bpp]
+                else:
+                    left = up_left = 0
+                result_row[i] = (
+                    rowdata[i + 1] + _paeth(left, prev_result[i], up_left)
+                ) % 256
         else:
             # unsupported PNG filter
             raise PdfReadError(
@@ -64,6 +168,50 @@ def _png_decode(data: memoryview, columns):
     return output.getvalue()
 
 
+def _png_encode(data: memoryview, columns, predictor, colors=1,
+                bits_per_component=8):
+    # only the predictors that _png_decode knows how to undo are supported
+    if predictor == 10:
+        filter_byte = 0
+    elif predictor == 11:
+        filter_byte = 1
+    elif predictor in (12, 15):
+        # for "optimum", we always choose the Up predictor, which tends to
+        # work very well for tabular data (such as XRef streams)
+        filter_byte = 2
+    else:
+        raise PdfStreamError(
+            "Unsupported PNG predictor %r" % predictor
+        )
+    # same row layout as in _png_decode
+    bits_per_pixel = colors * bits_per_component
+    rowlength = (columns * bits_per_pixel + 7) // 8
+    bpp = max(1, bits_per_pixel // 8)
+    if len(data) % rowlength:
+        raise PdfStreamError(
+            "Data length must be a multiple of the row length"
+        )
+
+    output = BytesIO()
+    prev_row = bytes(rowlength)
+    for row in range(len(data) // rowlength):
+        row_data = data[(row * rowlength):((row + 1) * rowlength)]
+        if filter_byte == 0:
+            result_row = row_data
+        elif filter_byte == 1:
+            result_row = bytearray(row_data)
+            for i in range(bpp, rowlength):
+                result_row[i] = (row_data[i] - row_data[i - bpp]) % 256
+        else:
+            result_row = bytes(
+                (x - y) % 256 for x, y in zip(row_data, prev_row)
+            )
+        prev_row = row_data
+        output.write(bytes((filter_byte,)))
+        output.write(result_row)
+    return output.getvalue()
+
+
 class FlateDecode(Decoder):
 
     @classmethod
@@ -84,7 +232,10 @@ class FlateDecode(Decoder):
         columns = decode_params["/Columns"]
         # PNG prediction:
         if 10 <= predictor <= 15:
-            return _png_decode(data, columns)
+            return _png_decode(
+                data, columns, colors=decode_params.get('/Colors', 1),
+                bits_per_component=decode_params.get('/BitsPerComponent', 8)
+            )
         else:
             # unsupported predictor
             raise PdfReadError(
@@ -92,9 +243,30 @@ class FlateDecode(Decoder):
             )
 
     @classmethod
-    def encode(cls, data, decode_params=None):
-        # TODO support the parameters in the spec
-        return compress(data)
+    def encode(cls, data, decode_params=None, level=None, strategy=None,
+               chunk_map=None, chunk_size=DEFAULT_FLATE_CHUNK_SIZE):
+        """
+        Compress data. See :func:`flate_compress` for the meaning of
+        the keyword arguments.
+        """
+        # TODO support the other parameters in the spec
+        predictor = 1
+        if decode_params:
+            predictor = decode_params.get("/Predictor", 1)
+        if predictor != 1:
+            if not 10 <= predictor <= 15:
+                raise PdfStreamError(
+                    "Unsupported flatedecode predictor %r" % predictor
+                )
+            data = _png_encode(
+                memoryview(data), decode_params["/Columns"], predictor,
+                colors=decode_params.get('/Colors', 1),
+                bits_per_component=decode_params.get('/BitsPerComponent', 8)
+            )
+        return flate_compress(
+            data, level=level, strategy=strategy, chunk_map=chunk_map,
+            chunk_size=chunk_size
+        )
 
 
 # TODO check boundary conditions in PDF spec
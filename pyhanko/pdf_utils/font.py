@@ -1,5 +1,16 @@
+import base64
+import copy
+import hashlib
+import json
 import logging
+import os
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
 from io import BytesIO
+from typing import Dict, Optional, Tuple, Union
 
 from pyhanko.pdf_utils import generic
 from fontTools import ttLib, subset
@@ -30,6 +41,16 @@ class FontEngine:
     def render_and_measure(self, txt):
         return self.render(txt), self.measure(txt)
 
+    @property
+    def metrics_key(self):
+        """
+        Hashable value identifying the metrics used by this font engine,
+        for caching purposes. Font engines with the same metrics key must
+        measure text identically.
+        ``None`` means that measurements shouldn't be cached.
+        """
+        return None
+
     def as_resource(self):
         raise NotImplementedError
 
@@ -51,6 +72,17 @@ class SimpleFontEngine(FontEngine):
     def measure(self, txt):
         return len(txt) * self.avg_width
 
+    @property
+    def metrics_key(self):
+        return SimpleFontEngine, self.name, self.avg_width
+
+    def __eq__(self, other):
+        return isinstance(other, SimpleFontEngine) \
+            and self.metrics_key == other.metrics_key
+
+    def __hash__(self):
+        return hash(self.metrics_key)
+
     def as_resource(self):
         # assume that self.font is the name of a PDF standard font
         # TODO enforce that
@@ -63,51 +95,597 @@ class SimpleFontEngine(FontEngine):
         return font_dict
 
 
-class GlyphAccumulator(FontEngine):
+def _font_file_bytes(tt: ttLib.TTFont) -> bytes:
+    reader = tt.reader
+    if reader is not None and not getattr(reader, 'numFonts', 1) > 1:
+        f = reader.file
+        f.seek(0)
+        return f.read()
+    # font collections, fonts constructed in memory, ...
+    buf = BytesIO()
+    tt.save(buf)
+    return buf.getvalue()
+
+
+def _subset_options_key(options: subset.Options):
+    # deterministic representation of the subsetter options
+    def _normalise(v):
+        if isinstance(v, (set, frozenset)):
+            return sorted(v, key=repr)
+        return v
+    return repr(sorted(
+        (k, _normalise(v)) for k, v in vars(options).items()
+    ))
+
+
+def _font_metrics(tt: ttLib.TTFont) -> dict:
+    hhea = tt['hhea']
+    head = tt['head']
+    os2 = tt['OS/2']
+    weight = os2.usWeightClass
+    return {
+        'ascent': hhea.ascent, 'descent': hhea.descent,
+        'bbox': [head.xMin, head.yMin, head.xMax, head.yMax],
+        'stemv': int(10 + 220 * (weight - 50) / 900),
+        'italic_angle': tt['post'].italicAngle,
+        'cap_height': os2.sCapHeight
+    }
+
+
+def _font_descriptor_entries(ps_name, metrics: dict) -> dict:
+    return {
+        pdf_name('/Type'): pdf_name('/FontDescriptor'),
+        pdf_name('/FontName'): pdf_name('/' + ps_name),
+        pdf_name('/Ascent'): generic.NumberObject(metrics['ascent']),
+        pdf_name('/Descent'): generic.NumberObject(metrics['descent']),
+        pdf_name('/FontBBox'): generic.ArrayObject(
+            map(generic.NumberObject, metrics['bbox'])
+        ),
+        # FIXME I'm setting the Serif and Symbolic flags here, but
+        #  is there any way we can read/infer those from the TTF metadata?
+        pdf_name('/Flags'): generic.NumberObject(0b110),
+        pdf_name('/StemV'): generic.NumberObject(metrics['stemv']),
+        pdf_name('/ItalicAngle'): generic.FloatObject(
+            metrics['italic_angle']
+        ),
+        pdf_name('/CapHeight'): generic.NumberObject(metrics['cap_height'])
+    }
+
+
+@dataclass(frozen=True)
+class FontSubset:
+    """
+    Ready-to-embed data for a subsetted CID-keyed font.
+    Instances are produced by :meth:`GlyphAccumulator.extract_subset`,
+    and stored in a :class:`FontSubsetCache`.
+    """
+
+    key: str
+    """
+    Cache key of the subset.
+    """
+
+    ps_name: str
+    """
+    PostScript name of the font (without subset prefix).
+    """
+
+    ros: Tuple[str, str, int]
+    """
+    Registry, ordering and supplement of the font's character collection.
+    """
+
+    font_program: bytes
+    """
+    The compiled CFF table of the subset.
+    """
+
+    metrics: dict
+    """
+    Font metrics for use in the font descriptor.
+    """
+
+    widths: list
+    """
+    Value of the /W entry, as a list alternating between initial CIDs and
+    lists of glyph widths.
+    """
+
+    to_unicode: bytes
+    """
+    The ToUnicode CMap of the subset.
+    """
+
+    def as_json(self) -> dict:
+        return {
+            'key': self.key, 'ps_name': self.ps_name, 'ros': list(self.ros),
+            'font_program':
+                base64.b64encode(self.font_program).decode('ascii'),
+            'metrics': self.metrics, 'widths': self.widths,
+            'to_unicode': base64.b64encode(self.to_unicode).decode('ascii'),
+        }
+
+    @classmethod
+    def from_json(cls, entry: dict) -> 'FontSubset':
+        return FontSubset(
+            key=entry['key'], ps_name=entry['ps_name'],
+            ros=tuple(entry['ros']),
+            font_program=base64.b64decode(entry['font_program']),
+            metrics=entry['metrics'], widths=entry['widths'],
+            to_unicode=base64.b64decode(entry['to_unicode'])
+        )
+
+    def embed(self, writer: IncrementalPdfFileWriter, obj_stream=None):
+        """
+        Embed this subset into a PDF file as a Type0 font.
+
+        :return:
+            A reference to the Type0 font dictionary.
+        """
+        registry, ordering, supplement = self.ros
+        font_stream = generic.StreamObject({
+            # this is a Type0 CFF font program (see Table 126 in ISO 32000)
+            pdf_name('/Subtype'): pdf_name('/CIDFontType0C'),
+        }, stream_data=self.font_program)
+        font_stream.compress()
+        fd = generic.DictionaryObject(
+            _font_descriptor_entries(self.ps_name, self.metrics)
+        )
+        fd[pdf_name('/FontFile3')] = writer.add_object(font_stream)
+
+        def _widths():
+            for item in self.widths:
+                if isinstance(item, list):
+                    yield generic.ArrayObject(map(generic.NumberObject, item))
+                else:
+                    yield generic.NumberObject(item)
+
+        cidfont_obj = generic.DictionaryObject({
+            pdf_name('/Type'): pdf_name('/Font'),
+            pdf_name('/Subtype'): pdf_name('/CIDFontType0'),
+            pdf_name('/CIDSystemInfo'): generic.DictionaryObject({
+                pdf_name('/Registry'): pdf_string(registry),
+                pdf_name('/Ordering'): pdf_string(ordering),
+                pdf_name('/Supplement'): generic.NumberObject(supplement)
+            }),
+            pdf_name('/BaseFont'): pdf_name('/' + self.ps_name),
+            pdf_name('/FontDescriptor'): writer.add_object(
+                fd, obj_stream=obj_stream
+            ),
+            pdf_name('/W'): generic.ArrayObject(_widths())
+        })
+        to_unicode = generic.StreamObject(stream_data=self.to_unicode)
+        to_unicode.compress()
+        type0 = generic.DictionaryObject({
+            pdf_name('/Type'): pdf_name('/Font'),
+            pdf_name('/Subtype'): pdf_name('/Type0'),
+            pdf_name('/DescendantFonts'): generic.ArrayObject(
+                [writer.add_object(cidfont_obj)]
+            ),
+            # take the Identity-H encoding to inherit from the /Encoding
+            # entry specified in our CIDSystemInfo dict
+            pdf_name('/Encoding'): pdf_name('/Identity-H'),
+            pdf_name('/BaseFont'):
+                pdf_name('/%s-Identity-H' % self.ps_name),
+            pdf_name('/ToUnicode'): writer.add_object(to_unicode)
+        })
+        return writer.add_object(type0, obj_stream=obj_stream)
+
+
+class FontSubsetCache:
+    """
+    Thread-safe cache for font subsets.
+
+    Subsets are keyed by a hash of the font file, the glyphs in the subset
+    and the subsetter options, so producing the same subset twice
+    (e.g. when the same text is rendered in several signature appearances)
+    only requires running the subsetter once.
+
+    :param cache_dir:
+        If not ``None``, the cache will also be persisted in this directory.
+        It will be created if it doesn't exist yet.
+    :param max_entries:
+        Maximal number of subsets to keep in memory. When this number is
+        exceeded, the least recently used subsets are evicted (they remain
+        available on disk if ``cache_dir`` is set).
+    """
+
+    def __init__(self, cache_dir=None, max_entries=256):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, FontSubset]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _read_entry(self, key) -> Optional[FontSubset]:
+        try:
+            with open(self._entry_path(key), 'r') as f:
+                result = FontSubset.from_json(json.load(f))
+        except (IOError, ValueError, KeyError, TypeError):
+            return None
+        return result if result.key == key else None
+
+    def _write_entry(self, font_subset: FontSubset):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write to a temporary file first, so concurrent readers never see
+        # a partially written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(font_subset.as_json(), f)
+            os.replace(tmp_path, self._entry_path(font_subset.key))
+        except IOError as e:  # pragma: nocover
+            logger.warning('Failed to write font subset cache entry: %s', e)
+            try:
+                os.unlink(tmp_path)
+            except IOError:
+                pass
+
+    def get(self, key) -> Optional[FontSubset]:
+        """
+        Look up a font subset.
+
+        :param key:
+            The key of the subset.
+        :return:
+            A :class:`.FontSubset`, or ``None`` if not found.
+        """
+        with self._lock:
+            try:
+                result = self._entries[key]
+                self._entries.move_to_end(key)
+                return result
+            except KeyError:
+                pass
+        if self.cache_dir is None:
+            return None
+        result = self._read_entry(key)
+        if result is not None:
+            self._remember(result)
+        return result
+
+    def _remember(self, font_subset: FontSubset):
+        with self._lock:
+            self._entries[font_subset.key] = font_subset
+            self._entries.move_to_end(font_subset.key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, font_subset: FontSubset):
+        """
+        Add a font subset to the cache, evicting the least recently used
+        one from memory if necessary.
+        """
+        self._remember(font_subset)
+        if self.cache_dir is not None:
+            self._write_entry(font_subset)
+
+    def clear(self):
+        """
+        Clear the in-memory part of the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+_shared_subset_cache = None
+_shared_subset_cache_lock = threading.Lock()
+
+
+def shared_font_subset_cache() -> FontSubsetCache:
+    """
+    Return the process-wide font subset cache (in-memory only).
+    """
+    global _shared_subset_cache
+    with _shared_subset_cache_lock:
+        if _shared_subset_cache is None:
+            _shared_subset_cache = FontSubsetCache()
+        return _shared_subset_cache
+
+
+class _LazyTable(dict):
+    # dictionary that computes missing entries on demand
+    # (this also works with str.translate)
+
+    def __init__(self, func):
+        super().__init__()
+        self.func = func
+
+    def __missing__(self, key):
+        value = self[key] = self.func(key)
+        return value
+
+
+def _is_cid_keyed(tt: ttLib.TTFont):
+    try:
+        return hasattr(tt['CFF '].cff[0], 'ROS')
+    except KeyError:
+        return False
+
+
+class SharedFont:
+    """
+    An OpenType font that can be shared between documents and threads.
+
+    The data required to encode and measure text is extracted from the font
+    once, on first use, and stored in compact lookup tables.
+    After that, it is never modified.
+    Instances are usually obtained from a :class:`.FontRegistry`.
+
+    :param tt:
+        The font. It should not be modified after being passed in.
+    """
 
     def __init__(self, tt: ttLib.TTFont):
         self.tt = tt
-        self.cmap = tt.getBestCmap()
-        self.glyph_set = self.tt.getGlyphSet(preferCFF=True)
-        self._glyphs = {}
-        self._font_ref = None
+        self._lock = threading.Lock()
+        self._gid_by_cp = None
+        self._cids = self._widths = None
+        self._hex_table = _LazyTable(self._hex_for_cp)
+        self._width_table = _LazyTable(self._width_for_char)
+        self._cid_keyed = None
+        self._font_digest = None
         try:
             self.units_per_em = tt['head'].unitsPerEm
         except KeyError:
             self.units_per_em = 1000
 
-    def _encode_char(self, ch):
-        try:
-            (cid, gid, glyph) = self._glyphs[ch]
-        except KeyError:
-            # NOTE: the glyph id as reported by getGlyphID is NOT what we want
-            # to encode in the string. In some fonts (I've seen this in a couple
-            # full CJK fonts), this happens to be the same as the CID of the
-            # glyph but not always.
-            # I'm not sure what the "officially sanctioned" way to do this in
-            # fontTools is, but we can derive the CID from the generated name
-            # of the glyph, which is of the form cidXXXXX
-            # We do want to save the glyph ID to pass it to the subsetter later.
-            # FIXME This obviously breaks with string-keyed fonts. How to deal
-            #  with those?
+    def _load_tables(self):
+        # fontTools doesn't support loading tables from multiple threads
+        with self._lock:
+            if self._gid_by_cp is not None:
+                return
+            tt = self.tt
+            glyph_order = tt.getGlyphOrder()
+            metrics = tt['hmtx'].metrics
+            self._widths = array(
+                'H', (metrics[name][0] for name in glyph_order)
+            )
+            self._cid_keyed = cid_keyed = _is_cid_keyed(tt)
+            if cid_keyed:
+                # NOTE: the glyph id is NOT what we want to encode in the
+                # string. In some fonts (I've seen this in a couple full CJK
+                # fonts), this happens to be the same as the CID of the glyph
+                # but not always.
+                # fontTools doesn't expose the charset of CID-keyed fonts
+                # directly, but we can derive the CID from the generated name
+                # of the glyph, which is of the form cidXXXXX
+                def _cid(name):
+                    try:
+                        return int(name[3:])
+                    except ValueError:
+                        if name == '.notdef':
+                            return 0
+                        raise NotImplementedError(
+                            f"Could not figure out CID for glyph with name "
+                            f"{name}."
+                        )
+                self._cids = array('H', map(_cid, glyph_order))
+            else:
+                # For name-keyed fonts, PDF viewers use CIDs as glyph IDs
+                # (see § 9.7.4.2 in ISO 32000)
+                self._cids = array('H', range(len(glyph_order)))
+            glyph_ids = tt.getReverseGlyphMap()
+            self._gid_by_cp = {
+                cp: glyph_ids[name] for cp, name in tt.getBestCmap().items()
+            }
+
+    @property
+    def cid_keyed(self) -> bool:
+        """
+        Indicates whether the font is CID-keyed.
+        """
+        if self._gid_by_cp is None:
+            self._load_tables()
+        return self._cid_keyed
+
+    def glyph_info(self, ch) -> Tuple[int, int, int]:
+        """
+        Look up the glyph used to render a character.
+        Characters that aren't covered by the font are rendered using
+        the ``.notdef`` glyph.
+
+        :param ch:
+            A single character.
+        :return:
+            A tuple with the CID, the glyph ID, and the advance width of the
+            glyph.
+        """
+        gid_by_cp = self._gid_by_cp
+        if gid_by_cp is None:
+            self._load_tables()
+            gid_by_cp = self._gid_by_cp
+        # .notdef is always the first glyph
+        gid = gid_by_cp.get(ord(ch), 0)
+        return self._cids[gid], gid, self._widths[gid]
+
+    def _hex_for_cp(self, cp):
+        return '%04x' % self.glyph_info(chr(cp))[0]
+
+    def _width_for_char(self, ch):
+        return self.glyph_info(ch)[2]
+
+    def encode(self, txt) -> str:
+        """
+        Encode a string as a sequence of hex-encoded CIDs.
+        """
+        return txt.translate(self._hex_table)
+
+    def measure(self, txt) -> int:
+        """
+        Compute the width of a string in font units, ignoring kerning.
+        """
+        return sum(map(self._width_table.__getitem__, txt))
+
+    def font_bytes(self) -> bytes:
+        """
+        Return the contents of the font file.
+        """
+        with self._lock:
+            return _font_file_bytes(self.tt)
+
+    @property
+    def font_digest(self) -> str:
+        """
+        SHA-256 hash of the font file, in hex.
+        """
+        digest = self._font_digest
+        if digest is None:
+            digest = self._font_digest = hashlib.sha256(
+                self.font_bytes()
+            ).hexdigest()
+        return digest
+
+    def accumulator(self, subset_cache: FontSubsetCache = None) \
+            -> 'GlyphAccumulator':
+        """
+        Create a new glyph accumulator for this font.
+
+        :param subset_cache:
+            See :class:`.GlyphAccumulator`.
+        """
+        return GlyphAccumulator(self, subset_cache=subset_cache)
+
+
+class FontRegistry:
+    """
+    Thread-safe registry of fonts, keyed by file name.
+    Every font file is opened only once, with lazy table loading.
+    """
+
+    def __init__(self):
+        self._fonts: Dict[str, SharedFont] = {}
+        self._lock = threading.Lock()
+
+    def get_font(self, font_file) -> SharedFont:
+        """
+        Look up a font, opening it if necessary.
+
+        :param font_file:
+            Path to an OpenType font file.
+        :return:
+            A :class:`.SharedFont`.
+        """
+        key = os.path.realpath(font_file)
+        with self._lock:
             try:
-                glyph_name = self.cmap[ord(ch)]
-                glyph = self.glyph_set[glyph_name]
-                gid = self.tt.getGlyphID(glyph_name)
-                try:
-                    cid = int(glyph_name[3:])
-                except ValueError:
-                    raise NotImplementedError(
-                        f"Could not figure out CID for glyph with name "
-                        f"{glyph_name}."
-                    )
+                return self._fonts[key]
             except KeyError:
-                glyph = self.glyph_set['.notdef']
-                gid = self.tt.getGlyphID('.notdef')
-                cid = 0
-            self._glyphs[ch] = (cid, gid, glyph)
+                pass
+        font = SharedFont(ttLib.TTFont(key, lazy=True))
+        with self._lock:
+            # if another thread got there first, use that one
+            return self._fonts.setdefault(key, font)
+
+    def clear(self):
+        """
+        Forget about all fonts in the registry.
+        """
+        with self._lock:
+            self._fonts.clear()
+
+
+_shared_font_registry = None
+_shared_font_registry_lock = threading.Lock()
+
+
+def shared_font_registry() -> FontRegistry:
+    """
+    Return the process-wide font registry.
+    """
+    global _shared_font_registry
+    with _shared_font_registry_lock:
+        if _shared_font_registry is None:
+            _shared_font_registry = FontRegistry()
+        return _shared_font_registry
+
+
+class FontEngineFactory:
+    """
+    Produces font engines on demand. Use this instead of a
+    :class:`.FontEngine` if the font engine keeps track of state that
+    shouldn't be shared between documents.
+    """
+
+    def create_font_engine(self) -> FontEngine:
+        raise NotImplementedError
+
+
+class GlyphAccumulatorFactory(FontEngineFactory):
+    """
+    Produces :class:`.GlyphAccumulator` objects for an OpenType font.
+    The font is only loaded once.
+
+    :param font_file:
+        Path to an OpenType font file.
+    :param registry:
+        The font registry to use.
+        Defaults to the one returned by :func:`shared_font_registry`.
+    :param subset_cache:
+        See :class:`.GlyphAccumulator`.
+    """
+
+    def __init__(self, font_file, registry: FontRegistry = None,
+                 subset_cache: FontSubsetCache = None):
+        registry = registry or shared_font_registry()
+        self.font = registry.get_font(font_file)
+        self.subset_cache = subset_cache
 
-        return cid, glyph.width
+    def create_font_engine(self) -> 'GlyphAccumulator':
+        return self.font.accumulator(subset_cache=self.subset_cache)
+
+    def __eq__(self, other):
+        return isinstance(other, GlyphAccumulatorFactory) \
+            and self.font is other.font \
+            and self.subset_cache is other.subset_cache
+
+    def __hash__(self):
+        return hash((id(self.font), id(self.subset_cache)))
+
+
+class GlyphAccumulator(FontEngine):
+    """
+    Font engine that keeps track of the glyphs used, in order to embed
+    a subset of an OpenType font with CFF outlines.
+
+    :param tt:
+        The font to use. It is not modified by this class.
+    :param subset_cache:
+        Cache for font subsets.
+        Defaults to the process-wide cache returned by
+        :func:`shared_font_subset_cache`.
+    """
+
+    def __init__(self, tt: Union[ttLib.TTFont, SharedFont],
+                 subset_cache: FontSubsetCache = None):
+        if not isinstance(tt, SharedFont):
+            tt = SharedFont(tt)
+        self.font = tt
+        self.subset_cache = subset_cache or shared_font_subset_cache()
+        self._glyphs = {}
+        self._font_ref = None
+        self._font_writer = None
+
+    @property
+    def tt(self) -> ttLib.TTFont:
+        return self.font.tt
+
+    @property
+    def units_per_em(self):
+        return self.font.units_per_em
+
+    @property
+    def metrics_key(self):
+        return self.font
+
+    def _encode_char(self, ch):
+        try:
+            (cid, _, width) = self._glyphs[ch]
+        except KeyError:
+            cid, gid, width = self._glyphs[ch] = self.font.glyph_info(ch)
+        return cid, width
 
     def feed_string(self, txt):
         """
@@ -123,18 +701,11 @@ class GlyphAccumulator(FontEngine):
             The width computation ignores kerning, but takes the width of all
             characters into account.
         """
-        total_width = 0
-
-        def _gen():
-            nonlocal total_width
-            for ch in txt:
-                cid, width = self._encode_char(ch)
-                # ignore kerning
-                total_width += width
-                yield '%04x' % cid
-
-        hex_encoded = ''.join(_gen())
-        return hex_encoded, total_width / self.units_per_em
+        font = self.font
+        glyphs = self._glyphs
+        for ch in set(txt).difference(glyphs):
+            glyphs[ch] = font.glyph_info(ch)
+        return font.encode(txt), font.measure(txt) / self.units_per_em
 
     def render(self, txt):
         hex_encoded, _ = self.feed_string(txt)
@@ -143,62 +714,94 @@ class GlyphAccumulator(FontEngine):
     def measure(self, txt):
         return self.feed_string(txt)[1]
 
-    def extract_subset(self, options=None):
+    def _subset_options(self, options: subset.Options = None):
         options = options or subset.Options()
+        if not self.font.cid_keyed:
+            # we use glyph IDs as CIDs, so they have to stay the same
+            options = copy.copy(options)
+            options.retain_gids = True
+        return options
+
+    def subset_key(self, options: subset.Options = None) -> str:
+        """
+        Compute the cache key for the subset consisting of the glyphs
+        encountered so far.
+        """
+        options = self._subset_options(options)
+        glyphs = sorted(
+            (cid, gid, ord(ch)) for ch, (cid, gid, _) in self._glyphs.items()
+        )
+        key_data = json.dumps(
+            [self.font.font_digest, glyphs, _subset_options_key(options)]
+        )
+        return hashlib.sha256(key_data.encode('utf8')).hexdigest()
+
+    def extract_subset(self, options=None) -> FontSubset:
+        """
+        Produce a subset of the font with the glyphs encountered so far.
+        The subset is taken from the cache if possible.
+
+        :param options:
+            Options for the fontTools subsetter.
+        :return:
+            A :class:`.FontSubset`.
+        """
+        options = self._subset_options(options)
+        key = self.subset_key(options)
+        font_subset = self.subset_cache.get(key)
+        if font_subset is not None:
+            return font_subset
+
+        # subset a copy of the font, so that this accumulator remains usable
+        tt = ttLib.TTFont(BytesIO(self.font.font_bytes()))
         subsetter: subset.Subsetter = subset.Subsetter(options=options)
         gids = map(lambda x: x[1], self._glyphs.values())
         subsetter.populate(gids=list(gids))
-        subsetter.subset(self.tt)
+        subsetter.subset(tt)
 
-    def embed_subset(self, writer: IncrementalPdfFileWriter, obj_stream=None):
-        if self._font_ref is not None:
-            return self._font_ref
-        self.extract_subset()
-        cidfont_obj = CIDFontType0(self.tt)
+        cidfont_obj = CIDFontType0(tt)
         # TODO keep track of used subset prefixes in the writer!
-        cff_topdict = self.tt['CFF '].cff[0]
-        name = cidfont_obj.name
+        cff_topdict = tt['CFF '].cff[0]
         cff_topdict.rawDict['FullName'] = '%s+%s' % (
-            generate_subset_prefix(), name
+            generate_subset_prefix(), cidfont_obj.name
         )
-        cidfont_obj.embed(writer, obj_stream=obj_stream)
-        cidfont_ref = writer.add_object(cidfont_obj)
+        stream_buf = BytesIO()
+        cidfont_obj.cff.compile(stream_buf, tt)
         to_unicode = self.format_tounicode_cmap(*cidfont_obj.ros)
-        type0 = generic.DictionaryObject({
-            pdf_name('/Type'): pdf_name('/Font'),
-            pdf_name('/Subtype'): pdf_name('/Type0'),
-            pdf_name('/DescendantFonts'): generic.ArrayObject([cidfont_ref]),
-            # take the Identity-H encoding to inherit from the /Encoding
-            # entry specified in our CIDSystemInfo dict
-            pdf_name('/Encoding'): pdf_name('/Identity-H'),
-            pdf_name('/BaseFont'):
-                pdf_name('/%s-Identity-H' % cidfont_obj.name),
-            pdf_name('/ToUnicode'): writer.add_object(to_unicode)
-        })
-        to_unicode.compress()
+        font_subset = FontSubset(
+            key=key, ps_name=cidfont_obj.name, ros=cidfont_obj.ros,
+            font_program=stream_buf.getvalue(), metrics=_font_metrics(tt),
+            widths=self._widths(), to_unicode=to_unicode.data
+        )
+        self.subset_cache.put(font_subset)
+        return font_subset
+
+    def _widths(self):
         # compute widths entry
         # (easiest to do here, since it seems we need the original CIDs)
         by_cid = iter(sorted(self._glyphs.values(), key=lambda t: t[0]))
+        result = []
+        current_chunk = []
+        prev_cid = None
+        (first_cid, _, _), itr = peek(by_cid)
+        for cid, _, width in itr:
+            if current_chunk and cid != prev_cid + 1:
+                result.extend((first_cid, current_chunk))
+                current_chunk = []
+                first_cid = cid
+
+            current_chunk.append(width)
+            prev_cid = cid
+        if current_chunk:
+            result.extend((first_cid, current_chunk))
+        return result
 
-        def _widths():
-            current_chunk = []
-            prev_cid = None
-            (first_cid, _, _), itr = peek(by_cid)
-            for cid, _, g in itr:
-                if current_chunk and cid != prev_cid + 1:
-                    yield generic.NumberObject(first_cid)
-                    yield generic.ArrayObject(current_chunk)
-                    current_chunk = []
-                    first_cid = cid
-
-                current_chunk.append(generic.NumberObject(g.width))
-                prev_cid = cid
-            if current_chunk:
-                yield generic.NumberObject(first_cid)
-                yield generic.ArrayObject(current_chunk)
-
-        cidfont_obj[pdf_name('/W')] = generic.ArrayObject(list(_widths()))
-        self._font_ref = ref = writer.add_object(type0, obj_stream=obj_stream)
+    def embed_subset(self, writer: IncrementalPdfFileWriter, obj_stream=None):
+        if self._font_ref is not None and self._font_writer is writer:
+            return self._font_ref
+        font_subset = self.extract_subset()
+        self._font_ref = ref = font_subset.embed(writer, obj_stream=obj_stream)
+        self._font_writer = writer
         return ref
 
     def as_resource(self):
@@ -289,9 +892,7 @@ class CIDFontType0(CIDFont):
         try:
             registry, ordering, supplement = td.ROS
         except (AttributeError, ValueError):
-            # XXX If these attributes aren't present, chances are that the
-            # font won't work regardless.
-            logger.warning("No ROS metadata. Is this really a CIDFont?")
+            # This is a name-keyed font, so glyphs will be selected by GID
             registry = "Adobe"
             ordering = "Identity"
             supplement = 0
@@ -321,29 +922,6 @@ class FontDescriptor(generic.DictionaryObject):
     """
 
     def __init__(self, cf: CIDFont):
-        tt = cf.tt
-
-        # Some metrics
-        hhea = tt['hhea']
-        head = tt['head']
-        bbox = [head.xMin, head.yMin, head.xMax, head.yMax]
-        os2 = tt['OS/2']
-        weight = os2.usWeightClass
-        stemv = int(10 + 220 * (weight - 50) / 900)
-        super().__init__({
-            pdf_name('/Type'): pdf_name('/FontDescriptor'),
-            pdf_name('/FontName'): pdf_name('/' + cf.name),
-            pdf_name('/Ascent'): generic.NumberObject(hhea.ascent),
-            pdf_name('/Descent'): generic.NumberObject(hhea.descent),
-            pdf_name('/FontBBox'): generic.ArrayObject(
-                map(generic.NumberObject, bbox)
-            ),
-            # FIXME I'm setting the Serif and Symbolic flags here, but
-            #  is there any way we can read/infer those from the TTF metadata?
-            pdf_name('/Flags'): generic.NumberObject(0b110),
-            pdf_name('/StemV'): generic.NumberObject(stemv),
-            pdf_name('/ItalicAngle'): generic.FloatObject(
-                tt['post'].italicAngle
-            ),
-            pdf_name('/CapHeight'): generic.NumberObject(os2.sCapHeight)
-        })
+        super().__init__(
+            _font_descriptor_entries(cf.name, _font_metrics(cf.tt))
+        )
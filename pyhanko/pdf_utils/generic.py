@@ -973,6 +973,18 @@ class StreamObject(DictionaryObject):
     The latter will be overwritten as necessary.
     """
 
+    compression_level: Optional[int] = None
+    """
+    The zlib compression level to use when applying ``/FlateDecode`` to this
+    stream. If ``None``, the writer's setting (or zlib's default) applies.
+    """
+
+    compression_strategy: Optional[int] = None
+    """
+    The zlib compression strategy to use when applying ``/FlateDecode`` to this
+    stream. If ``None``, the writer's setting (or zlib's default) applies.
+    """
+
     def __init__(self, dict_data=None, stream_data=None, encoded_data=None):
         """Initialise a stream with dictionary data and stream data
         (either encoded or decoded). If both `stream_data` and `encoded_data`
@@ -1069,15 +1081,56 @@ class StreamObject(DictionaryObject):
             If the stream could not be encoded.
         """
         if self._encoded_data is None:
-            data = self._data
-            if data is None:
-                raise PdfStreamError("No data available.")
-            decoders = tuple(self._stream_decoders())
-            for filter_cls, decode_params in reversed(decoders):
-                data = filter_cls.encode(data, decode_params)
-            self._encoded_data = data
+            self.encode()
         return self._encoded_data
 
+    @property
+    def encoded(self) -> bool:
+        """
+        Indicates whether encoded data is available for this stream.
+        """
+        return self._encoded_data is not None
+
+    def encode(self, compression_level=None, compression_strategy=None,
+               chunk_map=None):
+        """
+        Encode the stream data, unless it has been encoded already.
+        Calling this method is never necessary, but it allows the caller to
+        control when (and in which thread) the work is done, and provide
+        some extra parameters.
+
+        :param compression_level:
+            Default zlib compression level for ``/FlateDecode``.
+            :attr:`compression_level` takes precedence if set.
+        :param compression_strategy:
+            Default zlib compression strategy for ``/FlateDecode``.
+            :attr:`compression_strategy` takes precedence if set.
+        :param chunk_map:
+            Function with the signature of :func:`map` to compress large
+            streams in chunks, see :func:`~.filters.flate_compress`.
+        :raises .misc.PdfStreamError:
+            If the stream could not be encoded.
+        """
+        if self._encoded_data is not None:
+            return
+        data = self._data
+        if data is None:
+            raise PdfStreamError("No data available.")
+        if self.compression_level is not None:
+            compression_level = self.compression_level
+        if self.compression_strategy is not None:
+            compression_strategy = self.compression_strategy
+        decoders = tuple(self._stream_decoders())
+        for filter_cls, decode_params in reversed(decoders):
+            if filter_cls is filters.FlateDecode:
+                data = filter_cls.encode(
+                    data, decode_params, level=compression_level,
+                    strategy=compression_strategy, chunk_map=chunk_map
+                )
+            else:
+                data = filter_cls.encode(data, decode_params)
+        self._encoded_data = data
+
     def apply_filter(self, filter_name, params=None,
                      allow_duplicates: Optional[bool] = True):
         """
@@ -1,25 +1,158 @@
+import hashlib
+import struct
+import threading
 import uuid
+from collections import OrderedDict
 from fractions import Fraction
+from io import BytesIO
 
 from PIL.ImagePalette import ImagePalette
-from typing import Union
+from typing import Union, Optional
 
 from pyhanko.pdf_utils.misc import BoxConstraints
 from .generic import pdf_name
 from .content import ResourceType, PdfResources, PdfContent
 from . import generic
-from .writer import BasePdfFileWriter
+from .writer import BasePdfFileWriter, PdfFileWriter
 
 from PIL import Image
 
-__all__ = ['pil_image', 'PdfImage']
+__all__ = [
+    'pil_image', 'image_xobject', 'PdfImage',
+    'ImageXObjectCache', 'shared_image_cache'
+]
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+JPEG_SIGNATURE = b'\xff\xd8'
+
+# PNG colour type -> number of colour components, for the colour types
+# that we can embed without decoding
+_PNG_COLOUR_COMPONENTS = {0: 1, 2: 3, 3: 1}
+
+_JPEG_COLOUR_SPACES = {
+    'L': pdf_name('/DeviceGray'),
+    'RGB': pdf_name('/DeviceRGB'),
+    'CMYK': pdf_name('/DeviceCMYK'),
+}
+
+
+def _png_chunks(data: bytes):
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        yield chunk_type, data[pos + 8:pos + 8 + length]
+        # skip the CRC
+        pos += length + 12
+
+
+def _png_xobject(data: bytes) -> Optional[generic.StreamObject]:
+    # The image data in a PNG file is a zlib stream with the same
+    # prediction scheme as FlateDecode with /Predictor 15, so it can be
+    # embedded as-is, as long as no alpha channel needs to be split off.
+    header = None
+    palette = None
+    idat_chunks = []
+    for chunk_type, chunk_data in _png_chunks(data):
+        if chunk_type == b'IHDR':
+            header = struct.unpack('>IIBBBBB', chunk_data)
+        elif chunk_type == b'PLTE':
+            palette = chunk_data
+        elif chunk_type == b'IDAT':
+            idat_chunks.append(chunk_data)
+        elif chunk_type == b'tRNS':
+            # transparency requires a soft mask
+            return None
+        elif chunk_type == b'IEND':
+            break
+    if header is None or not idat_chunks:
+        return None
+    width, height, bit_depth, colour_type, _, _, interlace = header
+    try:
+        colours = _PNG_COLOUR_COMPONENTS[colour_type]
+    except KeyError:
+        return None
+    if interlace or bit_depth > 8:
+        return None
+
+    if colour_type == 3:
+        if palette is None:
+            return None
+        clr_space = generic.ArrayObject([
+            pdf_name('/Indexed'), pdf_name('/DeviceRGB'),
+            generic.NumberObject(len(palette) // 3 - 1),
+            generic.ByteStringObject(palette)
+        ])
+    elif colour_type == 2:
+        clr_space = pdf_name('/DeviceRGB')
+    else:
+        clr_space = pdf_name('/DeviceGray')
+
+    return generic.StreamObject({
+        pdf_name('/Type'): pdf_name('/XObject'),
+        pdf_name('/Subtype'): pdf_name('/Image'),
+        pdf_name('/Width'): generic.NumberObject(width),
+        pdf_name('/Height'): generic.NumberObject(height),
+        pdf_name('/ColorSpace'): clr_space,
+        pdf_name('/BitsPerComponent'): generic.NumberObject(bit_depth),
+        pdf_name('/Filter'): pdf_name('/FlateDecode'),
+        pdf_name('/DecodeParms'): generic.DictionaryObject({
+            pdf_name('/Predictor'): generic.NumberObject(15),
+            pdf_name('/Colors'): generic.NumberObject(colours),
+            pdf_name('/BitsPerComponent'): generic.NumberObject(bit_depth),
+            pdf_name('/Columns'): generic.NumberObject(width),
+        }),
+    }, encoded_data=b''.join(idat_chunks))
+
+
+def _jpeg_xobject(data: bytes, img: Image.Image) \
+        -> Optional[generic.StreamObject]:
+    try:
+        clr_space = _JPEG_COLOUR_SPACES[img.mode]
+    except KeyError:
+        return None
+    dict_data = {
+        pdf_name('/Type'): pdf_name('/XObject'),
+        pdf_name('/Subtype'): pdf_name('/Image'),
+        pdf_name('/Width'): generic.NumberObject(img.width),
+        pdf_name('/Height'): generic.NumberObject(img.height),
+        pdf_name('/ColorSpace'): clr_space,
+        pdf_name('/BitsPerComponent'): generic.NumberObject(8),
+        pdf_name('/Filter'): pdf_name('/DCTDecode'),
+    }
+    if img.mode == 'CMYK' and 'adobe' in img.info:
+        # Adobe applications write inverted CMYK data
+        dict_data[pdf_name('/Decode')] = generic.ArrayObject(
+            [generic.NumberObject(1), generic.NumberObject(0)] * 4
+        )
+    return generic.StreamObject(dict_data, encoded_data=data)
+
+
+def _pack_samples(data: bytes, width: int, height: int, bpc: int) -> bytes:
+    # pack 8-bit samples into rows of bpc-bit samples
+    per_byte = 8 // bpc
+    row_len = -(-width // per_byte)
+    padding = row_len * per_byte - width
+    if padding:
+        pad = bytes(padding)
+        data = b''.join(
+            data[y * width:(y + 1) * width] + pad for y in range(height)
+        )
+    packed = 0
+    for lane in range(per_byte):
+        shift = 8 - bpc * (lane + 1)
+        table = bytes(((v << shift) & 0xff) for v in range(256))
+        packed |= int.from_bytes(
+            data[lane::per_byte].translate(table), 'big'
+        )
+    return packed.to_bytes(row_len * height, 'big')
 
 
 def pil_image(img, writer: BasePdfFileWriter):
     assert isinstance(img, Image.Image)
     # TODO would PA be hard to support?
 
-    if img.mode not in ('RGB', 'RGBA', 'P', 'L', 'LA'):  # pragma: nocover
+    if img.mode not in ('RGB', 'RGBA', 'P', 'L', 'LA', '1'):  # pragma: nocover
         raise NotImplementedError
 
     dict_data = {
@@ -40,9 +173,12 @@ def pil_image(img, writer: BasePdfFileWriter):
         # finally, convert to RBG or L as appropriate
         img = img.convert(img.mode[:-1])
 
-    clr_space = \
-        pdf_name('/DeviceGray') if img.mode == 'L' else pdf_name('/DeviceRGB')
-    if img.mode == 'P':
+    clr_space = pdf_name('/DeviceGray') if img.mode in ('L', '1') \
+        else pdf_name('/DeviceRGB')
+    if img.mode == '1':
+        # PIL already packs bilevel images with 1 bit per pixel
+        bpc = generic.NumberObject(1)
+    elif img.mode == 'P':
         palette: ImagePalette = img.palette
         palette_arr = palette.palette
         if palette.mode != 'RGB':  # pragma: nocover
@@ -56,17 +192,21 @@ def pil_image(img, writer: BasePdfFileWriter):
             generic.NumberObject(palette_size - 1),
             generic.ByteStringObject(palette_arr)
         ])
+        # use the smallest bit depth that can index the palette
+        # (the standard only allows 1, 2, 4 and 8 here)
+        for small_bpc in (1, 2, 4):
+            if palette_size <= 1 << small_bpc:
+                bpc = generic.NumberObject(small_bpc)
+                break
 
     if smask_image is not None:
         dict_data[pdf_name('/SMask')] = smask_image
 
     dict_data[pdf_name('/ColorSpace')] = clr_space
     dict_data[pdf_name('/BitsPerComponent')] = bpc
-    # TODO nice to have: I'd like to pack everything into minimal space here
-    #   (but the flate compression should deal with it pretty nicely)
-    #  NOTE the BPC values allowed by the standard are limited to 1, 2, 4, 8
-    #   (and 12, 16, but those aren't allowed by PIL anyway in this context)
     image_bytes = img.tobytes()
+    if img.mode == 'P' and bpc < 8:
+        image_bytes = _pack_samples(image_bytes, img.width, img.height, bpc)
 
     stream = generic.StreamObject(
         dict_data, stream_data=image_bytes
@@ -75,20 +215,168 @@ def pil_image(img, writer: BasePdfFileWriter):
     return writer.add_object(stream)
 
 
+def image_xobject(img: Image.Image, writer: BasePdfFileWriter,
+                  image_data: bytes = None):
+    """
+    Embed an image into a PDF file.
+
+    If the encoded image file is available, JPEG images are embedded as-is,
+    and so are PNG images that don't require a soft mask.
+    Everything else is decoded and re-encoded by :func:`pil_image`.
+
+    :param img:
+        The image to embed.
+    :param writer:
+        The PDF writer to embed the image into.
+    :param image_data:
+        The contents of the image file that ``img`` was read from, if
+        available.
+    :return:
+        A reference to the image XObject.
+    """
+    stream = None
+    if image_data is not None:
+        if image_data.startswith(JPEG_SIGNATURE):
+            stream = _jpeg_xobject(image_data, img)
+        elif image_data.startswith(PNG_SIGNATURE):
+            stream = _png_xobject(image_data)
+    if stream is None:
+        return pil_image(img, writer)
+    return writer.add_object(stream)
+
+
+def _image_digest(img: Image.Image, image_data: bytes = None) -> str:
+    h = hashlib.sha256()
+    if image_data is not None:
+        h.update(b'file')
+        h.update(image_data)
+    else:
+        h.update(('%s %d %d' % (img.mode, img.width, img.height)).encode())
+        if img.palette is not None:
+            h.update(img.palette.mode.encode())
+            h.update(bytes(img.palette.palette))
+        h.update(img.tobytes())
+    return h.hexdigest()
+
+
+class ImageXObjectCache:
+    """
+    Thread-safe LRU cache of embedded images, keyed by a hash of the
+    image's contents.
+
+    Cached images are copied into the target document instead of being
+    re-encoded.
+    Within a single writer, every image is only embedded once.
+
+    :param max_entries:
+        Maximal number of images to keep.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Optional[generic.IndirectObject]:
+        """
+        Look up an image by its digest.
+
+        :return:
+            A reference to the image XObject in a scratch writer, or
+            ``None`` if not found.
+        """
+        with self._lock:
+            try:
+                result = self._entries[digest]
+            except KeyError:
+                return None
+            self._entries.move_to_end(digest)
+            return result
+
+    def put(self, digest: str, image_ref: generic.IndirectObject):
+        """
+        Add an image to the cache, evicting the least recently used
+        one if necessary.
+        """
+        with self._lock:
+            self._entries[digest] = image_ref
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def embed(self, img: Image.Image, writer: BasePdfFileWriter,
+              image_data: bytes = None, digest: str = None):
+        """
+        Embed an image into a writer, using the cache if possible.
+
+        :param img:
+            The image to embed.
+        :param writer:
+            The PDF writer to embed the image into.
+        :param image_data:
+            The contents of the image file that ``img`` was read from, if
+            available.
+        :param digest:
+            Digest of the image, if already known.
+        :return:
+            A reference to the image XObject in ``writer``.
+        """
+        digest = digest or _image_digest(img, image_data)
+        image_ref = self.get(digest)
+        if image_ref is None:
+            scratch = PdfFileWriter()
+            image_ref = image_xobject(img, scratch, image_data=image_data)
+            for obj in scratch.objects.values():
+                if isinstance(obj, generic.StreamObject):
+                    obj.encode()
+            self.put(digest, image_ref)
+        # The writer remembers which objects it has already imported from
+        # the scratch writer, so each image is only embedded once per writer
+        return writer.import_object(image_ref)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_shared_image_cache = None
+_shared_image_cache_lock = threading.Lock()
+
+
+def shared_image_cache() -> ImageXObjectCache:
+    """
+    Return the process-wide image cache.
+    """
+    global _shared_image_cache
+    with _shared_image_cache_lock:
+        if _shared_image_cache is None:
+            _shared_image_cache = ImageXObjectCache()
+        return _shared_image_cache
+
+
 class PdfImage(PdfContent):
 
-    def __init__(self, image: Union[Image.Image, str],
+    def __init__(self, image: Union[Image.Image, str, bytes],
                  writer: BasePdfFileWriter = None,
                  resources: PdfResources = None,
                  name: str = None,
-                 opacity=None, box: BoxConstraints = None):
+                 opacity=None, box: BoxConstraints = None,
+                 image_cache: ImageXObjectCache = None):
 
+        image_data = None
         if isinstance(image, str):
-            image = Image.open(image)
+            with open(image, 'rb') as imgf:
+                image_data = imgf.read()
+        elif isinstance(image, bytes):
+            image_data = image
+        if image_data is not None:
+            image = Image.open(BytesIO(image_data))
 
         self.image: Image.Image = image
+        self.image_data = image_data
+        self.image_cache = image_cache or shared_image_cache()
         self.name = name or str(uuid.uuid4())
         self.opacity = opacity
+        self._digest = None
 
         if box is None:
             # assume square pixels
@@ -104,7 +392,12 @@ class PdfImage(PdfContent):
         # cache is invalidated if the writer changed
         if self._image_ref is None or \
                 self._image_ref.get_pdf_handler() is not self.writer:
-            self._image_ref = pil_image(self.image, self.writer)
+            if self._digest is None:
+                self._digest = _image_digest(self.image, self.image_data)
+            self._image_ref = self.image_cache.embed(
+                self.image, self.writer, image_data=self.image_data,
+                digest=self._digest
+            )
         return self._image_ref
 
     def render(self) -> bytes:
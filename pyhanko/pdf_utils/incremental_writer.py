@@ -3,7 +3,7 @@ from typing import Union
 
 from . import generic
 
-from .reader import PdfFileReader
+from .reader import PdfFileReader, PdfReaderSnapshot
 from .generic import pdf_name
 from .content import PdfContent
 from .writer import BasePdfFileWriter
@@ -18,9 +18,12 @@ __all__ = ['IncrementalPdfFileWriter']
 
 class IncrementalPdfFileWriter(BasePdfFileWriter):
 
-    def __init__(self, input_stream):
+    def __init__(self, input_stream, prev: PdfFileReader = None,
+                 auto_object_streams=False):
         self.input_stream = input_stream
-        self.prev = prev = PdfFileReader(input_stream)
+        if prev is None:
+            prev = PdfFileReader(input_stream)
+        self.prev = prev
         self.trailer = trailer = prev.trailer
         root_ref = trailer.raw_get('/Root')
         try:
@@ -31,7 +34,8 @@ class IncrementalPdfFileWriter(BasePdfFileWriter):
         document_id = self.__class__._handle_id(prev)
         super().__init__(
             root_ref, info_ref, document_id, obj_id_start=trailer['/Size'],
-            stream_xrefs=prev.has_xref_stream
+            stream_xrefs=prev.has_xref_stream,
+            auto_object_streams=auto_object_streams
         )
         self._resolves_objs_from = (self, prev)
         if self.prev.input_version != self.output_version:
@@ -40,6 +44,29 @@ class IncrementalPdfFileWriter(BasePdfFileWriter):
             root[pdf_name('/Version')] = version_str
             self.update_root()
 
+    @classmethod
+    def from_snapshot(cls, snapshot: PdfReaderSnapshot,
+                      auto_object_streams=False) \
+            -> 'IncrementalPdfFileWriter':
+        """
+        Start a new incremental update session on a previously parsed
+        document. Each session operates on its own copies of the objects
+        in the document, so any number of sessions can be spawned from the
+        same snapshot.
+
+        :param snapshot:
+            A :class:`.PdfReaderSnapshot`.
+        :param auto_object_streams:
+            Automatically pack objects into object streams, see
+            :class:`.BasePdfFileWriter`.
+        :return:
+            An :class:`.IncrementalPdfFileWriter`.
+        """
+        reader = snapshot.new_reader()
+        return cls(
+            reader.stream, prev=reader, auto_object_streams=auto_object_streams
+        )
+
     @classmethod
     def _handle_id(cls, prev):
         # There are a number of issues at play here
@@ -220,7 +247,7 @@ class IncrementalPdfFileWriter(BasePdfFileWriter):
             raise ValueError('Unexpected type for page /Contents')
 
         if resources is None:
-            return
+            return page_obj_ref
 
         if isinstance(res_ref, generic.IndirectObject):
             # we can get away with only updating this reference
@@ -245,7 +272,9 @@ class IncrementalPdfFileWriter(BasePdfFileWriter):
         one. Returns `True` if the original dict object was modified directly.
 
         The caller is responsible for avoiding name conflicts with existing
-        resources.
+        resources. Entries that are already present with the same value are
+        left alone, so merging the same resources into a resource dictionary
+        shared by several pages is harmless.
         """
 
         update_needed = False
@@ -270,6 +299,8 @@ class IncrementalPdfFileWriter(BasePdfFileWriter):
             elif isinstance(orig_value, generic.DictionaryObject):
                 for key_, value_ in value.items():
                     if key_ in orig_value:
+                        if orig_value.raw_get(key_) == value_:
+                            continue
                         raise ValueError(
                             'Naming conflict in resource of type %s: '
                             'key %s occurs in both.' % (key, key_)
@@ -1,6 +1,8 @@
+import copy
 import struct
 import os
 import re
+import threading
 from collections import defaultdict
 from io import BytesIO
 from itertools import chain
@@ -21,7 +23,7 @@ logger = logging.getLogger(__name__)
 Modified version of PdfFileReader from PyPDF2. See LICENSE.PyPDF2
 """
 
-__all__ = ['PdfFileReader']
+__all__ = ['PdfFileReader', 'PdfReaderSnapshot']
 
 header_regex = re.compile(b'%PDF-(\\d).(\\d)')
 catalog_version_regex = re.compile(r'/(\d).(\d)')
@@ -546,6 +548,25 @@ class PdfFileReader(PdfHandler):
 
         self._embedded_signatures = None
 
+    def __getstate__(self):
+        # Pickle the parsed cross-reference data and trailers along with
+        # the file's contents, but not the objects that were read
+        state = dict(self.__dict__)
+        stream = state.pop('stream')
+        stream.seek(0)
+        state['data'] = stream.read()
+        state['resolved_objects'] = {}
+        state['_historical_resolver_cache'] = {}
+        state['_embedded_signatures'] = None
+        state.pop('_page_index', None)
+        state.pop('_page_tree_visited', None)
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        self.stream = BytesIO(state.pop('data'))
+        self.__dict__.update(state)
+
     def _get_object_from_stream(self, idnum, stmnum, idx):
         # indirect reference to object in object stream
         # read the entire object stream into memory
@@ -942,12 +963,16 @@ class PdfFileReader(PdfHandler):
         if self._embedded_signatures is not None:
             return self._embedded_signatures
         from pyhanko.sign.fields import enumerate_sig_fields
-        from pyhanko.sign.validation import EmbeddedPdfSignature
+        from pyhanko.sign.validation import (
+            EmbeddedPdfSignature, DocumentValidationSession
+        )
         sig_fields = enumerate_sig_fields(self, filled_status=True)
 
+        # the signatures share the analysis of the document's revisions
+        session = DocumentValidationSession()
         result = sorted(
             (
-                EmbeddedPdfSignature(self, sig_field)
+                EmbeddedPdfSignature(self, sig_field, session=session)
                 for _, sig_obj, sig_field in sig_fields
             ), key=lambda emb: emb.signed_revision
         )
@@ -955,6 +980,171 @@ class PdfFileReader(PdfHandler):
         return result
 
 
+def _copy_for_handler(obj: generic.PdfObject, handler: PdfHandler,
+                      container_ref: generic.Dereferenceable):
+    # Copy an object graph read by one handler, and bind all indirect
+    # references to a different handler.
+    # Decrypted object proxies are not supported.
+    if isinstance(obj, generic.IndirectObject):
+        result = generic.IndirectObject(obj.idnum, obj.generation, handler)
+    elif isinstance(obj, generic.DictionaryObject):
+        cls = obj.__class__
+        result = cls.__new__(cls)
+        # this takes care of stream data as well
+        result.__dict__.update(obj.__dict__)
+        dict.update(result, (
+            (k, _copy_for_handler(v, handler, container_ref))
+            for k, v in dict.items(obj)
+        ))
+    elif isinstance(obj, generic.ArrayObject):
+        cls = obj.__class__
+        result = cls.__new__(cls)
+        list.extend(result, (
+            _copy_for_handler(v, handler, container_ref)
+            for v in list.__iter__(obj)
+        ))
+    else:
+        result = copy.copy(obj)
+    result.container_ref = container_ref
+    return result
+
+
+def _init_from_template(reader: PdfFileReader, template: PdfFileReader,
+                        stream):
+    # Set up a reader that shares the parsed cross-reference data of
+    # another one, without reading anything from the stream.
+    reader.strict = template.strict
+    reader.resolved_objects = {}
+    reader.input_version = template.input_version
+    reader._historical_resolver_cache = {}
+    reader.stream = stream
+    reader.last_startxref = template.last_startxref
+    reader.has_xref_stream = template.has_xref_stream
+    reader._embedded_signatures = None
+
+    # the cross-reference data isn't modified after parsing,
+    # so it can be shared
+    xrefs = reader.xrefs = copy.copy(template.xrefs)
+    xrefs.reader = reader
+
+    trailer = reader.trailer = TrailerDictionary()
+    trailer_ref = generic.TrailerReference(reader)
+    trailer.container_ref = trailer_ref
+    for revision in template.trailer._trailer_revisions:
+        trailer.add_trailer_revision(
+            _copy_for_handler(revision, reader, trailer_ref)
+        )
+
+
+class PdfReaderSnapshot:
+    """
+    Parsed representation of a PDF file that can be shared between any number
+    of readers (and thread-safely so).
+
+    The cross-reference data of the file is only parsed once.
+    Readers spawned from the snapshot using :meth:`new_reader` all read from
+    the same underlying buffer, and each reader gets its own private copy of
+    any object it accesses.
+    The parsing itself is also only done once per object, so creating
+    a reader session and touching a handful of objects is cheap.
+    In particular, modifying objects read through one reader never affects
+    the other readers, or the snapshot itself.
+
+    .. note::
+        Sharing parsed objects is not supported for encrypted documents.
+        Readers spawned from a snapshot of an encrypted document will parse
+        objects on their own.
+
+    :param data:
+        The input file, either as a byte string or a readable stream.
+    :param strict:
+        Strictness flag passed to the underlying :class:`.PdfFileReader`.
+    """
+
+    def __init__(self, data, strict=True):
+        if not isinstance(data, bytes):
+            data.seek(0)
+            data = data.read()
+        self.data: bytes = data
+        self._lock = threading.Lock()
+        self._reader = PdfFileReader(BytesIO(data), strict=strict)
+
+    @classmethod
+    def from_reader(cls, reader: PdfFileReader) -> 'PdfReaderSnapshot':
+        """
+        Take a snapshot of the file underlying an existing reader, reusing
+        the cross-reference data that the reader already parsed.
+
+        :param reader:
+            A :class:`.PdfFileReader`.
+        :return:
+            A :class:`.PdfReaderSnapshot`.
+        """
+        stream = reader.stream
+        stream.seek(0)
+        result = cls.__new__(cls)
+        result.data = stream.read()
+        result._lock = threading.Lock()
+        template = PdfFileReader.__new__(PdfFileReader)
+        _init_from_template(template, reader, BytesIO(result.data))
+        result._reader = template
+        return result
+
+    def __getstate__(self):
+        # the template reader carries the data, so there's no need to
+        # include it twice
+        return {'reader': self._reader}
+
+    def __setstate__(self, state):
+        self._reader = reader = state['reader']
+        self.data = reader.stream.getvalue()
+        self._lock = threading.Lock()
+
+    @property
+    def encrypted(self):
+        return self._reader.encrypted
+
+    def _copy_object(self, ref, handler: PdfHandler):
+        with self._lock:
+            obj = self._reader.get_object(ref)
+        return _copy_for_handler(
+            obj, handler,
+            generic.Reference(ref.idnum, ref.generation, handler)
+        )
+
+    def new_reader(self) -> PdfFileReader:
+        """
+        Spawn a new reader backed by this snapshot.
+
+        :return:
+            A :class:`.PdfFileReader` object.
+        """
+        return _SnapshotReader(self)
+
+
+class _SnapshotReader(PdfFileReader):
+
+    # noinspection PyMissingConstructor
+    def __init__(self, snapshot: PdfReaderSnapshot):
+        self._snapshot = snapshot
+        _init_from_template(
+            self, snapshot._reader, BytesIO(snapshot.data)
+        )
+
+    def get_object(self, ref, revision=None, never_decrypt=False,
+                   transparent_decrypt=True):
+        if revision is not None or self._snapshot.encrypted:
+            return super().get_object(
+                ref, revision=revision, never_decrypt=never_decrypt,
+                transparent_decrypt=transparent_decrypt
+            )
+        obj = self.cache_get_indirect_object(ref.generation, ref.idnum)
+        if obj is None:
+            obj = self._snapshot._copy_object(ref, self)
+            self.cache_indirect_object(ref.generation, ref.idnum, obj)
+        return obj
+
+
 def convert_to_int(d, size):
     if size <= 8:
         padding = bytes(8 - size)
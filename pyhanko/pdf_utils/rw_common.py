@@ -1,5 +1,67 @@
+from dataclasses import dataclass
+from typing import NamedTuple, Optional, List, Iterator
+
 from . import generic
 
+__all__ = ['PdfHandler', 'PageIndexEntry']
+
+
+class PageIndexEntry(NamedTuple):
+    """
+    Information about a page in the page tree of a PDF document.
+    """
+
+    page_ref: generic.IndirectObject
+    """
+    Reference to the page object.
+    """
+
+    parent_ref: generic.IndirectObject
+    """
+    Reference to the ``/Pages`` node containing the page.
+    """
+
+    kid_index: int
+    """
+    Index of the page in the ``/Kids`` array of its parent.
+    """
+
+    parent_resources: generic.PdfObject
+    """
+    The resource dictionary inherited from the page's ancestors.
+    """
+
+    resources: generic.PdfObject
+    """
+    The page's effective resource dictionary (possibly inherited).
+    """
+
+    media_box: Optional[generic.ArrayObject]
+    """
+    The page's effective media box (possibly inherited), if any.
+    """
+
+
+class _PageTreePosition(NamedTuple):
+    # Position of a page in the page tree, along with inherited attributes.
+    # The page's own attributes are not cached, since they're much more
+    # likely to be modified.
+    page_ref: generic.IndirectObject
+    parent_ref: generic.IndirectObject
+    kid_index: int
+    parent_resources: generic.PdfObject
+    parent_media_box: Optional[generic.ArrayObject]
+
+
+@dataclass
+class _PageIndex:
+    entries: List[_PageTreePosition]
+    page_count: int
+
+    @property
+    def complete(self):
+        return len(self.entries) == self.page_count
+
 
 class PdfHandler:
 
@@ -16,9 +78,10 @@ class PdfHandler:
         assert isinstance(root, generic.DictionaryObject)
         return root
 
-    # TODO write tests specifically for this helper function
-    def _walk_page_tree(self, page_ix, retrieve_parent):
+    _page_index: Optional['_PageIndex'] = None
+    _page_tree_visited = False
 
+    def _page_tree_root(self):
         # the spec says that this will always be an indirect reference
         page_tree_root_ref = self.root.raw_get('/Pages')
         assert isinstance(page_tree_root_ref, generic.IndirectObject)
@@ -28,31 +91,61 @@ class PdfHandler:
             root_resources = page_tree_root['/Resources']
         except KeyError:
             root_resources = generic.DictionaryObject()
+        return page_tree_root_ref, root_resources
 
-        page_count = page_tree_root['/Count']
-        if not (0 <= page_ix < page_count):
-            raise ValueError('Page index out of range')
+    @staticmethod
+    def _page_tree_node(pages_obj_ref, last_rsrc_dict, last_media_box):
+        # Read the kids of a /Pages node, and update the inherited
+        # attributes.
+        pages_obj = pages_obj_ref.get_object()
+        kids = pages_obj.raw_get('/Kids')
+        if isinstance(kids, generic.IndirectObject):
+            kids = kids.get_object()
 
-        def _recurse(first_page_ix, pages_obj_ref, last_rsrc_dict):
-            pages_obj = pages_obj_ref.get_object()
-            kids = pages_obj.raw_get('/Kids')
-            if isinstance(kids, generic.IndirectObject):
-                kids = kids.get_object()
+        try:
+            last_rsrc_dict = pages_obj.raw_get('/Resources')
+        except KeyError:
+            pass
+        last_media_box = pages_obj.get('/MediaBox', last_media_box)
+        return kids, last_rsrc_dict, last_media_box
 
-            try:
-                last_rsrc_dict = pages_obj.raw_get('/Resources')
-            except KeyError:
-                pass
+    def _iter_page_tree(self) -> Iterator[_PageTreePosition]:
 
-            cur_page_ix = first_page_ix
+        def _recurse(pages_obj_ref, last_rsrc_dict, last_media_box):
+            kids, last_rsrc_dict, last_media_box = self._page_tree_node(
+                pages_obj_ref, last_rsrc_dict, last_media_box
+            )
             for kid_index, kid_ref in enumerate(kids):
                 # If this is not the case, the child node cannot possibly have
                 # a valid /Parent entry either, so let's assume that nobody
                 # screws up their PDF generator THAT badly
                 assert isinstance(kid_ref, generic.IndirectObject)
+                node_type = kid_ref.get_object()['/Type']
+                if node_type == '/Pages':
+                    yield from _recurse(kid_ref, last_rsrc_dict, last_media_box)
+                elif node_type == '/Page':
+                    yield _PageTreePosition(
+                        page_ref=kid_ref, parent_ref=pages_obj_ref,
+                        kid_index=kid_index, parent_resources=last_rsrc_dict,
+                        parent_media_box=last_media_box
+                    )
 
-                kid = kid_ref.get_object()
+        page_tree_root_ref, root_resources = self._page_tree_root()
+        return _recurse(page_tree_root_ref, root_resources, None)
+
+    def _walk_page_tree(self, page_ix) -> _PageTreePosition:
+        # look up a single page, using the /Count entries of the /Pages
+        # nodes to skip over the branches that don't contain it
 
+        def _recurse(first_page_ix, pages_obj_ref, last_rsrc_dict,
+                     last_media_box):
+            kids, last_rsrc_dict, last_media_box = self._page_tree_node(
+                pages_obj_ref, last_rsrc_dict, last_media_box
+            )
+            cur_page_ix = first_page_ix
+            for kid_index, kid_ref in enumerate(kids):
+                assert isinstance(kid_ref, generic.IndirectObject)
+                kid = kid_ref.get_object()
                 node_type = kid['/Type']
                 if node_type == '/Pages':
                     # recurse into this branch if the page we need
@@ -60,27 +153,86 @@ class PdfHandler:
                     desc_count = kid['/Count']
                     if cur_page_ix <= page_ix < cur_page_ix + desc_count:
                         return _recurse(
-                            cur_page_ix, kid_ref, last_rsrc_dict
+                            cur_page_ix, kid_ref, last_rsrc_dict,
+                            last_media_box
                         )
                     cur_page_ix += desc_count
                 elif node_type == '/Page':
                     if cur_page_ix == page_ix:
-                        if retrieve_parent:
-                            return (
-                                pages_obj_ref, kid_index, last_rsrc_dict
-                            )
-                        else:
-                            try:
-                                last_rsrc_dict = kid.raw_get('/Resources')
-                            except KeyError:
-                                pass
-                            return kid_ref, last_rsrc_dict
-                    else:
-                        cur_page_ix += 1
+                        return _PageTreePosition(
+                            page_ref=kid_ref, parent_ref=pages_obj_ref,
+                            kid_index=kid_index,
+                            parent_resources=last_rsrc_dict,
+                            parent_media_box=last_media_box
+                        )
+                    cur_page_ix += 1
             # This means the PDF is not standards-compliant
             raise ValueError('Page not found')
 
-        return _recurse(0, page_tree_root_ref, root_resources)
+        page_tree_root_ref, root_resources = self._page_tree_root()
+        return _recurse(0, page_tree_root_ref, root_resources, None)
+
+    def _get_page_index_entry(self, page_ix) -> PageIndexEntry:
+        page_count = self.root['/Pages']['/Count']
+        if not (0 <= page_ix < page_count):
+            raise ValueError('Page index out of range')
+        index = self._page_index
+        # the page count is cheap to check, and catches most modifications
+        # to the page tree that happen behind our back
+        if index is not None and index.page_count != page_count:
+            index = self._page_index = None
+        if index is None and not self._page_tree_visited:
+            # One-off lookups (e.g. to stamp a single page) are cheaper if
+            # we only descend into the branch of the page tree that contains
+            # the page. The full index is built on the next lookup.
+            self._page_tree_visited = True
+            pos = self._walk_page_tree(page_ix)
+        else:
+            if index is None:
+                self._page_index = index = _PageIndex(
+                    entries=list(self._iter_page_tree()),
+                    page_count=page_count
+                )
+            try:
+                pos = index.entries[page_ix]
+            except IndexError:
+                # This means the PDF is not standards-compliant
+                raise ValueError('Page not found')
+        page = pos.page_ref.get_object()
+        try:
+            resources = page.raw_get('/Resources')
+        except KeyError:
+            resources = pos.parent_resources
+        return PageIndexEntry(
+            page_ref=pos.page_ref, parent_ref=pos.parent_ref,
+            kid_index=pos.kid_index, parent_resources=pos.parent_resources,
+            resources=resources,
+            media_box=page.get('/MediaBox', pos.parent_media_box)
+        )
+
+    def invalidate_page_index(self):
+        """
+        Discard the cached page index of this handler.
+        This is only necessary after modifying the page tree by hand;
+        methods like :meth:`~.writer.BasePdfFileWriter.insert_page` take care
+        of this automatically.
+        """
+        self._page_index = None
+
+    def find_page_info(self, page_ix) -> PageIndexEntry:
+        """
+        Retrieve information about the page with index page_ix.
+        The first lookup only descends into the relevant branch of the page
+        tree. After that, the page tree is indexed, so that repeated lookups
+        are done in constant time.
+
+        :param page_ix:
+            The (zero-indexed) number of the page for which we want to
+            retrieve information.
+        :return:
+            A :class:`.PageIndexEntry`.
+        """
+        return self._get_page_index_entry(page_ix)
 
     def find_page_container(self, page_ix):
         """
@@ -96,7 +248,8 @@ class PdfHandler:
             the index of the target page in said /Pages object, and a
             (possibly inherited) resource dictionary.
         """
-        return self._walk_page_tree(page_ix, retrieve_parent=True)
+        entry = self._get_page_index_entry(page_ix)
+        return entry.parent_ref, entry.kid_index, entry.parent_resources
 
     def find_page_for_modification(self, page_ix):
         """
@@ -109,4 +262,5 @@ class PdfHandler:
             A tuple with a reference to the page object and a
             (possibly inherited) resource dictionary.
         """
-        return self._walk_page_tree(page_ix, retrieve_parent=False)
+        entry = self._get_page_index_entry(page_ix)
+        return entry.page_ref, entry.resources
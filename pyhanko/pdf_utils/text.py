@@ -1,11 +1,14 @@
 import logging
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
+from enum import Enum, unique
 from fractions import Fraction
-
-from fontTools import ttLib
+from typing import Union, Tuple, Dict
 
 from pyhanko.pdf_utils.font import (
-    FontEngine, SimpleFontEngine, GlyphAccumulator
+    FontEngine, SimpleFontEngine, GlyphAccumulator, FontEngineFactory,
+    GlyphAccumulatorFactory,
 )
 from pyhanko.pdf_utils.generic import (
     pdf_name,
@@ -19,7 +22,9 @@ logger = logging.getLogger(__name__)
 
 @dataclass(frozen=True)
 class TextStyle(ConfigurableMixin):
-    font: FontEngine = field(default_factory=SimpleFontEngine.default_engine)
+    font: Union[FontEngine, FontEngineFactory] = field(
+        default_factory=SimpleFontEngine.default_engine
+    )
     font_size: int = 10
     leading: int = None
 
@@ -34,17 +39,195 @@ class TextStyle(ConfigurableMixin):
                     "'font' must be a path to an OpenType font file."
                 )
 
-            ffile = ttLib.TTFont(fc)
-            config_dict['font'] = GlyphAccumulator(ffile)
+            # the font file is only loaded once, and every text box gets
+            # its own glyph accumulator
+            config_dict['font'] = GlyphAccumulatorFactory(fc)
         except KeyError:
             pass
 
 
+@unique
+class TextAlignment(Enum):
+    LEFT = 'left'
+    CENTER = 'center'
+    RIGHT = 'right'
+
+
 @dataclass(frozen=True)
 class TextBoxStyle(TextStyle):
     text_sep: int = 10
     border_width: int = 0
     vertical_center: bool = True
+    word_wrap: bool = False
+    """
+    Break lines that don't fit within the width of the text box.
+    Only applies when the width of the box is fixed.
+    """
+
+    shrink_to_fit: bool = False
+    """
+    When wrapping text in a box of fixed height, scale the text down until
+    it fits.
+    """
+
+    alignment: TextAlignment = TextAlignment.LEFT
+    """
+    Horizontal alignment of the lines of text.
+    """
+
+    @classmethod
+    def process_entries(cls, config_dict):
+        super().process_entries(config_dict)
+        try:
+            alignment = config_dict['alignment']
+        except KeyError:
+            return
+        try:
+            config_dict['alignment'] = TextAlignment(alignment)
+        except ValueError:
+            raise ConfigurationError(
+                f"'alignment' must be one of "
+                f"{', '.join(a.value for a in TextAlignment)}."
+            )
+
+
+class TextLayoutEngine:
+    """
+    Breaks text into lines, caching measurements and results along the way.
+
+    Word widths are remembered per font, and the result of breaking a
+    paragraph at a given width is kept in a bounded LRU cache.
+    Rendering the same text repeatedly, or a template with a few varying
+    fields, therefore only measures what changed.
+    Only font engines with a :attr:`~.FontEngine.metrics_key` benefit from
+    caching.
+
+    Instances of this class are thread-safe.
+
+    :param max_entries:
+        Maximal number of line breaking results to keep.
+    :param max_words:
+        Maximal number of word widths to remember for any single font.
+    """
+
+    def __init__(self, max_entries=4096, max_words=65536):
+        self.max_entries = max_entries
+        self.max_words = max_words
+        self._word_widths: Dict[object, Dict[str, float]] = {}
+        self._line_breaks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def measure_word(self, font: FontEngine, word) -> float:
+        """
+        Measure a piece of text, in em units.
+        """
+        key = font.metrics_key
+        if key is None:
+            return font.measure(word)
+        with self._lock:
+            try:
+                widths = self._word_widths[key]
+            except KeyError:
+                widths = self._word_widths[key] = {}
+        try:
+            return widths[word]
+        except KeyError:
+            pass
+        width = font.measure(word)
+        if len(widths) >= self.max_words:
+            widths.clear()
+        widths[word] = width
+        return width
+
+    def break_lines(self, font: FontEngine, paragraph, max_width) \
+            -> Tuple[Tuple[str, float], ...]:
+        """
+        Break a paragraph into lines, filling every line as much as possible.
+        Words that are too long to fit on a line by themselves are broken
+        up at character boundaries.
+
+        :param font:
+            The font engine used to measure the text.
+        :param paragraph:
+            The text to break up. Line breaks in the text are not treated
+            specially.
+        :param max_width:
+            The maximal width of a line, in em units.
+        :return:
+            A tuple of lines, with their widths in em units.
+        """
+        key = font.metrics_key
+        if key is None:
+            return tuple(self._break_lines(font, paragraph, max_width))
+        cache_key = (key, paragraph, max_width)
+        line_breaks = self._line_breaks
+        with self._lock:
+            try:
+                result = line_breaks[cache_key]
+                line_breaks.move_to_end(cache_key)
+                return result
+            except KeyError:
+                pass
+        result = tuple(self._break_lines(font, paragraph, max_width))
+        with self._lock:
+            line_breaks[cache_key] = result
+            if len(line_breaks) > self.max_entries:
+                line_breaks.popitem(last=False)
+        return result
+
+    def _break_lines(self, font, paragraph, max_width):
+        space_width = self.measure_word(font, ' ')
+        line = []
+        line_width = 0
+        for word in paragraph.split(' '):
+            word_width = self.measure_word(font, word)
+            if line and line_width + space_width + word_width > max_width:
+                yield ' '.join(line), line_width
+                line = []
+                line_width = 0
+            if word_width > max_width:
+                chunk = ''
+                chunk_width = 0
+                for ch in word:
+                    ch_width = self.measure_word(font, ch)
+                    if chunk and chunk_width + ch_width > max_width:
+                        yield chunk, chunk_width
+                        chunk = ''
+                        chunk_width = 0
+                    chunk += ch
+                    chunk_width += ch_width
+                # the remainder of the word can be continued on
+                line = [chunk]
+                line_width = chunk_width
+                continue
+            if line:
+                line_width += space_width
+            line.append(word)
+            line_width += word_width
+        yield ' '.join(line), line_width
+
+    def clear(self):
+        """
+        Clear all caches.
+        """
+        with self._lock:
+            self._word_widths.clear()
+            self._line_breaks.clear()
+
+
+_shared_layout_engine = None
+_shared_layout_engine_lock = threading.Lock()
+
+
+def shared_layout_engine() -> TextLayoutEngine:
+    """
+    Return the process-wide text layout engine.
+    """
+    global _shared_layout_engine
+    with _shared_layout_engine_lock:
+        if _shared_layout_engine is None:
+            _shared_layout_engine = TextLayoutEngine()
+        return _shared_layout_engine
 
 
 class TextBox(PdfContent):
@@ -53,16 +236,24 @@ class TextBox(PdfContent):
                  resources: PdfResources = None,
                  box: BoxConstraints = None,
                  writer=None,
-                 font_name='F1'):
+                 font_name='F1',
+                 layout_engine: TextLayoutEngine = None):
         super().__init__(resources, writer=writer, box=box)
         self.style = style
         self._content = None
         self._scaling_factor = None
         self._content_lines = self._wrapped_lines = None
+        self._line_widths = None
+        self._natural_height = None
         self.font_name = font_name
+        font = style.font
+        if isinstance(font, FontEngineFactory):
+            font = font.create_font_engine()
+        self.font_engine: FontEngine = font
+        self.layout_engine = layout_engine or shared_layout_engine()
 
     def wrap_string(self, txt):
-        wrapped, width_em = self.style.font.render_and_measure(txt)
+        wrapped, width_em = self.font_engine.render_and_measure(txt)
         return wrapped, width_em * self.style.font_size
 
     @property
@@ -75,17 +266,21 @@ class TextBox(PdfContent):
 
     @content.setter
     def content(self, content):
-        # TODO text reflowing logic goes here
-        #  (with option to either scale things, or do word wrapping)
         self._content = content
+        if self.style.word_wrap and self.box.width_defined:
+            self._layout_wrapped(content)
+            return
 
         max_line_len = 0
         lines = []
+        line_widths = []
         for line in content.split('\n'):
             wrapped_line, line_len = self.wrap_string(line)
             max_line_len = max(max_line_len, line_len)
             lines.append(wrapped_line)
+            line_widths.append(line_len)
         self._wrapped_lines = lines
+        self._line_widths = line_widths
         self._content_lines = content.split('\n')
 
         # we give precedence to the height if the box constraints specify
@@ -99,6 +294,51 @@ class TextBox(PdfContent):
         else:
             self._scaling_factor = Fraction(self.box.width, natural_width)
 
+    def _layout_wrapped(self, content):
+        style = self.style
+        box = self.box
+        font = self.font_engine
+        engine = self.layout_engine
+        paragraphs = content.split('\n')
+        avail_width = box.width - 2 * style.text_sep
+
+        def _break(scale):
+            # break lines as if the box were 1/scale times as large
+            max_width = avail_width / (scale * style.font_size)
+            return [
+                line for paragraph in paragraphs
+                for line in engine.break_lines(font, paragraph, max_width)
+            ]
+
+        def _fits(lines_, scale):
+            height = len(lines_) * self.leading + 2 * style.text_sep
+            return height * scale <= box.height
+
+        lines = _break(1)
+        scale = 1
+        if style.shrink_to_fit and box.height_defined \
+                and not _fits(lines, 1):
+            # bisect to find (approximately) the largest scale that fits
+            lo, hi = 0, 1
+            for _ in range(12):
+                mid = (lo + hi) / 2
+                mid_lines = _break(mid)
+                if _fits(mid_lines, mid):
+                    lo = mid
+                    lines, scale = mid_lines, mid
+                else:
+                    hi = mid
+            self._scaling_factor = scale
+            self._natural_height = box.height / scale
+
+        self._content_lines = [line for line, _ in lines]
+        # rendering the lines also marks the glyphs for inclusion in the
+        # font subset, if applicable
+        self._wrapped_lines = [font.render(line) for line, _ in lines]
+        self._line_widths = [width * style.font_size for _, width in lines]
+        if not box.height_defined:
+            box.height = self.get_text_height() + 2 * style.text_sep
+
     @property
     def leading(self):
         style = self.style
@@ -111,7 +351,7 @@ class TextBox(PdfContent):
         return self.style.text_sep
 
     def text_y(self):
-        bh = self.box.height
+        bh = self._natural_height or self.box.height
         if self.style.vertical_center and self.box.height_defined:
             th = self.get_text_height()
             if th <= bh:
@@ -126,13 +366,14 @@ class TextBox(PdfContent):
 
         style = self.style
 
-        if isinstance(self.style.font, GlyphAccumulator):
+        font = self.font_engine
+        if isinstance(font, GlyphAccumulator):
             assert self.writer is not None
-            self.style.font.embed_subset(self.writer)
+            font.embed_subset(self.writer)
 
         self.set_resource(
             category=ResourceType.FONT, name=pdf_name('/' + self.font_name),
-            value=style.font.as_resource()
+            value=font.as_resource()
         )
         leading = self.leading
         if not self.box.height_defined:
@@ -159,6 +400,21 @@ class TextBox(PdfContent):
             'BT', f'/{self.font_name} {style.font_size} Tf {leading} TL',
             f'{xstart} {ystart} Td'
         ]
-        command_stream.extend(f"{wl} '" for wl in self._wrapped_lines)
+        if style.alignment == TextAlignment.LEFT:
+            command_stream.extend(f"{wl} '" for wl in self._wrapped_lines)
+        else:
+            natural_width = self.box.width if sf is None \
+                else self.box.width / sf
+            avail_width = natural_width - 2 * style.text_sep
+            centered = style.alignment == TextAlignment.CENTER
+            prev_offset = 0
+            for wl, width in zip(self._wrapped_lines, self._line_widths):
+                offset = avail_width - width
+                if centered:
+                    offset /= 2
+                command_stream.append(
+                    '%g %g Td %s Tj' % (offset - prev_offset, -leading, wl)
+                )
+                prev_offset = offset
         command_stream.append('ET')
         return ' '.join(command_stream).encode('latin-1')
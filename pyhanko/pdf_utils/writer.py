@@ -1,10 +1,13 @@
 import os
 import struct
-from hashlib import md5
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import md5, sha256
 from io import BytesIO
-from typing import Tuple, List, Union
+from itertools import chain
+from typing import Tuple, List, Union, Optional
+from weakref import WeakKeyDictionary
 
-from pyhanko.pdf_utils import generic
+from pyhanko.pdf_utils import generic, filters
 from pyhanko.pdf_utils.generic import pdf_name, pdf_string
 from pyhanko.pdf_utils.misc import peek, PdfReadError, instance_test
 from pyhanko.pdf_utils.rw_common import PdfHandler
@@ -138,32 +141,25 @@ def write_xref_table(stream, position_dict):
     return xref_location
 
 
+def _byte_width(value):
+    return max(1, (value.bit_length() + 7) // 8)
+
+
 class XRefStream(generic.StreamObject):
 
     def __init__(self, position_dict):
         super().__init__()
         self.position_dict = position_dict
-
-        # type indicator is one byte wide
-        # we use longs to indicate positions of objects (>Q)
-        # two more bytes for the generation number of an uncompressed object
-        widths = map(generic.NumberObject, (1, 8, 2))
         self.update({
-            pdf_name('/W'): generic.ArrayObject(widths),
             pdf_name('/Type'): pdf_name('/XRef'),
         })
 
-    def write_to_stream(self, stream, encryption_key):
-        # the caller is responsible for making sure that the stream
-        # is registered in the position dictionary
-        if encryption_key is not None:
-            raise ValueError('XRef streams cannot be encrypted')
-
+    def _entries(self):
+        # collect all entries as (type, field 2, field 3) tuples,
+        # together with the subsection index
         index = [0, 1]
+        entries = []
         subsections = _contiguous_xref_chunks(self.position_dict)
-        stream_content = BytesIO()
-        # write null object
-        stream_content.write(b'\x00' * 9 + b'\xff\xff')
         for first_idnum, subsection in subsections:
             index += [first_idnum, len(subsection)]
             for position, generation in subsection:
@@ -171,17 +167,55 @@ class XRefStream(generic.StreamObject):
                     # reference to object in object stream
                     assert generation == 0
                     obj_stream_num, ix = position
-                    stream_content.write(b'\x02')
-                    stream_content.write(struct.pack('>Q', obj_stream_num))
-                    stream_content.write(struct.pack('>H', ix))
+                    entries.append((2, obj_stream_num, ix))
                 else:
-                    stream_content.write(b'\x01')
-                    stream_content.write(struct.pack('>Q', position))
-                    stream_content.write(struct.pack('>H', generation))
-        index_entry = generic.ArrayObject(map(generic.NumberObject, index))
+                    entries.append((1, position, generation))
+        return index, entries
+
+    def write_to_stream(self, stream, encryption_key):
+        # the caller is responsible for making sure that the stream
+        # is registered in the position dictionary
+        if encryption_key is not None:
+            raise ValueError('XRef streams cannot be encrypted')
+
+        index, entries = self._entries()
+        # Use the smallest widths that can accommodate all entries.
+        # The type indicator is always one byte wide.
+        w2 = _byte_width(max(f2 for _, f2, _ in entries))
+        # the third column needs at least two bytes for the generation
+        # number of the null object
+        w3 = max(2, _byte_width(max(f3 for _, _, f3 in entries)))
+        row_len = 1 + w2 + w3
+
+        stream_content = BytesIO()
+        # write null object (head of the free list), with generation
+        # number 65535
+        stream_content.write(
+            bytes(1 + w2) + (65535).to_bytes(w3, 'big')
+        )
+        for xref_type, f2, f3 in entries:
+            stream_content.write(
+                bytes((xref_type,)) + f2.to_bytes(w2, 'big')
+                + f3.to_bytes(w3, 'big')
+            )
+        self.update({
+            pdf_name('/W'): generic.ArrayObject(
+                map(generic.NumberObject, (1, w2, w3))
+            ),
+            pdf_name('/Index'): generic.ArrayObject(
+                map(generic.NumberObject, index)
+            ),
+        })
+        if self.get('/Filter') == pdf_name('/FlateDecode'):
+            # apply PNG Up prediction to make the row-based data more
+            # compressible
+            self[pdf_name('/DecodeParms')] = generic.DictionaryObject({
+                pdf_name('/Predictor'): generic.NumberObject(12),
+                pdf_name('/Columns'): generic.NumberObject(row_len)
+            })
 
-        self[pdf_name('/Index')] = index_entry
         self._data = stream_content.getbuffer()
+        self._encoded_data = None
         super().write_to_stream(stream, None)
 
 
@@ -204,15 +238,193 @@ def init_xobject_dictionary(command_stream, box_width, box_height,
     }, stream_data=command_stream)
 
 
+DEDUPLICATION_TYPES = frozenset(map(pdf_name, [
+    '/Font', '/FontDescriptor', '/XObject', '/ExtGState', '/Pattern',
+    '/Shading', '/Encoding', '/Halftone', '/Mask', '/Group',
+]))
+"""
+Values of ``/Type`` for which dictionaries and streams are considered for
+deduplication. Objects of other types, such as pages or annotations,
+have an identity that matters, even when their contents are identical.
+"""
+
+_FONT_PROGRAM_SUBTYPES = frozenset(map(pdf_name, [
+    '/Type1C', '/CIDFontType0C', '/OpenType',
+]))
+
+
+def _is_font_program(stream: generic.StreamObject) -> bool:
+    # font programs (referred to by /FontFile, /FontFile2 or /FontFile3)
+    # don't have a /Type, so we go by the keys that are specific to them
+    return dict.get(stream, '/Subtype') in _FONT_PROGRAM_SUBTYPES \
+        or '/Length1' in stream
+
+_SCALAR_TYPES = (
+    generic.NullObject, generic.BooleanObject, generic.FloatObject,
+    generic.NumberObject, generic.ByteStringObject, generic.TextStringObject,
+    generic.NameObject
+)
+
+
+class _Fingerprinter:
+    # Compute content fingerprints of objects, taking into account that some
+    # references have already been identified as duplicates.
+
+    def __init__(self, duplicates):
+        self.duplicates = duplicates
+        self._stream_hashes = {}
+
+    def canonical_idnum(self, idnum):
+        duplicates = self.duplicates
+        while idnum in duplicates:
+            idnum = duplicates[idnum]
+        return idnum
+
+    def _stream_hash(self, obj: generic.StreamObject):
+        try:
+            return self._stream_hashes[id(obj)]
+        except KeyError:
+            if obj.encoded:
+                digest = ('enc', sha256(obj.encoded_data).digest())
+            else:
+                digest = ('raw', sha256(obj.data).digest())
+            self._stream_hashes[id(obj)] = digest
+            return digest
+
+    def fingerprint(self, obj):
+        # returns None if the object cannot be fingerprinted
+        if isinstance(obj, generic.IndirectObject):
+            return 'R', self.canonical_idnum(obj.idnum), obj.generation
+        elif isinstance(obj, generic.DictionaryObject):
+            entries = []
+            for k, v in dict.items(obj):
+                if k == '/Length' and isinstance(obj, generic.StreamObject):
+                    continue
+                fp = self.fingerprint(v)
+                if fp is None:
+                    return None
+                entries.append((k, fp))
+            entries.sort()
+            result = ('D', tuple(entries))
+            if isinstance(obj, generic.StreamObject):
+                result += self._stream_hash(obj)
+            return result
+        elif isinstance(obj, generic.ArrayObject):
+            entries = []
+            for v in list.__iter__(obj):
+                fp = self.fingerprint(v)
+                if fp is None:
+                    return None
+                entries.append(fp)
+            return 'A', tuple(entries)
+        elif isinstance(obj, _SCALAR_TYPES):
+            out = BytesIO()
+            obj.write_to_stream(out, None)
+            return type(obj).__name__, out.getvalue()
+        else:
+            # unknown object types (e.g. placeholders) are off limits
+            return None
+
+
+def _replace_refs(obj, handler, duplicates):
+    # replace references to duplicate objects, in-place
+    if isinstance(obj, generic.DictionaryObject):
+        for k, v in dict.items(obj):
+            if isinstance(v, generic.IndirectObject) \
+                    and v.idnum in duplicates:
+                dict.__setitem__(obj, k, generic.IndirectObject(
+                    duplicates[v.idnum], 0, handler
+                ))
+            else:
+                _replace_refs(v, handler, duplicates)
+    elif isinstance(obj, generic.ArrayObject):
+        for ix, v in enumerate(list.__iter__(obj)):
+            if isinstance(v, generic.IndirectObject) \
+                    and v.idnum in duplicates:
+                list.__setitem__(obj, ix, generic.IndirectObject(
+                    duplicates[v.idnum], 0, handler
+                ))
+            else:
+                _replace_refs(v, handler, duplicates)
+
+
+DEFAULT_OBJECT_STREAM_CHUNK_SIZE = 100
+"""
+Default maximal number of objects to put into an object stream when
+packing objects automatically.
+"""
+
+
 class BasePdfFileWriter(PdfHandler):
+    """
+    Base class for PDF writers.
+
+    :param auto_object_streams:
+        If ``True``, automatically pack all eligible objects (i.e. non-stream
+        objects with generation number zero) into object streams when
+        writing. This option is ignored when cross-reference streams are
+        disabled.
+    :param object_stream_chunk_size:
+        Maximal number of objects to put into a single object stream when
+        packing objects automatically.
+    """
     output_version = (1, 7)
 
+    compression_level: Optional[int] = None
+    """
+    Default zlib compression level for streams written by this writer.
+    If ``None``, zlib's default is used.
+    Streams can override this through
+    :attr:`~.generic.StreamObject.compression_level`.
+    """
+
+    compression_strategy: Optional[int] = None
+    """
+    Default zlib compression strategy for streams written by this writer.
+    If ``None``, zlib's default is used.
+    Streams can override this through
+    :attr:`~.generic.StreamObject.compression_strategy`.
+    """
+
+    compression_workers: Optional[int] = None
+    """
+    Maximal number of threads used to encode streams in parallel before
+    they are written. If ``None``, use the default of
+    :class:`~concurrent.futures.ThreadPoolExecutor`.
+    Set this to ``1`` to disable parallel encoding.
+    """
+
+    parallel_compression_threshold = 256 * 1024
+    """
+    Minimal amount of stream data (in bytes) that needs to be encoded before
+    parallel encoding kicks in.
+    """
+
+    deduplicate_objects = False
+    """
+    If ``True``, identical objects added in the current revision are written
+    only once, and all references to them are redirected to a single copy.
+    Deduplication is done when the output is written, so objects can
+    still be modified freely after being added to the writer.
+
+    This only applies to streams and dictionaries with
+    a ``/Type`` in :const:`DEDUPLICATION_TYPES` (e.g. images and form
+    XObjects used as resources), and to embedded font programs.
+    Other streams (such as page content streams), annotation appearance
+    streams and objects added to explicitly prepared object streams
+    are never merged.
+    """
+
     def __init__(self, root, info, document_id, obj_id_start=0,
-                 stream_xrefs=True):
+                 stream_xrefs=True, auto_object_streams=False,
+                 object_stream_chunk_size=DEFAULT_OBJECT_STREAM_CHUNK_SIZE):
         self.objects = {}
         self.object_streams: List[ObjectStream] = list()
         self.objs_in_streams = {}
         self._lastobj_id = obj_id_start
+        self._obj_id_start = obj_id_start
+        self._duplicates = {}
+        self._import_memo = WeakKeyDictionary()
         self._resolves_objs_from = (self,)
 
         if isinstance(root, generic.IndirectObject):
@@ -227,6 +439,8 @@ class BasePdfFileWriter(PdfHandler):
         self._encrypt = self._encrypt_key = None
         self._document_id = document_id
         self.stream_xrefs = stream_xrefs
+        self.auto_object_streams = auto_object_streams
+        self.object_stream_chunk_size = object_stream_chunk_size
 
     def mark_update(self, obj_ref: Union[generic.Reference,
                                          generic.IndirectObject]):
@@ -252,6 +466,11 @@ class BasePdfFileWriter(PdfHandler):
                     return self.objs_in_streams[ido.idnum]
                 except KeyError:
                     pass
+                try:
+                    canonical_idnum = self._duplicates[ido.idnum]
+                    return self.objects[(0, canonical_idnum)]
+                except KeyError:
+                    pass
             raise KeyError(ido)
 
     def add_object(self, obj, obj_stream: ObjectStream = None):
@@ -280,7 +499,154 @@ class BasePdfFileWriter(PdfHandler):
     def _write_header(self, stream):
         pass
 
+    def _appearance_stream_idnums(self):
+        # collect the appearance streams of all annotations written in this
+        # revision
+        result = set()
+
+        def _collect(obj):
+            if isinstance(obj, generic.IndirectObject):
+                result.add(obj.idnum)
+            elif isinstance(obj, generic.DictionaryObject):
+                # appearance subdictionary (one stream per state)
+                for value in obj.values():
+                    if isinstance(value, generic.IndirectObject):
+                        result.add(value.idnum)
+
+        for obj in self.objects.values():
+            if not isinstance(obj, generic.DictionaryObject):
+                continue
+            try:
+                ap_dict = obj['/AP']
+            except KeyError:
+                continue
+            for appearance in ap_dict.values():
+                _collect(appearance)
+        return result
+
+    def _dedup_eligible(self, ix, obj, excluded=frozenset()) -> bool:
+        generation, idnum = ix
+        # only consider objects that are new in this revision
+        if generation != 0 or idnum <= self._obj_id_start:
+            return False
+        if idnum in excluded:
+            return False
+        if not getattr(obj, 'object_stream_eligible', True):
+            return False
+        # Indirect arrays (e.g. /Annots or /Kids) are typically modified in
+        # place later on, so they are never merged. The same goes for
+        # untyped streams, such as page content streams.
+        if not isinstance(obj, generic.DictionaryObject):
+            return False
+        if dict.get(obj, '/Type') in DEDUPLICATION_TYPES:
+            return True
+        return isinstance(obj, generic.StreamObject) and _is_font_program(obj)
+
+    def _deduplicate(self):
+        # Annotation appearance streams are form XObjects, but they belong
+        # to their annotation, and may still be updated along with it.
+        appearance_streams = self._appearance_stream_idnums()
+        candidates = [
+            ix for ix in sorted(self.objects.keys(), key=lambda t: t[1])
+            if self._dedup_eligible(
+                ix, self.objects[ix], excluded=appearance_streams
+            )
+        ]
+        duplicates = self._duplicates
+        fingerprinter = _Fingerprinter(duplicates)
+        # Merging objects can cause the objects referring to them to become
+        # identical as well, so we keep going until nothing changes.
+        changed = True
+        while changed:
+            changed = False
+            seen = {}
+            for ix in candidates:
+                _, idnum = ix
+                if idnum in duplicates:
+                    continue
+                fp = fingerprinter.fingerprint(self.objects[ix])
+                if fp is None:
+                    continue
+                canonical = seen.setdefault(fp, idnum)
+                if canonical != idnum:
+                    duplicates[idnum] = canonical
+                    changed = True
+
+        if not duplicates:
+            return
+        # resolve chains of duplicates
+        for idnum in duplicates:
+            duplicates[idnum] = fingerprinter.canonical_idnum(idnum)
+        for idnum in duplicates:
+            self.objects.pop((0, idnum), None)
+        written = chain(self.objects.values(), self.objs_in_streams.values())
+        for obj in written:
+            _replace_refs(obj, self, duplicates)
+        if self._info is not None and self._info.idnum in duplicates:
+            self._info = generic.IndirectObject(
+                duplicates[self._info.idnum], 0, self
+            )
+
+    def _object_stream_eligible(self, ix, obj) -> bool:
+        generation, idnum = ix
+        if generation != 0 or isinstance(obj, generic.StreamObject):
+            return False
+        if self._encrypt is not None and idnum == self._encrypt.idnum:
+            return False
+        # Some objects need to know where they end up in the output file
+        # (e.g. signature dictionaries), so they have to remain
+        # top-level objects.
+        return getattr(obj, 'object_stream_eligible', True)
+
+    def _pack_object_streams(self):
+        # collect all eligible objects, and move them into object streams
+        eligible = [
+            ix for ix in sorted(self.objects.keys())
+            if self._object_stream_eligible(ix, self.objects[ix])
+        ]
+        chunk_size = self.object_stream_chunk_size
+        for chunk_start in range(0, len(eligible), chunk_size):
+            obj_stream = self.prepare_object_stream()
+            for ix in eligible[chunk_start:chunk_start + chunk_size]:
+                _, idnum = ix
+                obj = self.objects.pop(ix)
+                obj_stream.add_object(idnum, obj)
+                self.objs_in_streams[idnum] = obj
+
+    def _encode_streams(self):
+        # Encode all pending streams before serialising anything.
+        # zlib releases the GIL, so we can do this in parallel.
+        pending = [
+            obj for obj in self.objects.values()
+            if isinstance(obj, generic.StreamObject) and not obj.encoded
+        ]
+        level = self.compression_level
+        strategy = self.compression_strategy
+        total_size = sum(len(obj.data) for obj in pending)
+        if self.compression_workers == 1 \
+                or total_size < self.parallel_compression_threshold:
+            for obj in pending:
+                obj.encode(level, strategy)
+            return
+
+        big_size = filters.DEFAULT_FLATE_CHUNK_SIZE
+        with ThreadPoolExecutor(max_workers=self.compression_workers) as ex:
+            futures = [
+                ex.submit(obj.encode, level, strategy) for obj in pending
+                if len(obj.data) <= big_size
+            ]
+            # large streams are compressed in chunks on the same pool
+            for obj in pending:
+                if len(obj.data) > big_size:
+                    obj.encode(level, strategy, chunk_map=ex.map)
+            for future in futures:
+                future.result()
+
     def _write_objects(self, stream, object_position_dict):
+        if self.deduplicate_objects:
+            self._deduplicate()
+        if self.auto_object_streams and self.stream_xrefs:
+            self._pack_object_streams()
         # deal with objects in object streams first
         for obj_stream in self.object_streams:
             # first, register the object stream object
@@ -291,6 +657,8 @@ class BasePdfFileWriter(PdfHandler):
             for ix, (idnum, obj) in enumerate(obj_stream._obj_refs):
                 object_position_dict[(0, idnum)] = (stream_ref.idnum, ix)
 
+        self._encode_streams()
+
         for ix in sorted(self.objects.keys()):
             generation, idnum = ix
             obj = self.objects[ix]
@@ -413,20 +781,59 @@ class BasePdfFileWriter(PdfHandler):
             # can't use += 1 because of the way PyPDF2's generic types work
             count = parent['/Count']
             parent[pdf_name('/Count')] = generic.NumberObject(count + 1)
-            parent = parent.get('/Parent')
+            self.update_container(parent)
+            try:
+                parent = parent['/Parent']
+            except KeyError:
+                parent = None
         new_page_ref = self.add_object(new_page)
         kids.insert(kid_ix + 1, new_page_ref)
         new_page[pdf_name('/Parent')] = pages_obj_ref
         self.update_container(pages_obj)
         self.update_container(kids)
+        self._update_page_index(after, new_page_ref, pages_obj_ref, kid_ix + 1)
 
         return new_page_ref
 
+    def _update_page_index(self, after, new_page_ref, pages_obj_ref, kid_ix):
+        # update the page index after inserting a page, so bulk insertions
+        # don't require the page tree to be reindexed every time
+        page_index = self._page_index
+        if after == -1 or page_index is None or not page_index.complete:
+            # traversing the page tree while modifying it is a bad idea
+            self.invalidate_page_index()
+            return
+        index = page_index.entries
+        page_index.page_count += 1
+        # the new page is a sibling of the one at index 'after', so
+        # it inherits the same attributes
+        index.insert(after + 1, index[after]._replace(
+            page_ref=new_page_ref, parent_ref=pages_obj_ref, kid_index=kid_ix
+        ))
+        # shift the positions of the new page's siblings (these need not be
+        # contiguous in the index, since the parent can also have /Pages
+        # nodes among its kids)
+        for ix in range(after + 2, len(index)):
+            entry = index[ix]
+            if entry.parent_ref.idnum == pages_obj_ref.idnum:
+                index[ix] = entry._replace(kid_index=entry.kid_index + 1)
+
     def import_object(self, obj: generic.PdfObject) -> generic.PdfObject:
         """
         Deep-copy an object into this writer, dealing with resolving indirect
         references in the process.
 
+        Indirect objects are only imported once: the writer keeps track of
+        the objects it has imported from each source document, and
+        any subsequent references to the same object (in the same call, or in
+        later calls to :meth:`import_object` or
+        :meth:`import_page_as_xobject`) will point to the existing copy.
+        Reference cycles are preserved.
+        This assumes that the source objects aren't modified in the meantime;
+        use :meth:`reset_import_memo` if they are.
+
+        Streams are copied in encoded form, where possible.
+
         :param obj:
             The object to import.
         :return:
@@ -443,9 +850,26 @@ class BasePdfFileWriter(PdfHandler):
         # TODO check the spec for guidance on fonts. Do font identifiers have
         #  to be globally unique?
 
+        if isinstance(obj, generic.DecryptedObjectProxy):
+            obj = obj.decrypted
         if isinstance(obj, generic.IndirectObject):
-            refd = obj.get_object()
-            return self.add_object(self.import_object(refd))
+            source = obj.get_pdf_handler()
+            try:
+                memo = self._import_memo[source]
+            except KeyError:
+                memo = self._import_memo[source] = {}
+            key = (obj.idnum, obj.generation)
+            try:
+                return memo[key]
+            except KeyError:
+                pass
+            # reserve an object ID first, in case the object (indirectly)
+            # refers to itself
+            new_ref = self.add_object(generic.NullObject())
+            memo[key] = new_ref
+            self.objects[(0, new_ref.idnum)] = \
+                self.import_object(obj.get_object())
+            return new_ref
         elif isinstance(obj, generic.DictionaryObject):
             raw_dict = {k: self.import_object(v) for k, v in obj.items()}
             if isinstance(obj, generic.StreamObject):
@@ -453,16 +877,28 @@ class BasePdfFileWriter(PdfHandler):
                 # to be available in encoded form by default.
                 # By initialising the stream object in this way, we avoid
                 # a potentially costly decoding operation.
-                return generic.StreamObject(
-                    raw_dict, encoded_data=obj.encoded_data
-                )
+                if obj.encoded:
+                    return generic.StreamObject(
+                        raw_dict, encoded_data=obj.encoded_data
+                    )
+                else:
+                    return generic.StreamObject(raw_dict, stream_data=obj.data)
             else:
                 return generic.DictionaryObject(raw_dict)
         elif isinstance(obj, generic.ArrayObject):
-            return generic.ArrayObject(self.import_object(v) for v in obj)
+            return generic.ArrayObject(
+                self.import_object(v) for v in list.__iter__(obj)
+            )
         else:
             return obj
 
+    def reset_import_memo(self):
+        """
+        Forget about all objects imported so far using
+        :meth:`import_object`.
+        """
+        self._import_memo = WeakKeyDictionary()
+
     def import_page_as_xobject(self, other: PdfHandler, page_ix=0,
                                content_stream=0, inherit_filters=True):
         """
@@ -480,22 +916,12 @@ class BasePdfFileWriter(PdfHandler):
             Inherit the content stream's filters, if present.
         :return:
         """
-        page_ref, resources = other.find_page_for_modification(page_ix)
-        page_obj = page_ref.get_object()
-
-        # find the page's /MediaBox by going up the tree until we encounter it
-        pagetree_obj = page_obj
-        while True:
-            try:
-                mb = pagetree_obj['/MediaBox']
-                break
-            except KeyError:
-                try:
-                    pagetree_obj = pagetree_obj['/Parent']
-                except KeyError:  # pragma: nocover
-                    raise PdfReadError(
-                        f'Page {page_ix} does not have a /MediaBox'
-                    )
+        page_info = other.find_page_info(page_ix)
+        page_obj = page_info.page_ref.get_object()
+        resources = page_info.resources
+        mb = page_info.media_box
+        if mb is None:  # pragma: nocover
+            raise PdfReadError(f'Page {page_ix} does not have a /MediaBox')
 
         stream_dict = {
             pdf_name('/BBox'): mb,
@@ -564,7 +990,7 @@ class PageObject(generic.DictionaryObject):
 
 class PdfFileWriter(BasePdfFileWriter):
 
-    def __init__(self):
+    def __init__(self, auto_object_streams=False):
         # root object
         root = generic.DictionaryObject({
             pdf_name("/Type"): pdf_name("/Catalog"),
@@ -579,7 +1005,9 @@ class PdfFileWriter(BasePdfFileWriter):
             pdf_name('/Producer'): pdf_string(VENDOR)
         })
 
-        super().__init__(root, info, id_obj)
+        super().__init__(
+            root, info, id_obj, auto_object_streams=auto_object_streams
+        )
 
         pages = generic.DictionaryObject({
             pdf_name("/Type"): pdf_name("/Pages"),
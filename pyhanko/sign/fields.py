@@ -517,10 +517,10 @@ def _prepare_sig_field(sig_field_name, root,
         )
 
     # no signature field exists, so create one
-    sig_form_kwargs = {
-        'include_on_page': root['/Pages']['/Kids'][0],
-    }
-    sig_form_kwargs.update(**kwargs)
+    sig_form_kwargs = dict(kwargs)
+    if 'include_on_page' not in sig_form_kwargs:
+        sig_form_kwargs['include_on_page'], _ = \
+            update_writer.find_page_for_modification(0)
     sig_field = SignatureFormField(
         sig_field_name, writer=update_writer, **sig_form_kwargs
     )
@@ -620,13 +620,13 @@ def append_signature_fields(pdf_out: IncrementalPdfFileWriter,
                             sig_field_specs: List[SigFieldSpec]):
     root = pdf_out.root
 
-    page_list = root['/Pages']['/Kids']
     for sp in sig_field_specs:
+        page_ref, _ = pdf_out.find_page_for_modification(sp.on_page)
         # use default appearance
         field_created, sig_field_ref = _prepare_sig_field(
             sp.sig_field_name, root, update_writer=pdf_out,
             existing_fields_only=False, box=sp.box,
-            include_on_page=page_list[sp.on_page], lock_sig_flags=False
+            include_on_page=page_ref, lock_sig_flags=False
         )
         if not field_created:
             raise ValueError(
@@ -0,0 +1,971 @@
+"""
+Caching infrastructure for revocation information (OCSP responses and CRLs).
+
+Fetching revocation data is typically the most expensive part of building
+validation paths, and in batch processing scenarios the same CRLs and OCSP
+responses tend to be requested over and over again.
+The :class:`RevocationInfoCache` class defined here can be shared between
+any number of validation contexts (see :class:`CachingValidationContext`),
+and optionally persists its contents to disk.
+
+CRLs can be very large, so parsed CRLs are additionally shared through a
+:class:`CRLStore`, which makes sure that every distinct CRL is only loaded
+once, regardless of how many documents or validation contexts refer to it.
+Finally, :class:`ValidationPathCache` allows the outcome of certificate
+validation (i.e. the validation path, together with the revocation
+information used to validate it) to be reused for as long as that
+revocation information remains valid.
+"""
+
+import hashlib
+import logging
+import os
+import socket
+import tempfile
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent import futures
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple, Dict, Iterable, List
+from urllib.error import URLError
+
+import requests
+from asn1crypto import ocsp, crl, x509, algos, pem
+from certvalidator import ValidationContext, CertificateValidator, crl_client
+from certvalidator.errors import SoftFailError, PathBuildingError
+from certvalidator.path import ValidationPath
+
+__all__ = [
+    'RevocationInfoCache', 'CachingValidationContext',
+    'build_validation_context', 'shared_revinfo_cache',
+    'RevocationInfoFetchError', 'CRLStore', 'shared_crl_store',
+    'prefetch_ocsp_responses', 'ValidationPathCache',
+    'shared_validation_path_cache',
+]
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationInfoFetchError(IOError):
+    pass
+
+
+def _now():
+    return datetime.now(tz=timezone.utc)
+
+
+def crl_next_update(certificate_list: crl.CertificateList) \
+        -> Optional[datetime]:
+    return certificate_list['tbs_cert_list']['next_update'].native
+
+
+def ocsp_next_update(ocsp_response: ocsp.OCSPResponse) -> Optional[datetime]:
+    # we only cache responses to single-certificate queries, so there's only
+    # one SingleResponse to look at
+    basic_response = ocsp_response['response_bytes']['response'].parsed
+    responses = basic_response['tbs_response_data']['responses']
+    next_updates = [
+        resp['next_update'].native for resp in responses
+        if resp['next_update'].native is not None
+    ]
+    return min(next_updates) if next_updates else None
+
+
+def ocsp_cert_id(cert: x509.Certificate, issuer: x509.Certificate,
+                 hash_algo='sha1') -> ocsp.CertId:
+    return ocsp.CertId({
+        'hash_algorithm': algos.DigestAlgorithm({'algorithm': hash_algo}),
+        'issuer_name_hash': getattr(cert.issuer, hash_algo),
+        'issuer_key_hash': getattr(issuer.public_key, hash_algo),
+        'serial_number': cert.serial_number,
+    })
+
+
+def _successful_basic_response(ocsp_response: ocsp.OCSPResponse) -> bool:
+    if ocsp_response['response_status'].native != 'successful':
+        return False
+    response_bytes = ocsp_response['response_bytes']
+    return response_bytes['response_type'].native == 'basic_ocsp_response'
+
+
+class CRLStore:
+    """
+    Thread-safe store of parsed CRLs.
+
+    CRLs are keyed by the hash of their DER encoding, so identical CRLs
+    coming from different sources (document security stores, fetched CRLs,
+    ...) are only loaded once, and the work asn1crypto does to parse
+    their contents on demand is shared by everyone who uses them.
+
+    :param max_size:
+        Upper bound on the total size (in bytes) of the DER-encoded CRLs
+        in the store. When this size is exceeded, the least recently used
+        CRLs are evicted. CRLs larger than this bound are never retained.
+        Note that parsed CRLs take up considerably more memory than their
+        DER encoding.
+    """
+
+    def __init__(self, max_size: int = 256 * 1024 * 1024):
+        self.max_size = max_size
+        self._entries: \
+            'OrderedDict[bytes, Tuple[crl.CertificateList, int]]' \
+            = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """
+        Total size of the DER-encoded CRLs currently retained.
+        """
+        return self._size
+
+    def load(self, data: bytes) -> crl.CertificateList:
+        """
+        Load a CRL, or retrieve it from the store if it was loaded before.
+        As usual with asn1crypto, the contents of the CRL are only parsed
+        when they are accessed.
+
+        :param data:
+            The DER-encoded CRL.
+        :return:
+            A :class:`crl.CertificateList`.
+        """
+        key = hashlib.sha256(data).digest()
+        with self._lock:
+            try:
+                result, _ = self._entries[key]
+                self._entries.move_to_end(key)
+                return result
+            except KeyError:
+                pass
+
+        result = crl.CertificateList.load(data)
+        size = len(data)
+        if size > self.max_size:
+            return result
+
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                # another thread beat us to it
+                return existing[0]
+            self._entries[key] = (result, size)
+            self._size += size
+            while self._size > self.max_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+        return result
+
+    def clear(self):
+        """
+        Remove all CRLs from the store.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+_shared_crl_store = None
+_shared_crl_store_lock = threading.Lock()
+
+
+def shared_crl_store() -> CRLStore:
+    """
+    Return the process-wide CRL store.
+    """
+    global _shared_crl_store
+    with _shared_crl_store_lock:
+        if _shared_crl_store is None:
+            _shared_crl_store = CRLStore()
+        return _shared_crl_store
+
+
+class _CacheEntry:
+
+    def __init__(self, value, fetched: datetime, expires: datetime):
+        self.value = value
+        self.fetched = fetched
+        self.expires = expires
+        # for CRLs: the certificates referred to by the CRL (fetched lazily)
+        self.certs = None
+
+
+class RevocationInfoCache:
+    """
+    Thread-safe cache for CRLs and OCSP responses.
+
+    CRLs are keyed by distribution point URL, and OCSP responses are keyed
+    by certificate (issuer and serial number) and responder URL.
+    Entries are considered fresh until the ``nextUpdate`` time indicated in
+    the CRL or OCSP response (or until ``max_ttl`` has elapsed, if that is
+    sooner).
+    If ``stale_window`` is set, expired entries are still served for that
+    amount of time, while a fresh copy is fetched in the background
+    (stale-while-revalidate).
+
+    OCSP requests are sent without a nonce, since a nonce would make the
+    responses uncacheable (see also RFC 5019).
+
+    :param cache_dir:
+        If not ``None``, the cache will also be persisted in this directory.
+    :param default_ttl:
+        Lifetime of entries that don't specify a ``nextUpdate`` time.
+    :param max_ttl:
+        Upper bound on the lifetime of any entry.
+    :param stale_window:
+        Amount of time during which expired entries can still be served
+        while they are being refreshed.
+    :param timeout:
+        Timeout for HTTP requests, in seconds.
+    :param crl_store:
+        The :class:`CRLStore` used to parse CRLs.
+        Defaults to the process-wide shared store.
+    """
+
+    def __init__(self, cache_dir=None,
+                 default_ttl: timedelta = timedelta(hours=1),
+                 max_ttl: Optional[timedelta] = None,
+                 stale_window: timedelta = timedelta(0), timeout=10,
+                 crl_store: CRLStore = None):
+        self.crl_store = crl_store or shared_crl_store()
+        self.cache_dir = cache_dir
+        self.default_ttl = default_ttl
+        self.max_ttl = max_ttl
+        self.stale_window = stale_window
+        self.timeout = timeout
+        self._entries: Dict[Tuple, _CacheEntry] = {}
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+    def __getstate__(self):
+        # Only the configuration is pickled (e.g. to pass the cache to
+        # a worker process). Entries persisted to the cache directory
+        # are shared anyway.
+        state = dict(self.__dict__)
+        for key in ('crl_store', '_entries', '_lock', '_refreshing'):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.crl_store = shared_crl_store()
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+    # --- HTTP fetching logic
+
+    def _request_args(self, timeout=None, user_agent=None, headers=None):
+        headers = dict(headers or {})
+        if user_agent is not None:
+            headers['User-Agent'] = user_agent
+        return {
+            'timeout': self.timeout if timeout is None else timeout,
+            'headers': headers
+        }
+
+    def fetch_crl(self, url, timeout=None, user_agent=None) \
+            -> crl.CertificateList:
+        try:
+            response = requests.get(
+                url, **self._request_args(timeout, user_agent)
+            )
+            response.raise_for_status()
+            data = response.content
+            if pem.detect(data):
+                _, _, data = pem.unarmor(data)
+            return self.crl_store.load(data)
+        except (requests.RequestException, ValueError) as e:
+            raise RevocationInfoFetchError(
+                f'Failed to fetch CRL from {url}.', e
+            )
+
+    def fetch_ocsp(self, url, cert: x509.Certificate,
+                   issuer: x509.Certificate, timeout=None,
+                   user_agent=None) -> ocsp.OCSPResponse:
+        request = ocsp.OCSPRequest({
+            'tbs_request': ocsp.TBSRequest({
+                'request_list': ocsp.Requests([
+                    ocsp.Request({'req_cert': ocsp_cert_id(cert, issuer)})
+                ]),
+            })
+        })
+        return self.post_ocsp_request(
+            url, request, timeout=timeout, user_agent=user_agent
+        )
+
+    def post_ocsp_request(self, url, request: ocsp.OCSPRequest,
+                          timeout=None, user_agent=None) \
+            -> ocsp.OCSPResponse:
+        headers = {
+            'Accept': 'application/ocsp-response',
+            'Content-Type': 'application/ocsp-request'
+        }
+        try:
+            response = requests.post(
+                url, data=request.dump(),
+                **self._request_args(timeout, user_agent, headers)
+            )
+            response.raise_for_status()
+            return ocsp.OCSPResponse.load(response.content)
+        except (requests.RequestException, ValueError) as e:
+            raise RevocationInfoFetchError(
+                f'Failed to fetch OCSP response from {url}.', e
+            )
+
+    # --- persistence logic
+
+    def _disk_path(self, key):
+        digest = hashlib.sha256(repr(key).encode('utf8')).hexdigest()
+        return os.path.join(self.cache_dir, f'{digest}.{key[0]}')
+
+    def _load_from_disk(self, key) -> Optional[_CacheEntry]:
+        if self.cache_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            fetched = datetime.fromtimestamp(
+                os.path.getmtime(path), tz=timezone.utc
+            )
+            value = self._load_value(key[0], data)
+        except (IOError, ValueError):
+            return None
+        return self._make_entry(key[0], value, fetched)
+
+    def _save_to_disk(self, key, value):
+        if self.cache_dir is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value.dump())
+            os.replace(tmp_path, self._disk_path(key))
+        except IOError as e:  # pragma: nocover
+            logger.warning(
+                'Failed to persist revocation info cache entry: %s', e
+            )
+
+    def _load_value(self, kind, data):
+        if kind == 'crl':
+            return self.crl_store.load(data)
+        else:
+            return ocsp.OCSPResponse.load(data)
+
+    def _make_entry(self, kind, value, fetched: datetime) -> _CacheEntry:
+        if kind == 'crl':
+            next_update = crl_next_update(value)
+        else:
+            next_update = ocsp_next_update(value)
+        expires = next_update or (fetched + self.default_ttl)
+        if self.max_ttl is not None:
+            expires = min(expires, fetched + self.max_ttl)
+        return _CacheEntry(value, fetched, expires)
+
+    # --- cache logic
+
+    def _store(self, key, value):
+        entry = self._make_entry(key[0], value, _now())
+        with self._lock:
+            self._entries[key] = entry
+        self._save_to_disk(key, value)
+        return entry
+
+    def _refresh(self, key, fetch):
+        try:
+            self._store(key, fetch())
+        except RevocationInfoFetchError as e:
+            logger.warning(e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _get(self, key, fetch, cacheable=lambda v: True):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            entry = self._load_from_disk(key)
+            if entry is not None:
+                with self._lock:
+                    self._entries.setdefault(key, entry)
+
+        now = _now()
+        if entry is not None:
+            if now < entry.expires:
+                return entry.value
+            if now < entry.expires + self.stale_window:
+                # serve the stale value, and refresh in the background
+                with self._lock:
+                    start_refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start_refresh:
+                    threading.Thread(
+                        target=self._refresh, args=(key, fetch), daemon=True
+                    ).start()
+                return entry.value
+
+        value = fetch()
+        if cacheable(value):
+            self._store(key, value)
+        return value
+
+    def get_crl(self, url, timeout=None, user_agent=None) \
+            -> crl.CertificateList:
+        """
+        Retrieve the CRL published at a given URL.
+        The ``timeout`` and ``user_agent`` parameters only apply if the CRL
+        has to be fetched.
+        """
+        return self._get(
+            ('crl', url),
+            lambda: self.fetch_crl(url, timeout=timeout, user_agent=user_agent)
+        )
+
+    @staticmethod
+    def crl_urls(cert: x509.Certificate, use_deltas=True) -> List[str]:
+        """
+        List the URLs of the CRL distribution points of a certificate.
+        """
+        sources = list(cert.crl_distribution_points)
+        if use_deltas:
+            sources.extend(cert.delta_crl_distribution_points)
+        return [dp.url for dp in sources if dp.url]
+
+    def get_crls(self, cert: x509.Certificate, use_deltas=True,
+                 timeout=None, user_agent=None):
+        """
+        Retrieve all CRLs for a certificate.
+        """
+        return [
+            self.get_crl(url, timeout=timeout, user_agent=user_agent)
+            for url in self.crl_urls(cert, use_deltas)
+        ]
+
+    def get_crl_certs(self, url, timeout=None, user_agent=None) \
+            -> List[x509.Certificate]:
+        """
+        Retrieve the certificates that the CRL published at a given URL
+        refers to (e.g. the certificate of the CRL issuer).
+        These are kept in memory for as long as the CRL itself.
+        """
+        crl_ = self.get_crl(url, timeout=timeout, user_agent=user_agent)
+        key = ('crl', url)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry.value is crl_ \
+                and entry.certs is not None:
+            return entry.certs
+        try:
+            certs = crl_client.fetch_certs(
+                crl_, user_agent=user_agent,
+                timeout=self.timeout if timeout is None else timeout
+            )
+        except (URLError, socket.error) as e:
+            raise RevocationInfoFetchError(
+                f'Failed to fetch certificates for CRL from {url}.', e
+            )
+        if entry is not None and entry.value is crl_:
+            with self._lock:
+                entry.certs = certs
+        return certs
+
+    def get_ocsp(self, cert: x509.Certificate, issuer: x509.Certificate,
+                 timeout=None, user_agent=None) -> ocsp.OCSPResponse:
+        """
+        Retrieve an OCSP response for a certificate, trying all OCSP responders
+        listed in the certificate until one of them responds.
+        """
+        last_e = None
+        for url in cert.ocsp_urls:
+            key = ('ocsp', url, cert.issuer_serial)
+
+            def _fetch(url=url):
+                return self.fetch_ocsp(
+                    url, cert, issuer, timeout=timeout, user_agent=user_agent
+                )
+            try:
+                return self._get(
+                    key, _fetch,
+                    cacheable=_successful_basic_response
+                )
+            except RevocationInfoFetchError as e:
+                last_e = e
+        if last_e is None:
+            raise RevocationInfoFetchError(
+                'Certificate does not specify any OCSP responders.'
+            )
+        raise last_e
+
+    def register_ocsp(self, url, cert: x509.Certificate,
+                      ocsp_response: ocsp.OCSPResponse):
+        """
+        Add an OCSP response that was obtained by other means to the cache.
+        """
+        if _successful_basic_response(ocsp_response):
+            self._store(('ocsp', url, cert.issuer_serial), ocsp_response)
+
+    def clear(self):
+        """
+        Clear the in-memory part of the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def shared_revinfo_cache() -> RevocationInfoCache:
+    """
+    Return the process-wide revocation info cache (in-memory only).
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = RevocationInfoCache()
+        return _shared_cache
+
+
+class CachingValidationContext(ValidationContext):
+    """
+    Validation context that sources CRLs and OCSP responses from a
+    :class:`RevocationInfoCache` instead of fetching them directly.
+    Apart from that, it behaves exactly like a regular validation context.
+    In particular, the revocation data used is still available through the
+    :attr:`ocsps` and :attr:`crls` properties, so it can be embedded into
+    signatures and document security stores.
+
+    :param revinfo_cache:
+        The cache to use. Defaults to the process-wide shared cache.
+    """
+
+    def __init__(self, revinfo_cache: RevocationInfoCache = None, **kwargs):
+        self.revinfo_cache = revinfo_cache or shared_revinfo_cache()
+        super().__init__(**kwargs)
+
+    def _handle_fetch_error(self, e):
+        if self._revocation_mode == 'soft-fail':
+            self._soft_fail_exceptions.append(e)
+            raise SoftFailError()
+        raise e
+
+    def retrieve_crls(self, cert):
+        if not self._allow_fetching:
+            return self._crls
+
+        try:
+            return self._fetched_crls[cert.issuer_serial]
+        except KeyError:
+            pass
+        params = self._crl_fetch_params
+        fetch_kwargs = {
+            'timeout': params.get('timeout'),
+            'user_agent': params.get('user_agent')
+        }
+        cache = self.revinfo_cache
+        crls = []
+        errors = []
+        # distribution points are handled independently, so one broken
+        # URL doesn't prevent us from using the other CRLs
+        for url in cache.crl_urls(cert, params.get('use_deltas', True)):
+            try:
+                crls.append(cache.get_crl(url, **fetch_kwargs))
+            except RevocationInfoFetchError as e:
+                errors.append(e)
+                continue
+            # CRLs can point to certificates that are needed to validate
+            # the CRL itself; register them just like certvalidator does
+            try:
+                certs = cache.get_crl_certs(url, **fetch_kwargs)
+            except RevocationInfoFetchError as e:
+                logger.warning(e)
+                continue
+            for cert_ in certs:
+                if self.certificate_registry.add_other_cert(cert_):
+                    self._revocation_certs[cert_.issuer_serial] = cert_
+        self._fetched_crls[cert.issuer_serial] = crls
+        if errors:
+            if not crls:
+                self._handle_fetch_error(errors[0])
+            for e in errors:
+                logger.warning(e)
+        return crls
+
+    def retrieve_ocsps(self, cert, issuer):
+        if not self._allow_fetching:
+            return self._ocsps
+
+        try:
+            return self._fetched_ocsps[cert.issuer_serial]
+        except KeyError:
+            pass
+        params = self._ocsp_fetch_params
+        try:
+            ocsp_response = self.revinfo_cache.get_ocsp(
+                cert, issuer, timeout=params.get('timeout'),
+                user_agent=params.get('user_agent')
+            )
+        except RevocationInfoFetchError as e:
+            self._fetched_ocsps[cert.issuer_serial] = []
+            self._handle_fetch_error(e)
+        self._fetched_ocsps[cert.issuer_serial] = [ocsp_response]
+        # Responses can contain certificates that are useful to validate
+        # the response itself
+        self._extract_ocsp_certs(ocsp_response)
+        return [ocsp_response]
+
+
+def build_validation_context(validation_context_kwargs) -> ValidationContext:
+    """
+    Instantiate a validation context from a dictionary of keyword arguments.
+    If the dictionary contains a ``revinfo_cache`` entry, a
+    :class:`CachingValidationContext` backed by that cache is returned.
+    """
+    kwargs = dict(validation_context_kwargs)
+    revinfo_cache = kwargs.pop('revinfo_cache', None)
+    if revinfo_cache is None:
+        return ValidationContext(**kwargs)
+    return CachingValidationContext(revinfo_cache=revinfo_cache, **kwargs)
+
+
+def _ocsp_prefetch_jobs(validation_context: ValidationContext,
+                        certs: Iterable[x509.Certificate]):
+    registry = validation_context.certificate_registry
+    jobs_by_responder = defaultdict(list)
+    seen = set()
+    for cert in certs:
+        try:
+            paths = registry.build_paths(cert)
+        except PathBuildingError:
+            continue
+        for path in paths:
+            path_certs = list(path)
+            for issuer, subject in zip(path_certs, path_certs[1:]):
+                key = subject.issuer_serial
+                if key in seen or not subject.ocsp_urls \
+                        or key in validation_context._fetched_ocsps:
+                    continue
+                seen.add(key)
+                responder_url = subject.ocsp_urls[0]
+                jobs_by_responder[responder_url].append((subject, issuer))
+    return jobs_by_responder
+
+
+def prefetch_ocsp_responses(validation_context: ValidationContext,
+                            certs: Iterable[x509.Certificate],
+                            intermediate_certs=None, max_workers=None):
+    """
+    Fetch OCSP responses for all certificates in the candidate validation
+    paths of the given certificates ahead of time, and seed the validation
+    context with the results.
+
+    Certificates are grouped by OCSP responder, and the different responders
+    are queried in parallel, so validating the certificates afterwards
+    doesn't have to wait for OCSP requests one at a time.
+
+    .. note::
+        While RFC 6960 allows a single OCSP request to cover several
+        certificates, this function still sends one request per certificate,
+        so the number of round trips per responder is unchanged.
+        certvalidator only ever checks the first ``SingleResponse`` in an
+        OCSP response against the certificate being validated, and the
+        responder's signature covers the full list of responses, so a
+        batched response can't be split up into per-certificate responses
+        either. The gain comes from querying different responders
+        concurrently, and from doing so before path validation starts.
+
+    Fetching errors are not raised here. In soft-fail mode, they're recorded
+    in the validation context as usual. In other modes, the certificate in
+    question is left alone, so the error will surface again during path
+    validation.
+
+    :param validation_context:
+        The validation context to seed. This function does nothing if the
+        validation context doesn't allow fetching.
+    :param certs:
+        The (end-entity) certificates of interest.
+    :param intermediate_certs:
+        Certificates to consider when building validation paths.
+    :param max_workers:
+        Maximal number of responders to query at the same time.
+    """
+    if not validation_context._allow_fetching:
+        return
+    if intermediate_certs is not None:
+        for cert in intermediate_certs:
+            validation_context.certificate_registry.add_other_cert(cert)
+
+    jobs_by_responder = _ocsp_prefetch_jobs(validation_context, certs)
+    if not jobs_by_responder:
+        return
+
+    def _query_responder(jobs):
+        for cert, issuer in jobs:
+            try:
+                validation_context.retrieve_ocsps(cert, issuer)
+            except SoftFailError:
+                pass
+            except Exception as e:
+                # forget about the failure, so the error can be
+                # reported during path validation
+                logger.debug(
+                    "Prefetching OCSP response for %s failed: %s",
+                    cert.subject.human_friendly, e
+                )
+                validation_context._fetched_ocsps.pop(cert.issuer_serial, None)
+
+    job_lists = list(jobs_by_responder.values())
+    if len(job_lists) == 1:
+        _query_responder(job_lists[0])
+        return
+    workers = len(job_lists) if max_workers is None \
+        else min(max_workers, len(job_lists))
+    with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        # consume the results to make sure nothing goes unnoticed
+        for _ in executor.map(_query_responder, job_lists):
+            pass
+
+
+class _ValidationPathCacheEntry:
+
+    def __init__(self, path: ValidationPath, fetched_ocsps, fetched_crls,
+                 expires: datetime):
+        self.path = path
+        self.fetched_ocsps = fetched_ocsps
+        self.fetched_crls = fetched_crls
+        self.expires = expires
+
+
+class ValidationPathCache:
+    """
+    Thread-safe cache of certificate validation results.
+
+    Validating the same certificate over and over again (e.g. the signer's
+    certificate when signing many documents with the same key) involves
+    building the same validation path and checking the same revocation
+    information every time. This cache retains the validation path of a
+    certificate together with the revocation information that was collected
+    while validating it. When the certificate is validated again in a
+    validation context with the same configuration, the cached revocation
+    information is fed into that context (so it can still be embedded into
+    signatures), and path validation is skipped entirely.
+
+    Entries expire at the earliest ``nextUpdate`` time of the
+    revocation information involved, and never outlive any of the
+    certificates in the path.
+
+    .. note::
+        Only validation contexts that are allowed to fetch revocation
+        information are eligible for caching, since the validity of cached
+        results can only be judged relative to the current time.
+        Results obtained in soft-fail mode with revocation checking errors
+        are not cached either.
+
+    :param max_ttl:
+        Upper bound on the lifetime of a cache entry.
+    :param max_entries:
+        Maximal number of entries to retain.
+    """
+
+    def __init__(self, max_ttl: timedelta = timedelta(hours=1),
+                 max_entries: int = 1024):
+        self.max_ttl = max_ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple, _ValidationPathCacheEntry]' = \
+            OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(cert: x509.Certificate,
+                   validation_context: ValidationContext,
+                   key_usage, extended_key_usage):
+        if not validation_context._allow_fetching:
+            return None
+        registry = validation_context.certificate_registry
+        return (
+            cert.sha256,
+            frozenset(registry._ca_lookup.keys()),
+            frozenset(validation_context._whitelisted_certs),
+            validation_context._revocation_mode,
+            validation_context._skip_revocation_checks,
+            frozenset(validation_context.weak_hash_algos),
+            frozenset(key_usage),
+            frozenset(extended_key_usage),
+        )
+
+    def _lookup(self, key) -> Optional[_ValidationPathCacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= _now():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _make_entry(self, path: ValidationPath, fetched_ocsps,
+                    fetched_crls) -> _ValidationPathCacheEntry:
+        now = _now()
+        expiry_candidates = [now + self.max_ttl]
+        expiry_candidates.extend(
+            cert['tbs_certificate']['validity']['not_after'].native
+            for cert in path
+        )
+        for ocsp_responses in fetched_ocsps.values():
+            for ocsp_response in ocsp_responses:
+                if _successful_basic_response(ocsp_response):
+                    next_update = ocsp_next_update(ocsp_response)
+                    if next_update is not None:
+                        expiry_candidates.append(next_update)
+        for crls in fetched_crls.values():
+            for certificate_list in crls:
+                next_update = crl_next_update(certificate_list)
+                if next_update is not None:
+                    expiry_candidates.append(next_update)
+        return _ValidationPathCacheEntry(
+            path, fetched_ocsps, fetched_crls, min(expiry_candidates)
+        )
+
+    @staticmethod
+    def _seed_context(cert: x509.Certificate,
+                      entry: _ValidationPathCacheEntry,
+                      validation_context: ValidationContext):
+        registry = validation_context.certificate_registry
+        for cert in entry.path:
+            registry.add_other_cert(cert)
+        for key, ocsp_responses in entry.fetched_ocsps.items():
+            if key not in validation_context._fetched_ocsps:
+                validation_context._fetched_ocsps[key] = ocsp_responses
+                for ocsp_response in ocsp_responses:
+                    validation_context._extract_ocsp_certs(ocsp_response)
+        for key, crls in entry.fetched_crls.items():
+            validation_context._fetched_crls.setdefault(key, crls)
+        validation_context.record_validation(cert, entry.path)
+
+    def _validate_and_store(self, key, cert, validation_context,
+                            intermediate_certs, key_usage,
+                            extended_key_usage, ocsps_before, crls_before,
+                            soft_failures_before):
+        validator = CertificateValidator(
+            cert, intermediate_certs=intermediate_certs,
+            validation_context=validation_context
+        )
+        path = validator.validate_usage(key_usage, extended_key_usage)
+        soft_failed = len(validation_context._soft_fail_exceptions) \
+            > soft_failures_before
+        if key is None or soft_failed:
+            return path
+
+        # record the revocation info that was collected during validation
+        fetched_ocsps = {
+            k: v for k, v in validation_context._fetched_ocsps.items()
+            if k not in ocsps_before
+        }
+        fetched_crls = {
+            k: v for k, v in validation_context._fetched_crls.items()
+            if k not in crls_before
+        }
+        entry = self._make_entry(path, fetched_ocsps, fetched_crls)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return path
+
+    def validate(self, certs: Iterable[x509.Certificate],
+                 validation_context: ValidationContext,
+                 intermediate_certs=None, key_usage=None,
+                 extended_key_usage=None) -> List[ValidationPath]:
+        """
+        Validate a number of certificates for a particular usage, reusing
+        cached results where possible.
+        OCSP responses for all certificates that need to be validated from
+        scratch are fetched in one go (see :func:`prefetch_ocsp_responses`).
+
+        :param certs:
+            The certificates to validate.
+        :param validation_context:
+            The validation context to use.
+        :param intermediate_certs:
+            Additional certificates to consider when building validation
+            paths.
+        :param key_usage:
+            Key usage extension values to require.
+        :param extended_key_usage:
+            Extended key usage extension values to require.
+        :return:
+            A list of validation paths, one for each certificate.
+        :raises certvalidator.errors.ValidationError:
+            if one of the certificates doesn't validate.
+        """
+        certs = list(certs)
+        key_usage = set(key_usage or ())
+        extended_key_usage = set(extended_key_usage or ())
+        keys = [
+            self._cache_key(
+                cert, validation_context, key_usage, extended_key_usage
+            ) for cert in certs
+        ]
+        entries = [
+            self._lookup(key) if key is not None else None for key in keys
+        ]
+        misses = [
+            cert for cert, entry in zip(certs, entries) if entry is None
+        ]
+        # Keep track of what the validation context already knew about,
+        # so we can figure out which revocation info was collected in the
+        # process of validating our certificates.
+        # Note: soft failures while prefetching count as well, since the
+        # validation context won't attempt to fetch the revocation info
+        # in question again.
+        ocsps_before = set(validation_context._fetched_ocsps.keys())
+        crls_before = set(validation_context._fetched_crls.keys())
+        soft_failures_before = len(validation_context._soft_fail_exceptions)
+        if misses:
+            prefetch_ocsp_responses(
+                validation_context, misses,
+                intermediate_certs=intermediate_certs
+            )
+
+        paths = []
+        for cert, key, entry in zip(certs, keys, entries):
+            if entry is not None:
+                self._seed_context(cert, entry, validation_context)
+                paths.append(entry.path)
+            else:
+                paths.append(
+                    self._validate_and_store(
+                        key, cert, validation_context, intermediate_certs,
+                        key_usage, extended_key_usage,
+                        ocsps_before, crls_before, soft_failures_before
+                    )
+                )
+        return paths
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+_shared_path_cache = None
+_shared_path_cache_lock = threading.Lock()
+
+
+def shared_validation_path_cache() -> ValidationPathCache:
+    """
+    Return the process-wide validation path cache.
+    """
+    global _shared_path_cache
+    with _shared_path_cache_lock:
+        if _shared_path_cache is None:
+            _shared_path_cache = ValidationPathCache()
+        return _shared_path_cache
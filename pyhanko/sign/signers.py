@@ -1,6 +1,7 @@
 import binascii
 import hashlib
 import logging
+import os
 import uuid
 from dataclasses import dataclass
 from datetime import datetime
@@ -9,7 +10,7 @@ from typing import Optional
 
 import tzlocal
 from asn1crypto import x509, cms, core, algos, pem, keys, pdf as asn1_pdf
-from certvalidator import ValidationContext, CertificateValidator
+from certvalidator import ValidationContext
 from oscrypto import asymmetric, keys as oskeys
 
 from pyhanko.pdf_utils import generic
@@ -23,13 +24,17 @@ from pyhanko.sign.fields import (
     SigSeedValueSpec, SigSeedValFlags, SigSeedSubFilter, MDPPerm, FieldMDPSpec,
 )
 from pyhanko.sign.timestamps import TimeStamper
+from pyhanko.sign.revinfo import (
+    ValidationPathCache, shared_validation_path_cache
+)
 from pyhanko.sign.general import (
     simple_cms_attribute, CertificateStore,
     SimpleCertificateStore, SigningError,
 )
 from pyhanko.stamp import (
     TextStampStyle, TextStamp, STAMP_ART_CONTENT,
-    QRStampStyle, QRStamp,
+    QRStampStyle, QRStamp, StampAppearanceCache,
+    shared_stamp_appearance_cache,
 )
 
 __all__ = ['Signer', 'SimpleSigner', 'PdfSigner', 'sign_pdf',
@@ -107,6 +112,9 @@ class DERPlaceholder(generic.PdfObject):
 
 
 class PdfSignedData(generic.DictionaryObject):
+    # the /ByteRange and /Contents entries refer to offsets in the output file
+    object_stream_eligible = False
+
     def __init__(self, obj_type, subfilter: SigSeedSubFilter,
                  timestamp: datetime = None, bytes_reserved=None):
         if bytes_reserved is not None and bytes_reserved % 2 == 1:
@@ -215,11 +223,74 @@ class DocumentTimestamp(PdfSignedData):
         # PAdES, so we don't set those
 
 
+class _CMSTemplates:
+    """
+    DER encodings of the parts of a signer's CMS objects that don't change
+    between signatures.
+
+    The parts are stored in encoded form, and reloaded into new asn1crypto
+    objects every time they're needed. Since asn1crypto parses lazily and
+    doesn't re-encode objects that weren't modified, this is a lot cheaper
+    than constructing them from scratch.
+    """
+
+    def __init__(self, signer: 'Signer', certs):
+        signing_cert = signer.signing_cert
+        self.key = self.cache_key(signer, certs)
+        self.content_type_attr = simple_cms_attribute(
+            'content_type', 'data'
+        ).dump()
+        self.signing_certificate_attr = simple_cms_attribute(
+            'signing_certificate',
+            general.as_signing_certificate(signing_cert)
+        ).dump()
+        self.sid = cms.SignerIdentifier({
+            'issuer_and_serial_number': cms.IssuerAndSerialNumber({
+                'issuer': signing_cert.issuer,
+                'serial_number': signing_cert.serial_number,
+            })
+        }).dump()
+        self.signature_algorithm = algos.SignedDigestAlgorithm(
+            {'algorithm': signer.pkcs7_signature_mechanism}
+        ).dump()
+        self.certificates = cms.CertificateSet(
+            [cms.CertificateChoices({'certificate': c}) for c in certs]
+        ).dump()
+        self._digest_algorithms = {}
+
+    @staticmethod
+    def cache_key(signer: 'Signer', certs):
+        return (
+            signer.signing_cert.sha256, signer.pkcs7_signature_mechanism,
+            frozenset(c.sha256 for c in certs)
+        )
+
+    def digest_algorithm(self, digest_algorithm: str) -> bytes:
+        try:
+            return self._digest_algorithms[digest_algorithm]
+        except KeyError:
+            der = algos.DigestAlgorithm(
+                {'algorithm': digest_algorithm}
+            ).dump()
+            self._digest_algorithms[digest_algorithm] = der
+            return der
+
+
 class Signer:
     signing_cert: x509.Certificate
     cert_registry: CertificateStore
     pkcs7_signature_mechanism: str
 
+    use_cms_templates = False
+    """
+    If ``True``, the encoded form of the parts of the CMS signature objects
+    that are the same for every signature produced by this signer will be
+    cached, and reused between :meth:`sign` calls.
+    This saves a considerable amount of work in high-volume scenarios.
+    """
+
+    _cms_templates: Optional[_CMSTemplates] = None
+
     def sign_raw(self, data: bytes, digest_algorithm: str, dry_run=False):
         raise NotImplementedError
 
@@ -252,16 +323,47 @@ class Signer:
 
         return None
 
+    def _signer_certs(self):
+        # do not add the TS certs at this point
+        certs = set(self.cert_registry)
+        certs.add(self.signing_cert)
+        return certs
+
+    def _get_cms_templates(self, certs=None) -> Optional[_CMSTemplates]:
+        if not self.use_cms_templates:
+            return None
+        if certs is None:
+            certs = self._signer_certs()
+        templates = self._cms_templates
+        # make sure the templates are still accurate
+        key = _CMSTemplates.cache_key(self, certs)
+        if templates is None or templates.key != key:
+            templates = self._cms_templates = _CMSTemplates(self, certs)
+        return templates
+
     def signed_attrs(self, data_digest: bytes, timestamp: datetime = None,
-                     revocation_info=None, use_pades=False):
-        attrs = [
-            simple_cms_attribute('content_type', 'data'),
-            simple_cms_attribute('message_digest', data_digest),
+                     revocation_info=None, use_pades=False,
+                     templates: _CMSTemplates = None):
+        if templates is None:
+            templates = self._get_cms_templates()
+        if templates is not None:
+            content_type_attr = cms.CMSAttribute.load(
+                templates.content_type_attr
+            )
+            signing_cert_attr = cms.CMSAttribute.load(
+                templates.signing_certificate_attr
+            )
+        else:
+            content_type_attr = simple_cms_attribute('content_type', 'data')
             # required by PAdES
-            simple_cms_attribute(
+            signing_cert_attr = simple_cms_attribute(
                 'signing_certificate',
                 general.as_signing_certificate(self.signing_cert)
             )
+        attrs = [
+            content_type_attr,
+            simple_cms_attribute('message_digest', data_digest),
+            signing_cert_attr
         ]
 
         # the following attributes are only meaningful in non-PAdES signatures
@@ -281,7 +383,24 @@ class Signer:
 
         return cms.CMSAttributes(attrs)
 
-    def signer_info(self, digest_algorithm: str, signed_attrs, signature):
+    def signer_info(self, digest_algorithm: str, signed_attrs, signature,
+                    templates: _CMSTemplates = None):
+        if templates is None:
+            templates = self._get_cms_templates()
+        if templates is not None:
+            return cms.SignerInfo({
+                'version': 'v1',
+                'sid': cms.SignerIdentifier.load(templates.sid),
+                'digest_algorithm': algos.DigestAlgorithm.load(
+                    templates.digest_algorithm(digest_algorithm)
+                ),
+                'signature_algorithm': algos.SignedDigestAlgorithm.load(
+                    templates.signature_algorithm
+                ),
+                'signed_attrs': signed_attrs,
+                'signature': signature
+            })
+
         digest_algorithm_obj = algos.DigestAlgorithm(
             {'algorithm': digest_algorithm}
         )
@@ -315,17 +434,26 @@ class Signer:
         # Implementation loosely based on similar functionality in
         # https://github.com/m32/endesive/.
 
+        certs = self._signer_certs()
+        templates = self._get_cms_templates(certs)
+        # only pass the templates along if there are any, to keep overrides
+        # that predate CMS templates working
+        template_kwargs = {} if templates is None \
+            else {'templates': templates}
+
         # the piece of data we'll actually sign is a DER-encoded version of the
         # signed attributes of our message
         signed_attrs = self.signed_attrs(
             data_digest, timestamp, revocation_info=revocation_info,
-            use_pades=use_pades
+            use_pades=use_pades, **template_kwargs
         )
         signature = self.sign_raw(
             signed_attrs.dump(), digest_algorithm.lower(), dry_run
         )
 
-        sig_info = self.signer_info(digest_algorithm, signed_attrs, signature)
+        sig_info = self.signer_info(
+            digest_algorithm, signed_attrs, signature, **template_kwargs
+        )
 
         if timestamper is not None:
             # the timestamp server needs to cross-sign our signature
@@ -341,13 +469,16 @@ class Signer:
                 [simple_cms_attribute('signature_time_stamp_token', ts_token)]
             )
 
-        digest_algorithm_obj = algos.DigestAlgorithm(
-            {'algorithm': digest_algorithm}
-        )
+        if templates is not None:
+            digest_algorithm_obj = algos.DigestAlgorithm.load(
+                templates.digest_algorithm(digest_algorithm)
+            )
+            certs = cms.CertificateSet.load(templates.certificates)
+        else:
+            digest_algorithm_obj = algos.DigestAlgorithm(
+                {'algorithm': digest_algorithm}
+            )
 
-        # do not add the TS certs at this point
-        certs = set(self.cert_registry)
-        certs.add(self.signing_cert)
         # this is the SignedData object for our message (see RFC 2315 § 9.1)
         signed_data = {
             'version': 'v1',
@@ -527,10 +658,12 @@ SIG_DETAILS_DEFAULT_TEMPLATE = (
 def sign_pdf(pdf_out: IncrementalPdfFileWriter,
              signature_meta: PdfSignatureMetadata, signer: Signer,
              timestamper: TimeStamper = None,
-             existing_fields_only=False, bytes_reserved=None, in_place=False):
+             existing_fields_only=False, bytes_reserved=None, in_place=False,
+             self_verify=False):
     return PdfSigner(signature_meta, signer, timestamper).sign_pdf(
         pdf_out, existing_fields_only=existing_fields_only,
-        bytes_reserved=bytes_reserved, in_place=in_place
+        bytes_reserved=bytes_reserved, in_place=in_place,
+        self_verify=self_verify
     )
 
 
@@ -706,9 +839,17 @@ class PdfSigner(PdfTimestamper):
 
     def __init__(self, signature_meta: PdfSignatureMetadata, signer: Signer,
                  timestamper: TimeStamper = None, stamp_style=None,
-                 qr_url=None):
+                 qr_url=None,
+                 validation_path_cache: ValidationPathCache = None,
+                 appearance_cache: StampAppearanceCache = None):
         self.signature_meta = signature_meta
         self.signer = signer
+        self.appearance_cache = (
+            appearance_cache or shared_stamp_appearance_cache()
+        )
+        self.validation_path_cache = (
+            validation_path_cache or shared_validation_path_cache()
+        )
         stamp_style = stamp_style or DEFAULT_SIGNING_STAMP_STYLE
         self.stamp_style: TextStampStyle = stamp_style
 
@@ -794,13 +935,14 @@ class PdfSigner(PdfTimestamper):
             if self.qr_url is None:
                 stamp = TextStamp(
                     pdf_out, style=self.stamp_style, text_params=text_params,
-                    box=box
+                    box=box, appearance_cache=self.appearance_cache
                 )
             else:
                 assert isinstance(self.stamp_style, QRStampStyle)
                 stamp = QRStamp(
                     pdf_out, style=self.stamp_style, url=self.qr_url,
-                    text_params=text_params, box=box
+                    text_params=text_params, box=box,
+                    appearance_cache=self.appearance_cache
                 )
             sig_field[pdf_name('/AP')] = stamp.as_appearances().as_pdf_object()
             try:
@@ -926,9 +1068,90 @@ class PdfSigner(PdfTimestamper):
 
         return sv_spec
 
+    def _self_verify(self, output, sig_obj: SignatureObject,
+                     true_digest: bytes, signature_cms: cms.ContentInfo):
+        from pyhanko.sign import validation
+
+        # Check the signature we just produced using the in-memory state
+        # of the signing process: we already know the document digest,
+        # and where the /ByteRange and /Contents values ended up, so there's
+        # no need to reparse or rehash the output.
+        sig_start, sig_end = sig_obj.signature_contents.offsets
+        byte_range = sig_obj.byte_range
+        pos = output.tell()
+        output.seek(0, os.SEEK_END)
+        eof = output.tell()
+        output.seek(byte_range._range_object_offset)
+        range_expected = "[ %08d %08d %08d %08d ]" % (
+            0, sig_start, sig_end, eof - sig_end
+        )
+        range_written = output.read(len(range_expected))
+        output.seek(sig_start)
+        contents_written = output.read(sig_end - sig_start)
+        output.seek(pos)
+
+        if range_written != range_expected.encode('ascii'):
+            raise SigningError(
+                'Self-verification failed: the /ByteRange entry does not '
+                'cover the entire revision.'
+            )
+        signature_hex = binascii.hexlify(signature_cms.dump()).upper()
+        if not contents_written.startswith(b'<' + signature_hex):
+            raise SigningError(
+                'Self-verification failed: the signature embedded in the '
+                'output does not match the one that was produced.'
+            )
+
+        try:
+            integrity_info = validation._check_cms_integrity(
+                signature_cms['content'], raw_digest=true_digest
+            )
+        except (ValueError, NotImplementedError) as e:
+            raise SigningError(
+                'Self-verification failed: %s' % e
+            ) from e
+        if not integrity_info.intact:
+            raise SigningError(
+                'Self-verification failed: the message digest in the '
+                'signature does not match the document digest.'
+            )
+        if not integrity_info.valid:
+            raise SigningError(
+                'Self-verification failed: the cryptographic signature '
+                'is invalid.'
+            )
+
     def sign_pdf(self, pdf_out: IncrementalPdfFileWriter,
                  existing_fields_only=False, bytes_reserved=None,
-                 in_place=False):
+                 in_place=False, self_verify=False):
+        """
+        Sign a PDF file using the provided output writer.
+
+        :param pdf_out:
+            An :class:`.IncrementalPdfFileWriter` containing the data to sign.
+        :param existing_fields_only:
+            If ``True``, never create a new empty signature field to contain
+            the signature.
+            If ``False``, a new field may be created if no field matching
+            :attr:`~.PdfSignatureMetadata.field_name` exists.
+        :param bytes_reserved:
+            Bytes to reserve for the CMS object in the PDF file.
+            If not specified, make an estimate based on a dummy signature.
+        :param in_place:
+            Sign the input in-place. If ``False``, write output to a
+            :class:`.BytesIO` object.
+        :param self_verify:
+            If ``True``, check the cryptographic integrity of the signature
+            right after producing it, i.e. check the signature over the
+            signed attributes and the coverage of the byte range.
+            This reuses the digest and CMS object computed while signing,
+            so it is much cheaper than validating the output from scratch.
+            Certificate validation and modification analysis are not
+            part of this check.
+            A :class:`.SigningError` is raised if the check fails.
+        :return:
+            The output stream containing the signed output.
+        """
 
         timestamper = self.default_timestamper
 
@@ -948,14 +1171,13 @@ class PdfSigner(PdfTimestamper):
         signer_cert_validation_path = None
         if validation_context is not None:
             # validate cert
-            # (this also keeps track of any validation data automagically)
-            validator = CertificateValidator(
-                signer.signing_cert, intermediate_certs=signer.cert_registry,
-                validation_context=validation_context
-            )
+            # (this also keeps track of any validation data automagically,
+            # even if the validation result comes from the cache)
             # TODO allow customisation of key usage parameters
-            signer_cert_validation_path = validator.validate_usage(
-                {"non_repudiation"}
+            signer_cert_validation_path, = self.validation_path_cache.validate(
+                [signer.signing_cert], validation_context,
+                intermediate_certs=signer.cert_registry,
+                key_usage={"non_repudiation"}
             )
             validation_paths.append(signer_cert_validation_path)
 
@@ -1080,6 +1302,9 @@ class PdfSigner(PdfTimestamper):
         )
         output, sig_contents = wr.send(signature_cms)
 
+        if self_verify:
+            self._self_verify(output, sig_obj, true_digest, signature_cms)
+
         if use_pades and signature_meta.embed_validation_info:
             from pyhanko.sign import validation
             validation.DocumentSecurityStore.add_dss(
@@ -1,16 +1,24 @@
+import base64
 import hashlib
+import json
+import logging
 import struct
 import os
+import tempfile
+import threading
+import time
+from concurrent import futures
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
 
 import requests
 import tzlocal
 from asn1crypto import tsp, algos, cms, x509, keys, core
-from certvalidator import CertificateValidator
 from oscrypto import asymmetric
 
 from . import general
+from .revinfo import shared_validation_path_cache
 from .general import (
     SignatureStatus, simple_cms_attribute, CertificateStore,
     SimpleCertificateStore,
@@ -18,9 +26,12 @@ from .general import (
 
 __all__ = [
     'TimestampSignatureStatus', 'TimeStamper', 'HTTPTimeStamper',
-    'TimestampRequestError',
+    'TimestampRequestError', 'MultiTimeStamper', 'TimeStamperStats',
+    'TSAMetadataCache',
 ]
 
+logger = logging.getLogger(__name__)
+
 
 class TimestampRequestError(IOError):
     pass
@@ -60,15 +71,133 @@ def extract_ts_certs(ts_token, store: CertificateStore):
             yield c
 
 
+class TSAMetadataCache:
+    """
+    On-disk cache for the information that :meth:`TimeStamper.dummy_response`
+    collects by probing a TSA: a sample token (which determines the space to
+    reserve for timestamp tokens, and carries the TSA's certificates), and
+    the size of the largest token seen so far.
+
+    Entries are keyed by TSA URL and digest algorithm, and expire after
+    ``ttl``, or when one of the certificates in the sample token expires,
+    whichever comes first.
+    Validation paths are not stored, since they depend on the validation
+    context in use. They are recomputed from the cached certificates instead.
+
+    :param cache_dir:
+        Directory to store the cache entries in. It will be created if it
+        doesn't exist yet.
+    :param ttl:
+        Maximal lifetime of a cache entry.
+    """
+
+    def __init__(self, cache_dir, ttl: timedelta = timedelta(days=1)):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _entry_path(self, url, md_algorithm):
+        key = hashlib.sha256(f'{md_algorithm}:{url}'.encode('utf8'))
+        return os.path.join(self.cache_dir, key.hexdigest() + '.json')
+
+    def _read_entry(self, url, md_algorithm) -> Optional[dict]:
+        try:
+            with open(self._entry_path(url, md_algorithm), 'r') as f:
+                entry = json.load(f)
+            expires = datetime.fromisoformat(entry['expires'])
+        except (IOError, ValueError, KeyError):
+            return None
+        # guard against hash collisions
+        if entry.get('url') != url \
+                or entry.get('md_algorithm') != md_algorithm:
+            return None
+        if expires <= datetime.now(tz=timezone.utc):
+            return None
+        return entry
+
+    def _write_entry(self, url, md_algorithm, entry):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write to a temporary file first, so concurrent readers never see
+        # a partially written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._entry_path(url, md_algorithm))
+        except IOError as e:  # pragma: nocover
+            logger.warning('Failed to write TSA metadata cache entry: %s', e)
+            try:
+                os.unlink(tmp_path)
+            except IOError:
+                pass
+
+    def get(self, url, md_algorithm) -> Optional[cms.ContentInfo]:
+        """
+        Retrieve a cached sample token for a TSA.
+
+        :return:
+            A timestamp token, or ``None`` if there is no valid cache entry.
+        """
+        entry = self._read_entry(url, md_algorithm)
+        if entry is None:
+            return None
+        return cms.ContentInfo.load(base64.b64decode(entry['token']))
+
+    def put(self, url, md_algorithm, token: cms.ContentInfo):
+        """
+        Store a sample token for a TSA.
+        """
+        now = datetime.now(tz=timezone.utc)
+        expires = now + self.ttl
+        for wrapped_cert in token['content']['certificates']:
+            not_after = wrapped_cert.chosen.not_valid_after
+            expires = min(expires, not_after)
+        token_bytes = token.dump()
+        entry = {
+            'url': url, 'md_algorithm': md_algorithm,
+            'expires': expires.isoformat(),
+            'token': base64.b64encode(token_bytes).decode('ascii'),
+            'token_size': len(token_bytes)
+        }
+        self._write_entry(url, md_algorithm, entry)
+
+    def record_token(self, url, md_algorithm, token: cms.ContentInfo):
+        """
+        Update the token size statistics for a TSA.
+        The sample token is replaced whenever the TSA returns a token that is
+        larger than the one on file, so that space estimates based on the
+        sample token err on the safe side.
+        """
+        entry = self._read_entry(url, md_algorithm)
+        if entry is None or entry.get('token_size', 0) < len(token.dump()):
+            self.put(url, md_algorithm, token)
+
+
 class TimeStamper:
     """
     Class to make RFC3161 timestamp requests
+
+    :param metadata_cache:
+        Optional persistent cache for the information gathered by
+        :meth:`dummy_response`. Only used by timestampers that define a
+        :meth:`cache_key`.
     """
 
-    def __init__(self):
+    def __init__(self, metadata_cache: TSAMetadataCache = None):
         self._dummy_response_cache = {}
         self._certs = {}
         self.cert_registry = SimpleCertificateStore()
+        self.metadata_cache = metadata_cache
+
+    def cache_key(self) -> Optional[str]:
+        """
+        Identifier for the TSA used by this timestamper in the metadata cache.
+        ``None`` disables persistent caching.
+        """
+        return None
+
+    def _register_certs(self, ts_token):
+        for cert in extract_ts_certs(ts_token, self.cert_registry):
+            self._certs[cert.issuer_serial] = cert
 
     def dummy_response(self, md_algorithm):
         # different hashes have different sizes, so the dummy responses
@@ -77,21 +206,26 @@ class TimeStamper:
             return self._dummy_response_cache[md_algorithm]
         except KeyError:
             pass
-        md = getattr(hashlib, md_algorithm)()
-        dummy = self.timestamp(md.digest(), md_algorithm)
+        key = self.cache_key()
+        use_cache = self.metadata_cache is not None and key is not None
+        dummy = self.metadata_cache.get(key, md_algorithm) \
+            if use_cache else None
+        if dummy is None:
+            md = getattr(hashlib, md_algorithm)()
+            # timestamp() takes care of updating the persistent cache
+            dummy = self.timestamp(md.digest(), md_algorithm)
         self._dummy_response_cache[md_algorithm] = dummy
-        for cert in extract_ts_certs(dummy, self.cert_registry):
-            self._certs[cert.issuer_serial] = cert
+        self._register_certs(dummy)
         return dummy
 
     def validation_paths(self, validation_context):
-        for cert in self._certs.values():
-            validator = CertificateValidator(
-                cert,
-                intermediate_certs=self.cert_registry,
-                validation_context=validation_context
-            )
-            yield validator.validate_usage(set(), {"time_stamping"})
+        # validation results for TSA certificates are cached, and the OCSP
+        # requests for the remaining ones are sent out in one go
+        yield from shared_validation_path_cache().validate(
+            self._certs.values(), validation_context,
+            intermediate_certs=self.cert_registry,
+            extended_key_usage={"time_stamping"}
+        )
 
     def request_cms(self, message_digest, md_algorithm):
         # see also
@@ -116,6 +250,13 @@ class TimeStamper:
         raise NotImplementedError
 
     def timestamp(self, message_digest, md_algorithm):
+        tst = self._timestamp(message_digest, md_algorithm)
+        key = self.cache_key()
+        if self.metadata_cache is not None and key is not None:
+            self.metadata_cache.record_token(key, md_algorithm, tst)
+        return tst
+
+    def _timestamp(self, message_digest, md_algorithm):
         nonce, req = self.request_cms(message_digest, md_algorithm)
         res = self.request_tsa_response(req)
         pki_status_info = res['status']
@@ -246,13 +387,17 @@ class DummyTimeStamper(TimeStamper):
 
 class HTTPTimeStamper(TimeStamper):
 
-    def __init__(self, url, https=False, timeout=5, auth=None, headers=None):
+    def __init__(self, url, https=False, timeout=5, auth=None, headers=None,
+                 metadata_cache: TSAMetadataCache = None):
         self.url = url
         self.https = https
         self.timeout = timeout
         self.auth = auth
         self.headers = headers
-        super().__init__()
+        super().__init__(metadata_cache=metadata_cache)
+
+    def cache_key(self):
+        return self.url
 
     def request_headers(self):
         headers = self.headers or {}
@@ -274,3 +419,204 @@ class HTTPTimeStamper(TimeStamper):
                 'Timestamp server response is malformed.', raw_res
             )
         return tsp.TimeStampResp.load(raw_res.content)
+
+
+@dataclass
+class TimeStamperStats:
+    """
+    Running latency and error statistics for a single TSA endpoint.
+    Both figures are exponentially weighted moving averages, so endpoints
+    that recover from an outage regain their position over time.
+    """
+
+    requests: int = 0
+    errors: int = 0
+    avg_latency: Optional[float] = None
+    error_rate: float = 0.0
+
+    def record(self, latency: Optional[float], weight: float):
+        self.requests += 1
+        failed = latency is None
+        if failed:
+            self.errors += 1
+        else:
+            self.avg_latency = latency if self.avg_latency is None else (
+                weight * latency + (1 - weight) * self.avg_latency
+            )
+        self.error_rate = weight * failed + (1 - weight) * self.error_rate
+
+    @property
+    def preference_key(self):
+        # endpoints we haven't heard back from yet sort after the ones
+        # with a known latency (but before ones that are known to be broken)
+        latency = float('inf') if self.avg_latency is None \
+            else self.avg_latency
+        return round(self.error_rate, 2), latency
+
+
+class MultiTimeStamper(TimeStamper):
+    """
+    Composite timestamper that spreads requests over several TSAs.
+
+    A request is first sent to the preferred TSA. If no response arrives
+    within ``hedge_delay`` seconds, a hedged request is sent to the next TSA
+    in line (and so on), and the first valid token to come back is used.
+    Failing TSAs are skipped immediately.
+    Each underlying timestamper validates the nonce in its own response, so
+    any token returned by this class matches the request that produced it.
+
+    The preference order is adjusted over time based on the observed latency
+    and error rate of each endpoint.
+
+    :param timestampers:
+        The underlying timestampers, in order of initial preference.
+    :param hedge_delay:
+        Number of seconds to wait for a response before firing off a hedged
+        request to the next TSA.
+    :param stats_weight:
+        Weight given to new observations in the latency and error rate
+        moving averages.
+
+    Requests are dispatched on a thread pool owned by the timestamper.
+    Call :meth:`close` (or use the timestamper as a context manager) to
+    shut it down when it is no longer needed.
+    """
+
+    def __init__(self, timestampers: Iterable[TimeStamper],
+                 hedge_delay: float = 1.0, stats_weight: float = 0.3):
+        self.timestampers: List[TimeStamper] = list(timestampers)
+        if not self.timestampers:
+            raise ValueError('At least one timestamper is required.')
+        self.hedge_delay = hedge_delay
+        self.stats_weight = stats_weight
+        self.stats = [TimeStamperStats() for _ in self.timestampers]
+        self._stats_lock = threading.Lock()
+        self._executor = None
+        super().__init__()
+
+    @property
+    def executor(self) -> futures.Executor:
+        # Losing hedged requests are allowed to run to completion in the
+        # background, so that their latency can still be recorded.
+        # Hence, the executor has to outlive individual calls.
+        if self._executor is None:
+            self._executor = futures.ThreadPoolExecutor(
+                max_workers=2 * len(self.timestampers),
+                thread_name_prefix='tsa'
+            )
+        return self._executor
+
+    def close(self, wait=True):
+        """
+        Shut down the thread pool used to dispatch requests.
+        The timestamper can still be used afterwards; a new pool is created
+        when necessary.
+
+        :param wait:
+            Wait for outstanding (hedged) requests to complete.
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def ranked_timestampers(self) -> List[int]:
+        """
+        Return the indices of the underlying timestampers, most preferred
+        first.
+        """
+        with self._stats_lock:
+            keys = [st.preference_key for st in self.stats]
+        # sorted() is stable, so ties are broken by the configured order
+        return sorted(range(len(self.timestampers)), key=keys.__getitem__)
+
+    def _call_endpoint(self, ix, fun):
+        start = time.monotonic()
+        try:
+            result = fun(self.timestampers[ix])
+        except Exception:
+            with self._stats_lock:
+                self.stats[ix].record(None, self.stats_weight)
+            raise
+        with self._stats_lock:
+            self.stats[ix].record(time.monotonic() - start, self.stats_weight)
+        return result
+
+    def dummy_response(self, md_algorithm):
+        try:
+            return self._dummy_response_cache[md_algorithm]
+        except KeyError:
+            pass
+        # Ask all TSAs in parallel: we need all of their certificates
+        # to compute validation paths, and the token size estimate has to
+        # accommodate whichever TSA ends up answering the real request.
+        pending = [
+            self.executor.submit(
+                self._call_endpoint, ix,
+                lambda ts: ts.dummy_response(md_algorithm)
+            ) for ix in range(len(self.timestampers))
+        ]
+        dummy = None
+        errors = []
+        for fut in pending:
+            try:
+                token = fut.result()
+            except (IOError, ValueError) as e:
+                errors.append(e)
+                continue
+            self._register_certs(token)
+            if dummy is None or len(token.dump()) > len(dummy.dump()):
+                dummy = token
+        if dummy is None:
+            raise TimestampRequestError(
+                'None of the time stamping authorities responded.', errors
+            )
+        for e in errors:
+            logger.warning('Time stamping authority unavailable: %s', e)
+        self._dummy_response_cache[md_algorithm] = dummy
+        return dummy
+
+    def timestamp(self, message_digest, md_algorithm):
+        ranking = self.ranked_timestampers()
+        pending = set()
+        errors = []
+
+        def _launch_next():
+            ix = ranking.pop(0)
+            pending.add(
+                self.executor.submit(
+                    self._call_endpoint, ix,
+                    lambda ts: ts.timestamp(message_digest, md_algorithm)
+                )
+            )
+
+        _launch_next()
+        while pending:
+            done, pending = futures.wait(
+                pending, timeout=self.hedge_delay if ranking else None,
+                return_when=futures.FIRST_COMPLETED
+            )
+            if not done:
+                # no response yet -> fire off a hedged request
+                _launch_next()
+                continue
+            for fut in done:
+                try:
+                    token = fut.result()
+                except (IOError, ValueError) as e:
+                    errors.append(e)
+                    continue
+                self._register_certs(token)
+                return token
+            # everything that came back failed, so fail over right away
+            if ranking:
+                _launch_next()
+        raise TimestampRequestError(
+            'None of the time stamping authorities returned a valid token.',
+            errors
+        )
@@ -2,14 +2,20 @@ import hashlib
 import os
 import logging
 import re
-from collections import namedtuple
+import threading
+import time
+from collections import namedtuple, deque
+from concurrent import futures
 from dataclasses import dataclass, field as data_field
 from datetime import datetime
 from enum import Enum, unique
-from typing import TypeVar, Type, Optional, Set
+from typing import (
+    TypeVar, Type, Optional, Set, FrozenSet, List, Iterable, Iterator, Dict,
+    Tuple,
+)
 
 from asn1crypto import (
-    cms, tsp, ocsp as asn1_ocsp, pdf as asn1_pdf, crl as asn1_crl
+    cms, tsp, ocsp as asn1_ocsp, pdf as asn1_pdf
 )
 from asn1crypto.x509 import Certificate
 from certvalidator import ValidationContext, CertificateValidator
@@ -22,7 +28,7 @@ from pyhanko.pdf_utils.generic import pdf_name
 from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
 from pyhanko.pdf_utils.misc import OrderedEnum, LazyJoin
 from pyhanko.pdf_utils.reader import (
-    PdfFileReader, XRefCache, process_data_at_eof,
+    PdfFileReader, XRefCache, process_data_at_eof, PdfReaderSnapshot,
 )
 from pyhanko.pdf_utils.rw_common import PdfHandler
 from .fields import MDPPerm, FieldMDPSpec
@@ -30,11 +36,15 @@ from .general import (
     SignatureStatus, find_cms_attribute,
     UnacceptableSignerError,
 )
+from .revinfo import build_validation_context, shared_crl_store
 from .timestamps import TimestampSignatureStatus
 
 __all__ = [
     'PdfSignatureStatus', 'validate_pdf_signature', 'validate_cms_signature',
-    'read_certification_data', 'validate_pdf_ltv_signature'
+    'read_certification_data', 'validate_pdf_ltv_signature',
+    'RevisionDiff', 'DocumentValidationSession',
+    'SignatureValidationResult', 'validate_all_signatures',
+    'DocumentValidationReport', 'validate_documents'
 ]
 
 logger = logging.getLogger(__name__)
@@ -82,14 +92,20 @@ def partition_certs(certs, signer_info):
 StatusType = TypeVar('StatusType', bound=SignatureStatus)
 
 
-def _validate_cms_signature(signed_data: cms.SignedData,
-                            status_cls: Type[StatusType] = SignatureStatus,
-                            raw_digest: bytes = None,
-                            validation_context: ValidationContext = None,
-                            status_kwargs: dict = None,
-                            externally_invalid=False):
+CMSIntegrityInfo = namedtuple(
+    'CMSIntegrityInfo', [
+        'signing_cert', 'ca_chain', 'md_algorithm',
+        'pkcs7_signature_mechanism', 'intact', 'valid'
+    ]
+)
+
+
+def _check_cms_integrity(signed_data: cms.SignedData,
+                         raw_digest: bytes = None) -> CMSIntegrityInfo:
     """
-    Validate CMS and PKCS#7 signatures.
+    Perform the purely cryptographic part of CMS signature validation,
+    i.e. check the message digest and the signature over the signed
+    attributes. No certificate validation is performed.
     """
 
     certs = [c.parse() for c in signed_data['certificates']]
@@ -152,6 +168,27 @@ def _validate_cms_signature(signed_data: cms.SignedData,
         except SignatureError:
             valid = False
 
+    return CMSIntegrityInfo(
+        signing_cert=cert, ca_chain=ca_chain, md_algorithm=md_algorithm,
+        pkcs7_signature_mechanism=mechanism, intact=intact, valid=valid
+    )
+
+
+def _validate_cms_signature(signed_data: cms.SignedData,
+                            status_cls: Type[StatusType] = SignatureStatus,
+                            raw_digest: bytes = None,
+                            validation_context: ValidationContext = None,
+                            status_kwargs: dict = None,
+                            externally_invalid=False):
+    """
+    Validate CMS and PKCS#7 signatures.
+    """
+
+    integrity_info = _check_cms_integrity(signed_data, raw_digest)
+    cert = integrity_info.signing_cert
+    ca_chain = integrity_info.ca_chain
+    valid = integrity_info.valid
+
     # if the signature is invalid for some external reason, this flag is set
     #  (e.g. when the thing being signed is itself wrong)
     valid &= not externally_invalid
@@ -167,8 +204,9 @@ def _validate_cms_signature(signed_data: cms.SignedData,
 
     status_kwargs = status_kwargs or {}
     status_kwargs.update(
-        intact=intact, ca_chain=ca_chain, valid=valid, signing_cert=cert,
-        md_algorithm=md_algorithm, pkcs7_signature_mechanism=mechanism,
+        intact=integrity_info.intact, ca_chain=ca_chain, valid=valid,
+        signing_cert=cert, md_algorithm=integrity_info.md_algorithm,
+        pkcs7_signature_mechanism=integrity_info.pkcs7_signature_mechanism,
         revoked=revoked, usage_ok=usage_ok, trusted=trusted,
         validation_path=path
     )
@@ -346,11 +384,252 @@ class SuspiciousModification(ValueError):
     pass
 
 
+@dataclass(frozen=True)
+class RevisionDiff:
+    """
+    Result of comparing a revision of a document with an earlier signed
+    revision.
+    """
+
+    modification_level: ModificationLevel
+    """
+    The modification level of the changes.
+    """
+
+    explained_refs_lta: FrozenSet[generic.Reference]
+    """
+    References in the revision that were cleared as LTA updates.
+    """
+
+    explained_refs_formfill: FrozenSet[generic.Reference]
+    """
+    References in the revision that were cleared as form filling.
+    """
+
+
+def _field_mdp_key(field_mdp_spec: Optional[FieldMDPSpec]):
+    if field_mdp_spec is None:
+        return None
+    fields = field_mdp_spec.fields
+    return field_mdp_spec.action, None if fields is None else tuple(fields)
+
+
+def _detach(ref: generic.Reference) -> generic.Reference:
+    # drop the PDF handler, so the reference doesn't keep a reader alive
+    return generic.Reference(ref.idnum, ref.generation)
+
+
+def _detach_all(refs) -> FrozenSet[generic.Reference]:
+    return frozenset(_detach(ref) for ref in refs)
+
+
+@dataclass(frozen=True)
+class _PageTreeSummary:
+    kids: Dict[generic.Reference, Tuple[generic.Reference, ...]]
+    """
+    The /Kids of every intermediate node in the page tree.
+    """
+
+    annots: Dict[
+        generic.Reference,
+        Tuple[Optional[generic.Reference], FrozenSet[generic.Reference]]
+    ]
+    """
+    For every page with an /Annots entry: the reference to the /Annots
+    array (if it is an indirect object), and the annotations on the page.
+    """
+
+
+def _summarise_page_tree(resolver, page_root_ref) -> _PageTreeSummary:
+    kids = {}
+    annots = {}
+
+    def _walk(node_ref):
+        node = resolver(node_ref)
+        node_kids = node.raw_get('/Kids')
+        if isinstance(node_kids, generic.IndirectObject):
+            node_kids = resolver(node_kids.reference)
+        kid_refs = kids[_detach(node_ref)] = tuple(
+            _detach(kid.reference) for kid in node_kids
+        )
+        for kid_ref in kid_refs:
+            kid = resolver(kid_ref)
+            node_type = kid['/Type']
+            if node_type == '/Pages':
+                _walk(kid_ref)
+            elif node_type == '/Page':
+                try:
+                    page_annots = kid.raw_get('/Annots')
+                except KeyError:
+                    continue
+                annots_ref = None
+                if isinstance(page_annots, generic.IndirectObject):
+                    annots_ref = page_annots.reference
+                    page_annots = resolver(annots_ref)
+                annots[kid_ref] = (
+                    None if annots_ref is None else _detach(annots_ref),
+                    _detach_all(c.reference for c in page_annots)
+                )
+
+    _walk(page_root_ref)
+    return _PageTreeSummary(kids=kids, annots=annots)
+
+
+class _RevisionSummary:
+    """
+    Facts about a single revision of a document that don't depend on the
+    revision it is compared with.
+    Only (detached) references and names are retained, so a summary can be
+    used with any reader for the same document.
+    """
+
+    def __init__(self, reader: PdfFileReader, revision: int):
+        xrefs = reader.xrefs
+        self.revision = revision
+        self.explicit_refs = _detach_all(
+            xrefs.explicit_refs_in_revision(revision)
+        )
+        self.object_streams = _detach_all(
+            xrefs.object_streams_used_in(revision)
+        )
+        xref_start, _ = xrefs.get_xref_container_info(revision)
+        self.xref_stream_ref = (
+            _detach(xref_start) if isinstance(xref_start, generic.Reference)
+            else None
+        )
+        # updates to /Info must be through indirect objects, so we only
+        # keep track of the reference
+        try:
+            info = reader.trailer.raw_get('/Info', revision=revision)
+            self.info_ref = _detach(info.reference)
+        except (KeyError, AttributeError):
+            self.info_ref = None
+        self._field_splits = {}
+        self._page_trees = {}
+        self._lock = threading.Lock()
+
+    def split_fields(self, resolver, field_list):
+        """
+        Memoised version of :func:`_split_sig_fields`.
+        """
+        try:
+            key = tuple(_detach(f.reference) for f in field_list)
+        except AttributeError:
+            return _split_sig_fields(resolver, field_list)
+        with self._lock:
+            result = self._field_splits.get(key)
+        if result is None:
+            result = tuple(
+                {
+                    None if name is None else str(name): _detach(ref)
+                    for name, ref in fields.items()
+                } for fields in _split_sig_fields(resolver, field_list)
+            )
+            with self._lock:
+                result = self._field_splits.setdefault(key, result)
+        return result
+
+    def page_tree(self, resolver, page_root_ref) -> _PageTreeSummary:
+        key = _detach(page_root_ref)
+        with self._lock:
+            result = self._page_trees.get(key)
+        if result is None:
+            result = _summarise_page_tree(resolver, page_root_ref)
+            with self._lock:
+                result = self._page_trees.setdefault(key, result)
+        return result
+
+
+class DocumentValidationSession:
+    """
+    Integrity analysis shared by all signatures in a document.
+
+    Every signature compares the revisions following the one it signed
+    with its own signed revision. The session computes each of those
+    comparisons only once, no matter how many :class:`.EmbeddedPdfSignature`
+    objects ask for it. In addition, the parts of the analysis that only
+    depend on a single revision (e.g. the object references it contains,
+    or the layout of its form and page trees) are shared between all
+    comparisons involving that revision, even if they concern different
+    signatures.
+
+    A session doesn't hold on to any reader. Any number of readers can use
+    the same session concurrently, provided that they all read the same
+    document.
+    """
+
+    def __init__(self):
+        self._diffs = {}
+        self._summaries = {}
+        self._lock = threading.Lock()
+
+    def _revision_summary(self, reader: PdfFileReader, revision: int) \
+            -> _RevisionSummary:
+        with self._lock:
+            summary = self._summaries.get(revision)
+        if summary is None:
+            summary = _RevisionSummary(reader, revision)
+            with self._lock:
+                summary = self._summaries.setdefault(revision, summary)
+        return summary
+
+    def diff_revision(self, reader: PdfFileReader, signed_revision: int,
+                      revision: int, field_mdp_spec: FieldMDPSpec = None) \
+            -> RevisionDiff:
+        """
+        Compare a revision with an earlier signed revision.
+
+        :param reader:
+            A reader for the document.
+        :param signed_revision:
+            The signed revision.
+        :param revision:
+            The revision to compare with ``signed_revision``.
+        :param field_mdp_spec:
+            The /FieldMDP settings of the signature, if any.
+        :return:
+            A :class:`.RevisionDiff`.
+        :raises SuspiciousModification:
+            if the revision contains changes that can't be accounted for.
+        """
+        key = (signed_revision, revision, _field_mdp_key(field_mdp_spec))
+        with self._lock:
+            result = self._diffs.get(key)
+        if result is None:
+            # If two threads get here at the same time, the work is done
+            # twice, but that's preferable to holding the lock while
+            # analysing the document.
+            try:
+                result = _diff_revision(
+                    reader, self._revision_summary(reader, signed_revision),
+                    self._revision_summary(reader, revision), field_mdp_spec
+                )
+            except SuspiciousModification as e:
+                # don't hang on to the traceback, since it refers to
+                # the reader
+                result = SuspiciousModification(*e.args)
+            with self._lock:
+                result = self._diffs.setdefault(key, result)
+        if isinstance(result, SuspiciousModification):
+            # raise a copy, so the cached exception doesn't get a traceback
+            raise SuspiciousModification(*result.args)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._diffs.clear()
+            self._summaries.clear()
+
+
 class EmbeddedPdfSignature:
 
     def __init__(self, reader: PdfFileReader,
-                 sig_field: generic.DictionaryObject):
+                 sig_field: generic.DictionaryObject,
+                 session: DocumentValidationSession = None):
         self.reader = reader
+        if session is None:
+            session = DocumentValidationSession()
+        self.session = session
         if isinstance(sig_field, generic.IndirectObject):
             sig_field = sig_field.get_object()
         self.sig_field = sig_field
@@ -427,8 +706,6 @@ class EmbeddedPdfSignature:
     def compute_integrity_info(self, skip_diff=False):
         self.compute_digest()
 
-        # TODO in scenarios where we have to verify multiple signatures, we're
-        #  doing a lot of double work here. This could be improved.
         self.coverage = self.evaluate_signature_coverage()
         if not skip_diff:
             self.modification_level = self.evaluate_modifications()
@@ -595,245 +872,220 @@ class EmbeddedPdfSignature:
         return current_max
 
     def _mod_level_for_revision(self, revision) -> ModificationLevel:
-        # refs in this set are cleared at level LTA_UPDATES
-        explained_refs_lta = set()
-        # refs in this set are cleared at level FORM_FILLING
-        explained_refs_formfill = set()
-        signed_revision = self.signed_revision
-        signed_root = self.reader.get_historical_root(signed_revision)
-        current_root = self.reader.get_historical_root(revision)
-
-        signed_resolver = self.reader.get_historical_resolver(signed_revision)
-        current_resolver = self.reader.get_historical_resolver(revision)
-
-        whitelist_lta_if_fresh = _whitelist_callback(
-            explained_refs_lta, signed_revision, self.reader.xrefs
+        diff = self.session.diff_revision(
+            self.reader, self.signed_revision, revision, self.fieldmdp
         )
+        return diff.modification_level
+
+
+def _diff_revision(reader: PdfFileReader, signed_summary: _RevisionSummary,
+                   current_summary: _RevisionSummary,
+                   field_mdp_spec) -> RevisionDiff:
+    signed_revision = signed_summary.revision
+    revision = current_summary.revision
+    # refs in this set are cleared at level LTA_UPDATES
+    explained_refs_lta = set()
+    # refs in this set are cleared at level FORM_FILLING
+    explained_refs_formfill = set()
+    signed_root = reader.get_historical_root(signed_revision)
+    current_root = reader.get_historical_root(revision)
+
+    signed_resolver = reader.get_historical_resolver(signed_revision)
+    current_resolver = reader.get_historical_resolver(revision)
+
+    whitelist_lta_if_fresh = _whitelist_callback(
+        explained_refs_lta, signed_revision, reader.xrefs
+    )
 
-        # whitelist the xref stream, if there is one
-        xref_start, _ = self.reader.xrefs.get_xref_container_info(revision)
-        if isinstance(xref_start, generic.Reference):
-            whitelist_lta_if_fresh(xref_start)
-
-        # updates to /Info are always OK (and must be through indirect objects)
-        # if the /Info dict is direct, we ignore the resulting error
-        # Removing the /Info dictionary is also no big deal, since most readers
-        # will fall back to older revisions regardless
-        try:
-            current_info = self.reader.trailer.raw_get(
-                '/Info', revision=revision
-            )
-            current_info = current_info.reference
-            try:
-                signed_info = self.reader.trailer.raw_get(
-                    '/Info', revision=signed_revision
-                )
-                signed_info = signed_info.reference
-            except KeyError:
-                signed_info = None
+    # whitelist the xref stream, if there is one
+    if current_summary.xref_stream_ref is not None:
+        whitelist_lta_if_fresh(current_summary.xref_stream_ref)
+
+    # updates to /Info are always OK (and must be through indirect objects)
+    # if the /Info dict is direct, we ignore it.
+    # Removing the /Info dictionary is also no big deal, since most readers
+    # will fall back to older revisions regardless
+    current_info = current_summary.info_ref
+    if current_info is not None:
+        if current_info == signed_summary.info_ref:
+            explained_refs_lta.add(current_info)
+        else:
+            whitelist_lta_if_fresh(current_info)
+
+    # we're about to vet changes to the root, so this object ID
+    #  will be whitelisted when we go over object updates later.
+    current_root_ref = current_root.get_container_ref()
+    if current_root_ref != signed_root.get_container_ref():
+        # The document catalog has a different ID now. Weird, but OK.
+        # Do check that it doesn't clobber an existing object, though.
+        whitelist_lta_if_fresh(current_root_ref)
+    else:
+        explained_refs_lta.add(current_root_ref)
 
-            if current_info == signed_info:
-                explained_refs_lta.add(current_info)
-            else:
-                whitelist_lta_if_fresh(current_info)
-        except (KeyError, AttributeError):
-            pass
+    # first, check if the keys in the document catalog are unchanged
+    _compare_dicts(
+        signed_root, current_root, 
+        {'/AcroForm', '/DSS', '/Extensions', '/Metadata', '/MarkInfo'}
+    )
 
-        # we're about to vet changes to the root, so this object ID
-        #  will be whitelisted when we go over object updates later.
-        current_root_ref = current_root.get_container_ref()
-        if current_root_ref != signed_root.get_container_ref():
-            # The document catalog has a different ID now. Weird, but OK.
-            # Do check that it doesn't clobber an existing object, though.
-            whitelist_lta_if_fresh(current_root_ref)
-        else:
-            explained_refs_lta.add(current_root_ref)
+    # Now we compare the /AcroForm entries
+    signed_acroform, current_acroform = _compare_key_refs(
+        '/AcroForm', signed_root, current_root,
+        signed_resolver, current_resolver, explained_refs_lta
+    )
 
-        # first, check if the keys in the document catalog are unchanged
-        _compare_dicts(
-            signed_root, current_root, 
-            {'/AcroForm', '/DSS', '/Extensions', '/Metadata', '/MarkInfo'}
+    # first, compare the entries that aren't /Fields
+    _compare_dicts(signed_acroform, current_acroform, {'/Fields'})
+
+    # next, walk the field tree, and collect newly added signature fields
+    signed_fields = signed_acroform.raw_get('/Fields')
+    current_fields = current_acroform.raw_get('/Fields')
+    if isinstance(current_fields, generic.IndirectObject):
+        explained_refs_lta.add(current_fields.reference)
+        current_fields = current_resolver(current_fields.reference)
+    if isinstance(signed_fields, generic.IndirectObject):
+        signed_fields = signed_resolver(signed_fields.reference)
+
+    new_sigfield_refs = set(_diff_field_tree(
+        signed_fields, current_fields,
+        signed_resolver, current_resolver, explained_refs_lta,
+        explained_refs_formfill, field_mdp_spec=field_mdp_spec,
+        signed_summary=signed_summary, current_summary=current_summary
+    ))
+
+    # As for the keys in the root dictionary that are allowed to change:
+    #  - /Extensions requires no further processing since it must consist
+    #    of direct objects anyway.
+    #  - /MarkInfo: if it's an indirect reference (probably not) we can
+    #    whitelist it if the key set makes sense. TODO do this
+    #  - /Metadata: is a stream ---> don't allow overrides, only new refs
+    try:
+        explained_refs_lta.add(
+            signed_root.raw_get('/Metadata').reference
         )
-
-        # Now we compare the /AcroForm entries
-        signed_acroform, current_acroform = _compare_key_refs(
-            '/AcroForm', signed_root, current_root,
+    except (KeyError, AttributeError):
+        pass
+
+    # for the DSS, we only have to be careful not to allow non-DSS
+    # objects to be overridden.
+    if '/DSS' in signed_root:
+        if '/DSS' not in current_root:
+            raise SuspiciousModification('DSS was deleted')
+
+    if '/DSS' in current_root:
+        _manage_dss_change(
+            signed_root, current_root,
             signed_resolver, current_resolver, explained_refs_lta
         )
 
-        # first, compare the entries that aren't /Fields
-        _compare_dicts(signed_acroform, current_acroform, {'/Fields'})
-
-        # next, walk the field tree, and collect newly added signature fields
-        signed_fields = signed_acroform.raw_get('/Fields')
-        current_fields = current_acroform.raw_get('/Fields')
-        if isinstance(current_fields, generic.IndirectObject):
-            explained_refs_lta.add(current_fields.reference)
-            current_fields = current_resolver(current_fields.reference)
-        if isinstance(signed_fields, generic.IndirectObject):
-            signed_fields = signed_resolver(signed_fields.reference)
-
-        new_sigfield_refs = set(_diff_field_tree(
-            signed_fields, current_fields,
-            signed_resolver, current_resolver, explained_refs_lta,
-            explained_refs_formfill, field_mdp_spec=self.fieldmdp
-        ))
-
-        # As for the keys in the root dictionary that are allowed to change:
-        #  - /Extensions requires no further processing since it must consist
-        #    of direct objects anyway.
-        #  - /MarkInfo: if it's an indirect reference (probably not) we can
-        #    whitelist it if the key set makes sense. TODO do this
-        #  - /Metadata: is a stream ---> don't allow overrides, only new refs
-        try:
-            explained_refs_lta.add(
-                signed_root.raw_get('/Metadata').reference
-            )
-        except (KeyError, AttributeError):
-            pass
-
-        # for the DSS, we only have to be careful not to allow non-DSS
-        # objects to be overridden.
-        if '/DSS' in signed_root:
-            if '/DSS' not in current_root:
-                raise SuspiciousModification('DSS was deleted')
+    # Next, check annotations: newly added signature fields may be added
+    #  to the /Annots entry of any page. These are processed as LTA updates,
+    #  because even invisible signature fields / timestamps are sometimes
+    #  added to /Annots, unnecessary as that may be.
+    # Note: we don't descend into the annotation dictionaries themselves.
+    #  For modifications to form field values, this has been taken care of
+    #  already.
+    # TODO allow other annotation modifications, but at level ANNOTATIONS
+    if new_sigfield_refs:
+        # if no new sigfields were added, we skip this step.
+        #  Any modifications to /Annots will be flagged by the xref
+        #  crawler later.
+
+        # note: this is guaranteed to be equal to its signed counterpart,
+        # since we already checked the document catalog for unauthorised
+        # modifications
+        current_page_root = current_root.raw_get('/Pages').reference
+        _check_page_tree_annots(
+            current_page_root, new_sigfield_refs,
+            signed_summary.page_tree(signed_resolver, current_page_root),
+            current_summary.page_tree(current_resolver, current_page_root),
+            signed_resolver, current_resolver, explained_refs_lta
+        )
 
-        if '/DSS' in current_root:
-            _manage_dss_change(
-                signed_root, current_root,
-                signed_resolver, current_resolver, explained_refs_lta
+    # finally, verify that there are no xrefs in the revision's xref table
+    # other than the ones we can justify.
+    new_xrefs = current_summary.explicit_refs
+
+    # object streams are OK, but overriding object streams is not.
+    for objstm_ref in current_summary.object_streams:
+        whitelist_lta_if_fresh(objstm_ref)
+
+    unexplained_lta = new_xrefs - explained_refs_lta
+    unexplained_formfill = unexplained_lta - explained_refs_formfill
+    if unexplained_formfill:
+        msg = LazyJoin(
+            '\n', (
+                '%s:%s...' % (
+                    repr(x), repr(current_resolver(x))[:300]
+                ) for x in unexplained_formfill
             )
+        )
+        logger.debug(
+            "Unexplained xrefs in revision %d:\n%s",
+            revision, msg
+        )
+        raise SuspiciousModification(
+            f"There are unexplained xrefs in revision {revision}: "
+            f"{', '.join(repr(x) for x in unexplained_formfill)}."
+        )
+    elif unexplained_lta:
+        level = ModificationLevel.FORM_FILLING
+    else:
+        level = ModificationLevel.LTA_UPDATES
+    return RevisionDiff(
+        modification_level=level,
+        explained_refs_lta=_detach_all(explained_refs_lta),
+        explained_refs_formfill=_detach_all(explained_refs_formfill)
+    )
 
-        # Next, check annotations: newly added signature fields may be added
-        #  to the /Annots entry of any page. These are processed as LTA updates,
-        #  because even invisible signature fields / timestamps are sometimes
-        #  added to /Annots, unnecessary as that may be.
-        # Note: we don't descend into the annotation dictionaries themselves.
-        #  For modifications to form field values, this has been taken care of
-        #  already.
-        # TODO allow other annotation modifications, but at level ANNOTATIONS
-        if new_sigfield_refs:
-            # if no new sigfields were added, we skip this step.
-            #  Any modifications to /Annots will be flagged by the xref
-            #  crawler later.
-
-            # note: this is guaranteed to be equal to its signed counterpart,
-            # since we already checked the document catalog for unauthorised
-            # modifications
-            current_page_root = current_root.raw_get('/Pages').reference
-            _walk_page_tree_annots(
-                current_page_root, new_sigfield_refs, signed_resolver,
-                current_resolver, explained_refs_lta
-            )
 
-        # finally, verify that there are no xrefs in the revision's xref table
-        # other than the ones we can justify.
-        new_xrefs = self.reader.xrefs.explicit_refs_in_revision(revision)
-
-        # object streams are OK, but overriding object streams is not.
-        for objstm_ref in self.reader.xrefs.object_streams_used_in(revision):
-            whitelist_lta_if_fresh(objstm_ref)
-
-        unexplained_lta = new_xrefs - explained_refs_lta
-        unexplained_formfill = unexplained_lta - explained_refs_formfill
-        if unexplained_formfill:
-            msg = LazyJoin(
-                '\n', (
-                    '%s:%s...' % (
-                        repr(x), repr(current_resolver(x))[:300]
-                    ) for x in unexplained_formfill
-                )
-            )
-            logger.debug(
-                "Unexplained xrefs in revision %d:\n%s",
-                revision, msg
-            )
-            raise SuspiciousModification(
-                f"There are unexplained xrefs in revision {revision}: "
-                f"{', '.join(repr(x) for x in unexplained_formfill)}."
-            )
-        elif unexplained_lta:
-            return ModificationLevel.FORM_FILLING
-        else:
-            return ModificationLevel.LTA_UPDATES
-
-
-def _walk_page_tree_annots(page_root_ref, new_sigfield_refs, signed_resolver,
-                           current_resolver, explained_refs):
-    signed_pages_obj = signed_resolver(page_root_ref)
-    current_pages_obj = current_resolver(page_root_ref)
-    signed_kids = signed_pages_obj.raw_get('/Kids')
-    if isinstance(signed_kids, generic.IndirectObject):
-        signed_kids = signed_resolver(signed_kids.reference)
-    current_kids = current_pages_obj.raw_get('/Kids')
-    if isinstance(current_kids, generic.IndirectObject):
-        current_kids = current_resolver(current_kids.reference)
+def _check_page_tree_annots(page_root_ref, new_sigfield_refs,
+                            signed_tree: _PageTreeSummary,
+                            current_tree: _PageTreeSummary,
+                            signed_resolver, current_resolver,
+                            explained_refs):
     # /Kids should only contain indirect refs, so direct comparison is
     # appropriate.
-    if current_kids != signed_kids:
+    if current_tree.kids != signed_tree.kids:
         raise SuspiciousModification(
             "Unexpected change to page tree structure."
         )
-    for kid_ref in signed_kids:
-        kid_ref = kid_ref.reference
-        signed_kid = signed_resolver(kid_ref)
-        node_type = signed_kid['/Type']
-        if node_type == '/Pages':
-            _walk_page_tree_annots(
-                kid_ref, new_sigfield_refs, signed_resolver, current_resolver,
-                explained_refs
-            )
-        elif node_type == '/Page':
-            current_kid = current_resolver(kid_ref)
-            current_annots_ref = None
-            try:
-                current_annots = current_kid.raw_get('/Annots')
-                if isinstance(current_annots, generic.IndirectObject):
-                    current_annots_ref = current_annots.reference
-                    current_annots = current_resolver(current_annots_ref)
-                current_annots = set(c.reference for c in current_annots)
-            except KeyError:
-                # no annotations, continue
-                continue
-            try:
-                signed_annots = signed_kid.raw_get('/Annots')
-                signed_annots_ref = None
-                if isinstance(signed_annots, generic.IndirectObject):
-                    signed_annots_ref = signed_annots.reference
-                    signed_annots = signed_resolver(signed_annots.reference)
-                signed_annots = set(c.reference for c in signed_annots)
-            except KeyError:
-                signed_annots_ref = None
-                signed_annots = set()
+    for page_ref, (current_annots_ref, current_annots) \
+            in current_tree.annots.items():
+        signed_annots_ref, signed_annots = signed_tree.annots.get(
+            page_ref, (None, frozenset())
+        )
 
-            # check if annotations were added
-            if not (signed_annots <= current_annots):
-                continue
-            annots_diff = current_annots - signed_annots
-            if not annots_diff or not (annots_diff <= new_sigfield_refs):
-                continue
-            # there are new annotations, and they're all for new
-            # signature fields. => cleared to edit
-            # Make sure the page dictionaries are the same, so that we
-            #  can safely clear them for modification
-            #  (not necessary if both /Annots entries are indirect references,
-            #   but adding even more cases is pushing things)
-            _compare_dicts(signed_kid, current_kid, {'/Annots'})
-            explained_refs.add(kid_ref)
-            if current_annots_ref:
-                # current /Annots entry is an indirect reference
-                if signed_annots_ref == current_annots_ref:
-                    explained_refs.add(current_annots_ref)
-                else:
-                    # either the /Annots array got reassigned to another
-                    # object ID, or it was moved from a direct object to an
-                    # indirect one. This is fine, provided that the new  object
-                    # ID doesn't clobber an existing one.
-                    whitelist_if_fresh = _whitelist_callback(
-                        explained_refs, signed_resolver.revision,
-                        signed_resolver.reader.xrefs
-                    )
-                    whitelist_if_fresh(current_annots_ref)
+        # check if annotations were added
+        if not (signed_annots <= current_annots):
+            continue
+        annots_diff = current_annots - signed_annots
+        if not annots_diff or not (annots_diff <= new_sigfield_refs):
+            continue
+        # there are new annotations, and they're all for new
+        # signature fields. => cleared to edit
+        # Make sure the page dictionaries are the same, so that we
+        #  can safely clear them for modification
+        #  (not necessary if both /Annots entries are indirect references,
+        #   but adding even more cases is pushing things)
+        _compare_dicts(
+            signed_resolver(page_ref), current_resolver(page_ref), {'/Annots'}
+        )
+        explained_refs.add(page_ref)
+        if current_annots_ref:
+            # current /Annots entry is an indirect reference
+            if signed_annots_ref == current_annots_ref:
+                explained_refs.add(current_annots_ref)
+            else:
+                # either the /Annots array got reassigned to another
+                # object ID, or it was moved from a direct object to an
+                # indirect one. This is fine, provided that the new  object
+                # ID doesn't clobber an existing one.
+                whitelist_if_fresh = _whitelist_callback(
+                    explained_refs, signed_resolver.revision,
+                    signed_resolver.reader.xrefs
+                )
+                whitelist_if_fresh(current_annots_ref)
 
 
 VRI_KEY_PATTERN = re.compile('/[A-Z0-9]{40}')
@@ -962,16 +1214,18 @@ def _split_sig_fields(resolver, field_list):
 def _diff_field_tree(signed_fields, current_fields,
                      signed_resolver, current_resolver,
                      explained_refs_lta, explained_refs_formfill,
-                     field_mdp_spec: Optional[FieldMDPSpec], parent_name=""):
+                     field_mdp_spec: Optional[FieldMDPSpec],
+                     signed_summary: _RevisionSummary,
+                     current_summary: _RevisionSummary, parent_name=""):
     if not isinstance(signed_fields, generic.ArrayObject):
         raise SuspiciousModification("Field list is not an array.")
     if not isinstance(current_fields, generic.ArrayObject):
         raise SuspiciousModification("Field list is not an array.")
     # set signature fields aside for separate processing
     signed_fields_sigfields, signed_fields_other = \
-        _split_sig_fields(signed_resolver, signed_fields)
+        signed_summary.split_fields(signed_resolver, signed_fields)
     current_fields_sigfields, current_fields_other = \
-        _split_sig_fields(current_resolver, current_fields)
+        current_summary.split_fields(current_resolver, current_fields)
 
     # the "other" fields should be matched one-to-one
     nonsig_field_names = set(signed_fields_other.keys())
@@ -1024,7 +1278,8 @@ def _diff_field_tree(signed_fields, current_fields,
             yield from _diff_field_tree(
                 signed_kids, current_kids, signed_resolver,
                 current_resolver, explained_refs_lta, explained_refs_formfill,
-                field_mdp_spec=field_mdp_spec, parent_name=fq_name
+                field_mdp_spec=field_mdp_spec, signed_summary=signed_summary,
+                current_summary=current_summary, parent_name=fq_name
             )
         except KeyError:
             pass
@@ -1637,8 +1892,8 @@ def validate_pdf_ltv_signature(embedded_sig: EmbeddedPdfSignature,
     reader = embedded_sig.reader
     if validation_type == RevocationInfoValidationType.ADOBE_STYLE:
         dss = None
-        current_vc = bootstrap_validation_context or ValidationContext(
-            **validation_context_kwargs
+        current_vc = bootstrap_validation_context or build_validation_context(
+            validation_context_kwargs
         )
     else:
         # If there's a DSS, there's no harm in reading additional certs from it
@@ -1693,7 +1948,7 @@ def validate_pdf_ltv_signature(embedded_sig: EmbeddedPdfSignature,
         )
         validation_context_kwargs['ocsps'] = ocsps
         validation_context_kwargs['crls'] = crls
-        stored_vc = ValidationContext(**validation_context_kwargs)
+        stored_vc = build_validation_context(validation_context_kwargs)
     else:
         stored_vc = dss.as_validation_context(validation_context_kwargs)
 
@@ -1727,6 +1982,377 @@ def validate_pdf_ltv_signature(embedded_sig: EmbeddedPdfSignature,
     return PdfSignatureStatus(seed_value_ok=seed_value_ok, **status_kwargs)
 
 
+@dataclass(frozen=True)
+class SignatureValidationResult:
+    """
+    Outcome of validating one of the signatures in a document.
+    """
+
+    field_name: str
+    """
+    The fully qualified name of the signature field.
+    """
+
+    status: Optional[PdfSignatureStatus] = None
+    """
+    The validation status, if validation ran to completion.
+    """
+
+    error: Optional[Exception] = None
+    """
+    The error that caused validation to fail, if any.
+    """
+
+    duration: Optional[float] = None
+    """
+    Time spent validating the signature, in seconds.
+    """
+
+    @property
+    def error_code(self) -> Optional[str]:
+        """
+        Classify the error that caused validation to fail, if any.
+
+        :return:
+            ``'REVINFO_FAILURE'`` if revocation information couldn't be
+            read, ``'INVALID'`` if the signature failed to validate,
+            ``'MALFORMED'`` for other errors, and ``None`` if validation
+            ran to completion.
+        """
+        error = self.error
+        if error is None:
+            return None
+        elif isinstance(error, ValidationInfoReadingError):
+            return 'REVINFO_FAILURE'
+        elif isinstance(error, SignatureValidationError):
+            return 'INVALID'
+        else:
+            return 'MALFORMED'
+
+
+def _validate_field(reader: PdfFileReader, field_name, field_ref,
+                    session: Optional[DocumentValidationSession],
+                    validation_context_kwargs, ltv_profile, force_revinfo):
+    start = time.perf_counter()
+    try:
+        embedded_sig = EmbeddedPdfSignature(reader, field_ref, session=session)
+        if ltv_profile is None:
+            vc = build_validation_context(validation_context_kwargs)
+            status = validate_pdf_signature(
+                embedded_sig, signer_validation_context=vc
+            )
+        else:
+            status = validate_pdf_ltv_signature(
+                embedded_sig, ltv_profile, force_revinfo=force_revinfo,
+                validation_context_kwargs=validation_context_kwargs
+            )
+    except Exception as e:
+        # A malformed signature shouldn't prevent the other signatures in
+        # the document from being reported on.
+        if not isinstance(e, ValueError):
+            logger.warning(
+                "Unexpected error while validating signature %s",
+                field_name, exc_info=True
+            )
+        return SignatureValidationResult(
+            field_name=field_name, error=e,
+            duration=time.perf_counter() - start
+        )
+    return SignatureValidationResult(
+        field_name=field_name, status=status,
+        duration=time.perf_counter() - start
+    )
+
+
+def _job_result(job: futures.Future, field_name) -> SignatureValidationResult:
+    try:
+        return job.result()
+    except Exception as e:
+        # e.g. the result couldn't be sent back from a worker process
+        logger.warning(
+            "Validation job for signature %s failed", field_name,
+            exc_info=True
+        )
+        return SignatureValidationResult(field_name=field_name, error=e)
+
+
+def _validate_field_in_snapshot(snapshot: PdfReaderSnapshot, field_name,
+                                idnum, generation, session, *args):
+    # each job gets a reader of its own, since readers aren't thread-safe
+    reader = snapshot.new_reader()
+    field_ref = generic.IndirectObject(idnum, generation, reader)
+    return _validate_field(reader, field_name, field_ref, session, *args)
+
+
+def validate_all_signatures(reader: PdfFileReader,
+                            validation_context_kwargs=None,
+                            ltv_profile: RevocationInfoValidationType = None,
+                            force_revinfo=False,
+                            executor: futures.Executor = None,
+                            session: DocumentValidationSession = None) \
+        -> List[SignatureValidationResult]:
+    """
+    Validate all signatures in a document.
+
+    If an executor is specified, the signatures are validated in parallel.
+    The document is not parsed again for every signature:
+    each job reads from a :class:`.PdfReaderSnapshot` of the input.
+    Unless a :class:`~concurrent.futures.ProcessPoolExecutor` is used,
+    all signatures share a single :class:`.DocumentValidationSession`.
+    With a :class:`~concurrent.futures.ProcessPoolExecutor`, the snapshot
+    is sent to the worker processes with its cross-reference data already
+    parsed.
+
+    :param reader:
+        The reader for the document.
+    :param validation_context_kwargs:
+        Keyword arguments for the validation contexts, see
+        :func:`~pyhanko.sign.revinfo.build_validation_context`.
+        With a process-based executor, these must be picklable.
+    :param ltv_profile:
+        If not ``None``, validate the signatures as LTV signatures using
+        this profile (see :func:`validate_pdf_ltv_signature`).
+    :param force_revinfo:
+        Passed to :func:`validate_pdf_ltv_signature`.
+    :param executor:
+        Executor to run the validation jobs on.
+        If ``None``, the signatures are validated one after the other.
+    :param session:
+        The :class:`.DocumentValidationSession` to use.
+        If ``None``, a new session is created for this document.
+        Ignored with a process-based executor.
+    :return:
+        A list of :class:`.SignatureValidationResult` objects, in the order
+        in which the signature fields appear in the document.
+    """
+    from pyhanko.sign.fields import enumerate_sig_fields
+
+    validation_context_kwargs = validation_context_kwargs or {}
+    job_args = (validation_context_kwargs, ltv_profile, force_revinfo)
+    # plain strings, so results don't drag the reader along when pickled
+    sig_fields = [
+        (str(name), field_ref) for name, _, field_ref
+        in enumerate_sig_fields(reader, filled_status=True)
+    ]
+    if isinstance(executor, futures.ProcessPoolExecutor):
+        # sessions can't cross process boundaries
+        session = None
+    elif session is None:
+        session = DocumentValidationSession()
+    if executor is None:
+        return [
+            _validate_field(reader, name, field_ref, session, *job_args)
+            for name, field_ref in sig_fields
+        ]
+
+    snapshot = PdfReaderSnapshot.from_reader(reader)
+    jobs = [
+        executor.submit(
+            _validate_field_in_snapshot, snapshot, name,
+            field_ref.idnum, field_ref.generation, session, *job_args
+        ) for name, field_ref in sig_fields
+    ]
+    return [
+        _job_result(job, name) for job, (name, _) in zip(jobs, sig_fields)
+    ]
+
+
+@dataclass(frozen=True)
+class DocumentValidationReport:
+    """
+    Outcome of validating all signatures in a document, as produced by
+    :func:`validate_documents`.
+    """
+
+    path: str
+    """
+    Path to the document.
+    """
+
+    results: List[SignatureValidationResult]
+    """
+    Validation results for the signatures in the document, in field order.
+    """
+
+    duration: float
+    """
+    Time spent processing the document, in seconds.
+    """
+
+    error: Optional[str] = None
+    """
+    Description of the error that prevented the document from being
+    processed, if any.
+    """
+
+    @property
+    def bottom_line(self) -> bool:
+        """
+        ``True`` if the document could be read, and all signatures in
+        it are valid.
+        Documents without signatures are not considered valid.
+        """
+        return self.error is None and bool(self.results) and all(
+            result.status is not None and result.status.bottom_line
+            for result in self.results
+        )
+
+    def as_json_records(self) -> Iterator[dict]:
+        """
+        Summarise the report as JSON-serialisable dictionaries, one for
+        every signature. Documents that couldn't be read or don't contain
+        any signatures produce a single record.
+        """
+        base = {'file': self.path, 'document_duration': self.duration}
+        if self.error is not None:
+            yield dict(base, field=None, status='UNREADABLE', error=self.error)
+            return
+        if not self.results:
+            yield dict(base, field=None, status='UNSIGNED')
+            return
+        for result in self.results:
+            record = dict(
+                base, field=result.field_name, duration=result.duration
+            )
+            status = result.status
+            if status is None:
+                record['status'] = result.error_code
+                record['error'] = str(result.error)
+                yield record
+                continue
+            record.update(
+                status='VALID' if status.bottom_line else 'INVALID',
+                summary=status.summary(),
+                intact=status.intact, valid=status.valid,
+                trusted=status.trusted, revoked=status.revoked,
+                coverage=status.coverage.name,
+                modification_level=status.modification_level.name,
+                docmdp_ok=status.docmdp_ok,
+                seed_value_ok=status.seed_value_ok,
+                signer=status.signing_cert.subject.human_friendly,
+                signed_dt=(
+                    None if status.signed_dt is None
+                    else status.signed_dt.isoformat()
+                ),
+            )
+            ts_validity = status.timestamp_validity
+            if ts_validity is not None:
+                record['timestamp'] = {
+                    'valid': ts_validity.valid,
+                    'trusted': ts_validity.trusted,
+                    'timestamp': ts_validity.timestamp.isoformat(),
+                }
+            yield record
+
+
+def _validate_document(path, validation_context_kwargs, ltv_profile,
+                       force_revinfo) -> DocumentValidationReport:
+    start = time.perf_counter()
+    # The session only lives as long as this document is being processed,
+    # so the worker doesn't accumulate any per-document state.
+    session = DocumentValidationSession()
+    try:
+        with open(path, 'rb') as inf:
+            reader = PdfFileReader(inf)
+            results = validate_all_signatures(
+                reader, validation_context_kwargs, ltv_profile=ltv_profile,
+                force_revinfo=force_revinfo, session=session
+            )
+    except Exception as e:
+        # one bad document shouldn't take down the entire batch
+        if not isinstance(e, (IOError, misc.PdfReadError, ValueError)):
+            logger.warning(
+                "Unexpected error while processing %s", path, exc_info=True
+            )
+        return DocumentValidationReport(
+            path=path, results=[], error=str(e) or type(e).__name__,
+            duration=time.perf_counter() - start
+        )
+    return DocumentValidationReport(
+        path=path, results=results, duration=time.perf_counter() - start
+    )
+
+
+# settings for the worker processes of validate_documents
+_batch_settings = None
+
+
+def _init_batch_worker(validation_context_kwargs, ltv_profile, force_revinfo):
+    global _batch_settings
+    # The validation settings are sent to each worker once, and shared by
+    # all documents it processes, together with the process-wide caches
+    # (revocation info, parsed CRLs, etc.).
+    _batch_settings = (validation_context_kwargs, ltv_profile, force_revinfo)
+
+
+def _validate_document_in_worker(path) -> DocumentValidationReport:
+    return _validate_document(path, *_batch_settings)
+
+
+def validate_documents(paths: Iterable[str], validation_context_kwargs=None,
+                       ltv_profile: RevocationInfoValidationType = None,
+                       force_revinfo=False, max_workers=None,
+                       max_pending=None, fail_fast=False) \
+        -> Iterator[DocumentValidationReport]:
+    """
+    Validate the signatures in a batch of documents, using a pool of worker
+    processes.
+
+    Each worker receives the validation settings once, and keeps its
+    revocation information cache warm across all documents it processes.
+    If the ``revinfo_cache`` in ``validation_context_kwargs`` persists to
+    a directory, that directory is shared by all workers.
+
+    :param paths:
+        Paths to the documents to validate. This can be a lazy iterable.
+    :param validation_context_kwargs:
+        Keyword arguments for the validation contexts, see
+        :func:`~pyhanko.sign.revinfo.build_validation_context`.
+        These must be picklable.
+    :param ltv_profile:
+        If not ``None``, validate the signatures as LTV signatures using
+        this profile (see :func:`validate_pdf_ltv_signature`).
+    :param force_revinfo:
+        Passed to :func:`validate_pdf_ltv_signature`.
+    :param max_workers:
+        Number of worker processes.
+        Defaults to the number of processors on the machine.
+    :param max_pending:
+        Maximal number of documents submitted to the pool at any given
+        time. Defaults to twice the number of workers.
+    :param fail_fast:
+        Stop after the first document that fails validation.
+    :return:
+        An iterator of :class:`.DocumentValidationReport` objects, in the
+        same order as ``paths``.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * max_workers
+    init_args = (validation_context_kwargs or {}, ltv_profile, force_revinfo)
+    paths = iter(paths)
+    pending = deque()
+    with futures.ProcessPoolExecutor(max_workers=max_workers,
+                                     initializer=_init_batch_worker,
+                                     initargs=init_args) as executor:
+        try:
+            while True:
+                for path in paths:
+                    pending.append(
+                        executor.submit(_validate_document_in_worker, path)
+                    )
+                    if len(pending) >= max_pending:
+                        break
+                if not pending:
+                    return
+                report = pending.popleft().result()
+                yield report
+                if fail_fast and not report.bottom_line:
+                    return
+        finally:
+            for job in pending:
+                job.cancel()
+
+
 def retrieve_adobe_revocation_info(signer_info: cms.SignerInfo):
     try:
         revinfo: asn1_pdf.RevocationInfoArchival = find_cms_attribute(
@@ -1950,15 +2576,14 @@ class DocumentSecurityStore:
                 resp = asn1_ocsp.OCSPResponse.load(ocsp_stream.data)
                 ocsps.append(resp)
 
+            crl_store = shared_crl_store()
             crls = validation_context_kwargs['crls'] = []
             for crl_ref in self.crls:
                 crl_stream: generic.StreamObject = crl_ref.get_object()
-                crl = asn1_crl.CertificateList.load(crl_stream.data)
-                crls.append(crl)
+                crls.append(crl_store.load(crl_stream.data))
 
-        return ValidationContext(
-            other_certs=certs, **validation_context_kwargs
-        )
+        validation_context_kwargs['other_certs'] = certs
+        return build_validation_context(validation_context_kwargs)
 
     @classmethod
     def read_dss(cls, handler: PdfHandler) -> 'DocumentSecurityStore':
@@ -1990,11 +2615,12 @@ class DocumentSecurityStore:
             ocsps.append(resp)
 
         crl_refs = list(dss_dict.get('/CRLs', ()))
-        crls = []
+        crl_store = shared_crl_store()
         for crl_ref in crl_refs:
+            # the loaded copies will be reused when we build a validation
+            # context from this DSS
             crl_stream: generic.StreamObject = crl_ref.get_object()
-            crl = asn1_crl.CertificateList.load(crl_stream.data)
-            crls.append(crl)
+            crl_store.load(crl_stream.data)
 
         # shallow-copy the VRI dictionary
         try:
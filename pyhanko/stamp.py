@@ -1,18 +1,20 @@
 import os
+import threading
 from binascii import hexlify
+from collections import OrderedDict
 
-import qrcode
 import tzlocal
 
 import pyhanko.pdf_utils.content
-from pyhanko.pdf_utils.barcodes import PdfStreamQRImage
+from pyhanko.pdf_utils.barcodes import render_qr
 from pyhanko.pdf_utils.images import PdfImage
 from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
 from pyhanko.pdf_utils.misc import BoxConstraints, BoxSpecificationError, rd
 from pyhanko.pdf_utils.text import TextBoxStyle, TextBox
-from pyhanko.pdf_utils.writer import init_xobject_dictionary
+from pyhanko.pdf_utils.writer import init_xobject_dictionary, PdfFileWriter
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Optional
 
 from pyhanko.pdf_utils import generic
 from pyhanko.pdf_utils.generic import (
@@ -64,10 +66,8 @@ class TextStampStyle(ConfigurableMixin):
             if bg_spec == '__stamp__':
                 config_dict['background'] = STAMP_ART_CONTENT
             elif isinstance(bg_spec, str):
-                from PIL import Image
-                img = Image.open(bg_spec)
                 # Setting the writer can be delayed
-                config_dict['background'] = PdfImage(img, writer=None)
+                config_dict['background'] = PdfImage(bg_spec, writer=None)
         except KeyError:
             pass
 
@@ -83,14 +83,109 @@ class QRStampStyle(TextStampStyle):
     stamp_qrsize: float = 0.25
 
 
+@dataclass(frozen=True)
+class StampAppearance:
+    """
+    A rendered stamp appearance, as stored in a
+    :class:`.StampAppearanceCache`.
+    """
+
+    writer: PdfFileWriter
+    """
+    Scratch writer holding the form XObject and the objects it depends on.
+    """
+
+    xobject_ref: generic.IndirectObject
+    """
+    Reference to the form XObject in :attr:`writer`.
+    """
+
+    width: float
+    """
+    Width of the stamp.
+    """
+
+    height: float
+    """
+    Height of the stamp.
+    """
+
+
+class StampAppearanceCache:
+    """
+    Thread-safe LRU cache of rendered stamp appearances.
+
+    Appearances are keyed by stamp type, style, text and box dimensions
+    (see :meth:`TextStamp.appearance_cache_key`).
+    On a cache hit, the rendered form XObject is copied into the target
+    document without rendering anything.
+
+    :param max_entries:
+        Maximal number of appearances to keep.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[StampAppearance]:
+        """
+        Look up an appearance.
+
+        :return:
+            A :class:`.StampAppearance`, or ``None`` if not found.
+        """
+        with self._lock:
+            try:
+                result = self._entries[key]
+            except KeyError:
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def put(self, key, appearance: StampAppearance):
+        """
+        Add an appearance to the cache, evicting the least recently used
+        one if necessary.
+        """
+        with self._lock:
+            self._entries[key] = appearance
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_shared_appearance_cache = None
+_shared_appearance_cache_lock = threading.Lock()
+
+
+def shared_stamp_appearance_cache() -> StampAppearanceCache:
+    """
+    Return the process-wide stamp appearance cache.
+    """
+    global _shared_appearance_cache
+    with _shared_appearance_cache_lock:
+        if _shared_appearance_cache is None:
+            _shared_appearance_cache = StampAppearanceCache()
+        return _shared_appearance_cache
+
+
 class TextStamp(PdfContent):
     def __init__(self, writer: IncrementalPdfFileWriter, style,
-                 text_params=None, box: BoxConstraints = None):
+                 text_params=None, box: BoxConstraints = None,
+                 appearance_cache: StampAppearanceCache = None):
         super().__init__(box=box, writer=writer)
         self.style = style
         self.text_params = text_params
+        self.appearance_cache = appearance_cache
         self._resources_ready = False
         self._stamp_ref = None
+        self._resource_name = None
+        self._stamp_text = None
 
         self.text_box = None
 
@@ -139,16 +234,41 @@ class TextStamp(PdfContent):
             'ts': ts.strftime(self.style.timestamp_format),
         }
 
+    def get_stamp_text(self) -> str:
+        """
+        Compute the text of the stamp.
+        This is only done once, so the default text parameters (e.g. the
+        timestamp) don't change when the stamp is rendered again.
+        """
+        text = self._stamp_text
+        if text is None:
+            _text_params = self.get_default_text_params()
+            if self.text_params is not None:
+                _text_params.update(self.text_params)
+            text = self._stamp_text = self.style.stamp_text % _text_params
+        return text
+
+    def appearance_cache_key(self):
+        """
+        Compute the key under which the rendered stamp is stored in an
+        appearance cache. Subclasses that render anything that isn't
+        determined by the style, text and box of the stamp must override
+        this method.
+        """
+        box = self.box
+        return (
+            type(self), self.style, self.get_stamp_text(),
+            box.width if box.width_defined else None,
+            box.height if box.height_defined else None,
+            box.aspect_ratio if box.aspect_ratio_defined else None
+        )
+
     def render(self):
         command_stream = [b'q']
 
         # text rendering
         self.init_text_box()
-        _text_params = self.get_default_text_params()
-        if self.text_params is not None:
-            _text_params.update(self.text_params)
-        text = self.style.stamp_text % _text_params
-        self.text_box.content = text
+        self.text_box.content = self.get_stamp_text()
 
         stamp_height = self.get_stamp_height()
         stamp_width = self.get_stamp_width()
@@ -212,22 +332,73 @@ class TextStamp(PdfContent):
     def register(self):
         stamp_ref = self._stamp_ref
         if stamp_ref is None:
-            form_xobj = self.as_form_xobject()
-            self._stamp_ref = stamp_ref = self.writer.add_object(form_xobj)
+            if self.appearance_cache is not None:
+                stamp_ref = self._register_cached(self.appearance_cache)
+            else:
+                form_xobj = self.as_form_xobject()
+                stamp_ref = self.writer.add_object(form_xobj)
+            self._stamp_ref = stamp_ref
         return stamp_ref
 
+    def _register_cached(self, cache: StampAppearanceCache):
+        key = self.appearance_cache_key()
+        try:
+            appearance = cache.get(key)
+        except TypeError:
+            # unhashable style
+            return self.writer.add_object(self.as_form_xobject())
+
+        box = self.box
+        if appearance is None:
+            # render into a scratch writer, so the result can be copied into
+            # other documents later
+            target = self.writer
+            scratch = PdfFileWriter()
+            self.set_writer(scratch)
+            try:
+                form_xobj = self.as_form_xobject()
+            finally:
+                self.set_writer(target)
+            form_xobj.compress()
+            xobj_ref = scratch.add_object(form_xobj)
+            # encode everything now, so copies can reuse the encoded data
+            for obj in scratch.objects.values():
+                if isinstance(obj, generic.StreamObject):
+                    obj.encode()
+            appearance = StampAppearance(
+                writer=scratch, xobject_ref=xobj_ref,
+                width=box.width, height=box.height
+            )
+            cache.put(key, appearance)
+        else:
+            if not box.width_defined:
+                box.width = appearance.width
+            if not box.height_defined:
+                box.height = appearance.height
+        return self.writer.import_object(appearance.xobject_ref)
+
+    @property
+    def resource_name(self) -> bytes:
+        resource_name = self._resource_name
+        if resource_name is None:
+            # randomise resource name to avoid conflicts
+            # TODO handle this properly
+            resource_name = self._resource_name \
+                = b'/Stamp' + hexlify(os.urandom(16))
+        return resource_name
+
     def apply(self, dest_page, x, y):
         stamp_ref = self.register()
-        # randomise resource name to avoid conflicts
-        # TODO handle this properly
-        resource_name = b'/Stamp' + hexlify(os.urandom(16))
+        # The resource name is the same every time this stamp is applied,
+        # so pages that share a resource dictionary only need one entry.
+        resource_name = self.resource_name
         stamp_paint = b'q 1 0 0 1 %g %g cm %s Do Q' % (
             rd(x), rd(y), resource_name
         )
         stamp_wrapper_stream = generic.StreamObject(stream_data=stamp_paint)
         resources = generic.DictionaryObject({
             pdf_name('/XObject'): generic.DictionaryObject({
-                pdf_name(resource_name): stamp_ref
+                pdf_name(resource_name.decode('ascii')): stamp_ref
             })
         })
         wr = self.writer
@@ -249,11 +420,18 @@ class QRStamp(TextStamp):
 
     def __init__(self, writer: IncrementalPdfFileWriter, url: str,
                  style: QRStampStyle, text_params=None,
-                 box: BoxConstraints = None):
-        super().__init__(writer, style, text_params=text_params, box=box)
+                 box: BoxConstraints = None,
+                 appearance_cache: StampAppearanceCache = None):
+        super().__init__(
+            writer, style, text_params=text_params, box=box,
+            appearance_cache=appearance_cache
+        )
         self.url = url
         self._qr_size = None
 
+    def appearance_cache_key(self):
+        return super().appearance_cache_key() + (self.url,)
+
     @property
     def qr_size(self):
         if self._qr_size is None:
@@ -290,14 +468,7 @@ class QRStamp(TextStamp):
         return [draw_qr_command]
 
     def _qr_xobject(self):
-        qr = qrcode.QRCode()
-        qr.add_data(self.url)
-        qr.make()
-
-        img = qr.make_image(image_factory=PdfStreamQRImage)
-        command_stream = img.render_command_stream()
-
-        bbox_size = (qr.modules_count + 2 * qr.border) * qr.box_size
+        command_stream, bbox_size = render_qr(self.url)
         qr_xobj = init_xobject_dictionary(
             command_stream, bbox_size, bbox_size
         )
@@ -344,6 +515,89 @@ class QRStamp(TextStamp):
         return page_ref, (w, h)
 
 
+@dataclass(frozen=True)
+class StampPlacement:
+    """
+    Describes where to put a stamp in a bulk stamping operation.
+    See :func:`stamp_pages`.
+    """
+
+    page_ix: int
+    """
+    Index of the page to stamp (zero-indexed).
+    """
+
+    x: float
+    """
+    Horizontal position of the stamp's lower left corner.
+    """
+
+    y: float
+    """
+    Vertical position of the stamp's lower left corner.
+    """
+
+    text_params: dict = None
+    """
+    Text parameters specific to this placement. These take precedence
+    over the ones passed to :func:`stamp_pages`.
+    """
+
+
+def stamp_pages(writer: IncrementalPdfFileWriter, style: TextStampStyle,
+                placements, url=None, text_params=None):
+    """
+    Apply stamps to a number of pages in one go.
+
+    The stamp is rendered and added to the document as a form XObject
+    once for every distinct set of text parameters. Each placement then only
+    requires a small content stream that paints the XObject.
+    All modifications end up in the same revision when the writer's output
+    is written.
+
+    :param writer:
+        The writer to add the stamps to.
+    :param style:
+        The stamp style to use. If ``url`` is not ``None``, this must be
+        a :class:`.QRStampStyle`.
+    :param placements:
+        An iterable of :class:`.StampPlacement` objects.
+    :param url:
+        URL to put in the QR code, if any.
+    :param text_params:
+        Text parameters common to all placements.
+    :return:
+        A list of ``(page_ref, (width, height))`` tuples, one for each
+        placement.
+    """
+    base_params = dict(text_params or {})
+    if 'ts' not in base_params:
+        # make sure that all stamps show the same timestamp
+        ts = datetime.now(tz=tzlocal.get_localzone())
+        base_params['ts'] = ts.strftime(style.timestamp_format)
+
+    stamps = {}
+    results = []
+    for placement in placements:
+        params = base_params
+        if placement.text_params:
+            params = dict(base_params)
+            params.update(placement.text_params)
+        key = tuple(sorted(params.items()))
+        try:
+            stamp = stamps[key]
+        except KeyError:
+            if url is not None:
+                stamp = QRStamp(writer, url, style, text_params=params)
+            else:
+                stamp = TextStamp(writer, style, text_params=params)
+            stamps[key] = stamp
+        results.append(
+            stamp.apply(placement.page_ix, placement.x, placement.y)
+        )
+    return results
+
+
 def stamp_file(input_name, output_name, style, dest_page,
                x, y, url, text_params=None):
 
@@ -1,8 +1,11 @@
 from io import BytesIO
 
+import pytest
+
 from pyhanko.pdf_utils.generic import pdf_name
 from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
 from pyhanko.pdf_utils.misc import BoxConstraints
+from pyhanko.pdf_utils.reader import PdfFileReader
 from pyhanko.pdf_utils import barcodes, generic
 from pyhanko import stamp
 from pyhanko_tests.samples import MINIMAL
@@ -30,6 +33,28 @@ def test_qr_natural_size():
     assert qr.text_box_x() == qr.qr_default_width + 2 * qrss.innsep
 
 
+def test_qr_deduplicate():
+    writer = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    writer.deduplicate_objects = True
+    qrss = stamp.QRStampStyle()
+    for y in (10, 100):
+        qr = stamp.QRStamp(
+            writer, 'https://example.com', qrss,
+            text_params={'ts': 'fixed'}
+        )
+        qr.apply(0, 10, y)
+    out = BytesIO()
+    writer.write(out)
+    out.seek(0)
+
+    r = PdfFileReader(out)
+    page_obj = r.root['/Pages']['/Kids'][0].get_object()
+    xobjs = page_obj['/Resources']['/XObject']
+    assert len(xobjs) == 2
+    # both stamps should point to the same form XObject
+    assert len({xobjs.raw_get(k).idnum for k in xobjs}) == 1
+
+
 def test_code128_render():
     writer = IncrementalPdfFileWriter(BytesIO(MINIMAL))
     bb = barcodes.BarcodeBox("code128", "this is a test")
@@ -49,3 +74,255 @@ def test_code128_render():
 
     # TODO try to read back the code using some kind of barcode scanning
     #  library, perhaps.
+
+
+def test_bulk_stamp():
+    from pyhanko.pdf_utils import writer as writer_mod
+    from pyhanko_tests.samples import simple_page
+    w = writer_mod.PdfFileWriter()
+    shared_resources = None
+    for ix in range(4):
+        page = simple_page(w, f'Page {ix}')
+        if ix < 2:
+            # the first two pages share their resource dictionary
+            if shared_resources is None:
+                shared_resources = w.add_object(page['/Resources'])
+            page['/Resources'] = shared_resources
+        w.insert_page(page)
+    out = BytesIO()
+    w.write(out)
+
+    writer = IncrementalPdfFileWriter(out)
+    placements = [
+        stamp.StampPlacement(ix, 10, 10) for ix in range(4)
+    ] + [stamp.StampPlacement(3, 10, 100, text_params={'ts': 'other'})]
+    results = stamp.stamp_pages(
+        writer, stamp.TextStampStyle(), placements,
+        text_params={'ts': 'fixed'}
+    )
+    assert len(results) == 5
+    out = BytesIO()
+    writer.write(out)
+
+    r = PdfFileReader(out)
+    assert r.xrefs.total_revisions == 2
+
+    def _stamp_xobjs(page_ix):
+        page_obj = r.root['/Pages']['/Kids'][page_ix].get_object()
+        xobjs = page_obj['/Resources']['/XObject']
+        return {xobjs.raw_get(k).idnum for k in xobjs}
+
+    # all pages but the last one carry exactly the same stamp
+    xobj_ids = _stamp_xobjs(0)
+    assert len(xobj_ids) == 1
+    assert all(_stamp_xobjs(ix) == xobj_ids for ix in (1, 2))
+    last_page_xobjs = _stamp_xobjs(3)
+    assert len(last_page_xobjs) == 2 and xobj_ids < last_page_xobjs
+
+
+def _write_multi_page_doc(path, page_count):
+    from pyhanko.pdf_utils import writer as writer_mod
+    from pyhanko_tests.samples import simple_page
+    w = writer_mod.PdfFileWriter()
+    for ix in range(page_count):
+        w.insert_page(simple_page(w, f'Page {ix}'))
+    with open(path, 'wb') as outf:
+        w.write(outf)
+
+
+@pytest.mark.parametrize('spec,expected', [
+    (None, [0, 1, 2, 3, 4]),
+    ('', [0, 1, 2, 3, 4]),
+    ('2', [1]),
+    ('1-2,4', [0, 1, 3]),
+    ('3-', [2, 3, 4]),
+    ('-2', [0, 1]),
+    (' 1 , 5 ', [0, 4]),
+])
+def test_parse_page_ranges(spec, expected):
+    from pyhanko.cli import _parse_page_ranges
+    assert _parse_page_ranges(spec, 5) == expected
+
+
+@pytest.mark.parametrize('spec', ['a', '1-b', '0', '6', '2-7', '3-2'])
+def test_parse_page_ranges_error(spec):
+    import click
+    from pyhanko.cli import _parse_page_ranges
+    with pytest.raises(click.ClickException):
+        _parse_page_ranges(spec, 5)
+
+
+def _run_stamp_cli(tmp_path, *args, config=None):
+    from click.testing import CliRunner
+    from pyhanko.cli import cli
+    infile = str(tmp_path / 'in.pdf')
+    outfile = str(tmp_path / 'out.pdf')
+    if not (tmp_path / 'in.pdf').exists():
+        _write_multi_page_doc(infile, 5)
+    cli_args = []
+    if config is not None:
+        config_file = tmp_path / 'config.yml'
+        config_file.write_text(config)
+        cli_args += ['--config', str(config_file)]
+    cli_args += ['stamp', infile, outfile, '10', '10', *args]
+    result = CliRunner().invoke(cli, cli_args)
+    return result, outfile
+
+
+def _stamped_pages(outfile):
+    with open(outfile, 'rb') as inf:
+        r = PdfFileReader(inf)
+        result = {}
+        for ix, page_ref in enumerate(r.root['/Pages']['/Kids']):
+            try:
+                xobjs = page_ref.get_object()['/Resources']['/XObject']
+            except KeyError:
+                continue
+            result[ix] = [xobjs[k].data for k in xobjs]
+        return result
+
+
+@pytest.mark.parametrize('pages,expected', [
+    ([], [0, 1, 2, 3, 4]),
+    (['--pages', '3'], [2]),
+    (['--pages', '2-3,5'], [1, 2, 4]),
+    (['--pages', '4-'], [3, 4]),
+])
+def test_stamp_cli(tmp_path, pages, expected):
+    result, outfile = _run_stamp_cli(
+        tmp_path, '--text-param', 'ts=now', *pages
+    )
+    assert result.exit_code == 0, result.output
+    stamped = _stamped_pages(outfile)
+    assert sorted(stamped) == expected
+    assert all(b'(now)' in stamped[ix][0] for ix in expected)
+
+
+@pytest.mark.parametrize('args,message', [
+    (['--pages', 'x'], "Could not parse page range 'x'"),
+    (['--pages', '2-6'], "out of bounds"),
+    (['--pages', '0'], "out of bounds"),
+    (['--text-param', 'ts'], "KEY=VALUE"),
+])
+def test_stamp_cli_errors(tmp_path, args, message):
+    result, _ = _run_stamp_cli(tmp_path, *args)
+    assert result.exit_code != 0
+    assert message in result.output
+
+
+def test_stamp_cli_number_from(tmp_path):
+    config = """
+    stamp-styles:
+        numbered:
+            type: text
+            stamp-text: "Page %(n)s"
+    """
+    result, outfile = _run_stamp_cli(
+        tmp_path, '--style-name', 'numbered', '--pages', '2-4',
+        '--number-from', '7', config=config
+    )
+    assert result.exit_code == 0, result.output
+    stamped = _stamped_pages(outfile)
+    assert sorted(stamped) == [1, 2, 3]
+    for ix, n in zip((1, 2, 3), (7, 8, 9)):
+        assert f'(Page {n})'.encode('ascii') in stamped[ix][0]
+
+
+def test_stamp_appearance_cache():
+    cache = stamp.StampAppearanceCache(max_entries=2)
+    style = stamp.QRStampStyle()
+    url = 'https://example.com'
+
+    def _stamp_file(cached, text_params=None):
+        w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+        qr = stamp.QRStamp(
+            w, url, style, text_params=text_params or {'ts': 'fixed'},
+            appearance_cache=cached
+        )
+        _, dims = qr.apply(0, x=10, y=10)
+        out = BytesIO()
+        w.write(out)
+        r = PdfFileReader(out)
+        return dims, r.get_object(qr.register().reference).data
+
+    expected_dims, expected_data = _stamp_file(None)
+    assert _stamp_file(cache) == (expected_dims, expected_data)
+    key, = cache._entries.keys()
+    appearance = cache.get(key)
+
+    # second time around, the appearance is copied instead of re-rendered
+    def _no_render():
+        raise AssertionError
+
+    orig_render = stamp.QRStamp.render
+    stamp.QRStamp.render = _no_render
+    try:
+        assert _stamp_file(cache) == (expected_dims, expected_data)
+    finally:
+        stamp.QRStamp.render = orig_render
+    assert cache.get(key) is appearance
+
+    # evict the first appearance
+    _stamp_file(cache, {'ts': 'other'})
+    _stamp_file(cache, {'ts': 'yet another'})
+    assert len(cache._entries) == 2
+    assert cache.get(key) is None
+
+
+def test_qr_merged_rectangles():
+    import qrcode
+    qr = qrcode.QRCode()
+    qr.add_data('https://example.com')
+    qr.make()
+    img = qr.make_image(image_factory=barcodes.PdfStreamQRImage)
+    dark = set(img._img)
+
+    covered = []
+    rects = list(img.module_rectangles())
+    for row, col, rows, cols in rects:
+        covered.extend(
+            (r, c) for r in range(row, row + rows)
+            for c in range(col, col + cols)
+        )
+    # every dark module is painted exactly once
+    assert len(covered) == len(set(covered))
+    assert set(covered) == dark
+    assert len(rects) < len(dark) // 2
+
+    mask = img.render_image_mask()
+    size = qr.modules_count + 2 * qr.border
+    assert mask['/Width'] == mask['/Height'] == size
+    row_bytes = (size + 7) // 8
+    data = mask.data
+    for row in range(qr.modules_count):
+        for col in range(qr.modules_count):
+            x = col + qr.border
+            byte = data[(row + qr.border) * row_bytes + x // 8]
+            is_dark = not (byte & (0x80 >> (x % 8)))
+            assert is_dark == ((row, col) in dark)
+
+    rendered = barcodes.render_qr('https://example.com')
+    assert rendered.command_stream.count(b're') == len(rects)
+    assert barcodes.render_qr('https://example.com') is rendered
+
+
+def test_barcode_module_heights():
+    writer = barcodes.PdfStreamBarcodeWriter()
+    writer._command_stream = [b'q']
+    # python-barcode changes module_height between modules for guard bars
+    for height, xpos in ((10, 0), (10, 1), (15, 2), (15, 3), (10, 4)):
+        writer.module_height = height
+        writer._paint_module(xpos, 0, 1, 'black')
+    commands = writer._finish()
+    rects = [
+        [float(x) for x in line.split()[:4]]
+        for line in commands.split(b'\n') if line.endswith(b're f')
+    ]
+    uu = barcodes.mm2uu
+    expected = [
+        [0, 0, uu(2), uu(10)], [uu(2), 0, uu(2), uu(15)],
+        [uu(4), 0, uu(1), uu(10)],
+    ]
+    assert len(rects) == len(expected)
+    for rect, expected_rect in zip(rects, expected):
+        assert rect == pytest.approx(expected_rect, rel=1e-5)
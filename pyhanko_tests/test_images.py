@@ -6,6 +6,7 @@ from PIL import Image
 from .samples import *
 from pyhanko.pdf_utils import images
 from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
+from pyhanko.pdf_utils.reader import PdfFileReader
 from pyhanko.pdf_utils import generic
 from pyhanko.pdf_utils.generic import pdf_name
 
@@ -51,3 +52,90 @@ def test_image_content_embed(infile):
     w.add_content_to_page(0, img_content, prepend=True)
 
     w.write_in_place()
+
+
+def _encoded_image(mode, fmt, size=(37, 23), **kwargs):
+    img = Image.new(mode, size)
+    # draw a gradient so PNG encoders use a variety of filters
+    img.putdata([
+        (x * 7 + y * 3) % 256 if mode in ('L', 'P')
+        else ((x * 7) % 256, (y * 11) % 256, (x * y) % 256)
+        for y in range(size[1]) for x in range(size[0])
+    ])
+    out = BytesIO()
+    img.save(out, format=fmt, **kwargs)
+    return img, out.getvalue()
+
+
+def _embed_and_read(image_data):
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    img_content = images.PdfImage(
+        image_data, writer=w, image_cache=images.ImageXObjectCache()
+    )
+    img_content.box.height = 144
+    w.add_content_to_page(0, img_content, prepend=True)
+    image_ref = img_content.image_ref
+    out = BytesIO()
+    w.write(out)
+    r = PdfFileReader(out)
+    return r.get_object(image_ref.reference)
+
+
+def test_image_jpeg_passthrough():
+    _, jpeg_data = _encoded_image('RGB', 'JPEG')
+    image_obj = _embed_and_read(jpeg_data)
+    assert image_obj['/Filter'] == '/DCTDecode'
+    assert image_obj['/ColorSpace'] == '/DeviceRGB'
+    assert image_obj.encoded_data == jpeg_data
+
+
+@pytest.mark.parametrize('mode', ['L', 'RGB'])
+def test_image_png_passthrough(mode):
+    img, png_data = _encoded_image(mode, 'PNG', optimize=True)
+    image_obj = _embed_and_read(png_data)
+    assert image_obj['/DecodeParms']['/Predictor'] == 15
+    # the decoded data must match the original pixels exactly
+    assert image_obj.data == img.tobytes()
+
+
+def test_image_indexed_packed():
+    img = Image.open(os.path.join(IMG_DIR, 'stamp-indexed.png'))
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    image_obj = images.pil_image(img, w).get_object()
+    assert image_obj['/BitsPerComponent'] == 1
+    row_len = (img.width + 7) // 8
+    data = image_obj.data
+    assert len(data) == row_len * img.height
+    unpacked = bytes(
+        (data[y * row_len + x // 8] >> (7 - x % 8)) & 1
+        for y in range(img.height) for x in range(img.width)
+    )
+    assert unpacked == img.tobytes()
+
+
+def test_image_cache():
+    cache = images.ImageXObjectCache(max_entries=1)
+    with open(os.path.join(IMG_DIR, 'stamp.png'), 'rb') as inf:
+        png_data = inf.read()
+
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    refs = set()
+    for _ in range(2):
+        img_content = images.PdfImage(png_data, writer=w, image_cache=cache)
+        refs.add(img_content.image_ref.idnum)
+    # embedded only once per writer
+    assert len(refs) == 1
+    cached_ref, = cache._entries.values()
+
+    # another document gets a copy of the cached image
+    w2 = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    img_content = images.PdfImage(png_data, writer=w2, image_cache=cache)
+    image_obj = img_content.image_ref.get_object()
+    assert cache._entries[img_content._digest] is cached_ref
+    assert '/SMask' in image_obj
+    assert image_obj['/Width'] == 378
+
+    # a different image evicts the first one
+    _, jpeg_data = _encoded_image('RGB', 'JPEG')
+    images.PdfImage(jpeg_data, writer=w2, image_cache=cache).image_ref
+    assert list(cache._entries.values()) != [cached_ref]
@@ -1,14 +1,18 @@
+import hashlib
 import re
-from datetime import datetime
+from concurrent import futures
+from datetime import datetime, timedelta
 
 import pytest
 from io import BytesIO
 
 import pytz
-from asn1crypto import ocsp, tsp
+from asn1crypto import ocsp, tsp, pem, cms, core
 
 import pyhanko.pdf_utils.content
-from certvalidator.errors import PathValidationError
+from certvalidator.errors import (
+    PathValidationError, InvalidCertificateError, SoftFailError
+)
 
 import pyhanko.sign.fields
 from certvalidator import ValidationContext, CertificateValidator
@@ -22,15 +26,22 @@ from pyhanko.pdf_utils.images import PdfImage
 from pyhanko.pdf_utils.misc import BoxConstraints
 from pyhanko.pdf_utils.writer import PdfFileWriter
 from pyhanko.sign import timestamps, fields, signers
-from pyhanko.sign.general import UnacceptableSignerError, SigningError
+from pyhanko.sign.general import (
+    UnacceptableSignerError, SigningError, simple_cms_attribute
+)
 from pyhanko.sign.signers import PdfTimestamper
+from pyhanko.sign.revinfo import (
+    RevocationInfoCache, CachingValidationContext, CRLStore,
+    prefetch_ocsp_responses, ValidationPathCache, RevocationInfoFetchError
+)
 from pyhanko.sign.validation import (
     validate_pdf_signature, read_certification_data, DocumentSecurityStore,
     EmbeddedPdfSignature, apply_adobe_revocation_info,
     validate_pdf_ltv_signature, RevocationInfoValidationType,
     SignatureCoverageLevel, ModificationLevel, SignatureValidationError,
+    validate_all_signatures, validate_documents,
 )
-from pyhanko.pdf_utils.reader import PdfFileReader
+from pyhanko.pdf_utils.reader import PdfFileReader, PdfReaderSnapshot
 from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
 from .samples import *
 
@@ -121,7 +132,7 @@ def live_testing_vc(requests_mock):
 
     def serve_ocsp_response(request, _context):
         req: ocsp.OCSPRequest = ocsp.OCSPRequest.load(request.body)
-        nonce = req.nonce_value.native
+        nonce = req.nonce_value
         # we only look at the serial number, this is a dummy responder
         # the return data is hardcoded (for now)
         # TODO read it off from the OpenSSL CA index
@@ -137,7 +148,8 @@ def live_testing_vc(requests_mock):
             else:
                 bld = OCSPResponseBuilder('unauthorized')
 
-            bld.nonce = nonce
+            if nonce is not None:
+                bld.nonce = nonce.native
             bld.certificate_issuer = INTERM_CERT
             return bld.build(
                 responder_certificate=OCSP_CERT, responder_private_key=OCSP_KEY
@@ -230,6 +242,53 @@ def test_simple_sign(incl_signed_time):
     assert tampered.summary() == 'INVALID'
 
 
+@pytest.mark.parametrize('in_place', [True, False])
+def test_sign_self_verify(in_place):
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    out = signers.sign_pdf(
+        w, meta, signer=FROM_CA, in_place=in_place, self_verify=True
+    )
+    r = PdfFileReader(out)
+    emb = r.embedded_signatures[0]
+    val_trusted(emb)
+
+
+def test_sign_self_verify_failure():
+
+    class BrokenSigner(signers.SimpleSigner):
+        def sign_raw(self, data: bytes, digest_algorithm: str, dry_run=False):
+            signature = super().sign_raw(data, digest_algorithm, dry_run)
+            return bytes(b ^ 0xff for b in signature)
+
+    signer = BrokenSigner(
+        signing_cert=FROM_CA.signing_cert,
+        signing_key=FROM_CA.signing_key, cert_registry=FROM_CA.cert_registry
+    )
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    # no verification -> no error
+    signers.sign_pdf(w, meta, signer=signer)
+
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    with pytest.raises(SigningError, match='Self-verification'):
+        signers.sign_pdf(w, meta, signer=signer, self_verify=True)
+
+
+def test_sign_from_snapshot():
+    snapshot = PdfReaderSnapshot(MINIMAL)
+    for field_name in ('Sig1', 'Sig2'):
+        w = IncrementalPdfFileWriter.from_snapshot(snapshot)
+        out = signers.sign_pdf(
+            w, signers.PdfSignatureMetadata(field_name=field_name),
+            signer=FROM_CA
+        )
+        r = PdfFileReader(out)
+        emb, = r.embedded_signatures
+        assert emb.field_name == field_name
+        val_trusted(emb)
+
+
 def test_sign_with_trust():
     w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
     out = signers.sign_pdf(
@@ -244,6 +303,103 @@ def test_sign_with_trust():
     val_trusted(s)
 
 
+@pytest.mark.parametrize('use_pades', [True, False])
+def test_sign_cms_templates(use_pades):
+    signer = signers.SimpleSigner(
+        signing_cert=FROM_CA.signing_cert, signing_key=FROM_CA.signing_key,
+        cert_registry=FROM_CA.cert_registry
+    )
+    signer.use_cms_templates = True
+    digest = hashlib.sha256(b'Hello world!').digest()
+    timestamp = datetime(2020, 11, 1, tzinfo=pytz.utc)
+
+    def _sign(s):
+        return s.sign(
+            digest, 'sha256', timestamp=timestamp, use_pades=use_pades
+        )['content']
+
+    templated = _sign(signer)
+    # second time around, the templates are reused
+    assert _sign(signer).dump() == templated.dump()
+    expected = _sign(FROM_CA)
+    assert templated['signer_infos'].dump() == expected['signer_infos'].dump()
+    assert templated['digest_algorithms'].dump() \
+        == expected['digest_algorithms'].dump()
+    assert set(c.chosen.dump() for c in templated['certificates']) \
+        == set(c.chosen.dump() for c in expected['certificates'])
+
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    meta = signers.PdfSignatureMetadata(
+        field_name='Sig1',
+        subfilter=fields.SigSeedSubFilter.PADES if use_pades else None
+    )
+    out = signers.sign_pdf(w, meta, signer=signer)
+    r = PdfFileReader(out)
+    val_trusted(r.embedded_signatures[0])
+
+
+class _ExtraAttrSigner(signers.SimpleSigner):
+    def signed_attrs(self, *args, **kwargs):
+        attrs = super().signed_attrs(*args, **kwargs)
+        signing_time = core.UTCTime(datetime(2020, 11, 1, tzinfo=pytz.utc))
+        extra = simple_cms_attribute(
+            'signing_time', cms.Time({'utc_time': signing_time})
+        )
+        return cms.CMSAttributes(list(attrs) + [extra])
+
+
+@pytest.mark.parametrize('use_cms_templates', [True, False])
+def test_sign_signed_attrs_override(use_cms_templates):
+    signer = _ExtraAttrSigner(
+        signing_cert=FROM_CA.signing_cert, signing_key=FROM_CA.signing_key,
+        cert_registry=FROM_CA.cert_registry
+    )
+    signer.use_cms_templates = use_cms_templates
+    digest = hashlib.sha256(b'Hello world!').digest()
+    content = signer.sign(digest, 'sha256', use_pades=True)['content']
+    attrs = content['signer_infos'][0]['signed_attrs']
+    assert 'signing_time' in [attr['type'].native for attr in attrs]
+
+
+class _LegacyOverrideSigner(signers.SimpleSigner):
+    # overrides written against the signatures that predate CMS templates
+
+    def signed_attrs(self, data_digest, timestamp=None,
+                     revocation_info=None, use_pades=False):
+        return super().signed_attrs(
+            data_digest, timestamp, revocation_info=revocation_info,
+            use_pades=use_pades
+        )
+
+    def signer_info(self, digest_algorithm, signed_attrs, signature):
+        return super().signer_info(digest_algorithm, signed_attrs, signature)
+
+
+def test_sign_legacy_override():
+    signer = _LegacyOverrideSigner(
+        signing_cert=FROM_CA.signing_cert, signing_key=FROM_CA.signing_key,
+        cert_registry=FROM_CA.cert_registry
+    )
+    digest = hashlib.sha256(b'Hello world!').digest()
+    content = signer.sign(digest, 'sha256', use_pades=True)['content']
+    expected = FROM_CA.sign(digest, 'sha256', use_pades=True)['content']
+    assert content['signer_infos'].dump() == expected['signer_infos'].dump()
+
+
+def test_sign_cms_templates_mechanism_change():
+    signer = signers.SimpleSigner(
+        signing_cert=FROM_CA.signing_cert, signing_key=FROM_CA.signing_key,
+        cert_registry=FROM_CA.cert_registry
+    )
+    signer.use_cms_templates = True
+    digest = hashlib.sha256(b'Hello world!').digest()
+    signer.sign(digest, 'sha256')
+    signer.pkcs7_signature_mechanism = 'sha256_rsa'
+    content = signer.sign(digest, 'sha256')['content']
+    sig_algo = content['signer_infos'][0]['signature_algorithm']
+    assert sig_algo['algorithm'].native == 'sha256_rsa'
+
+
 def test_sign_with_trust_pkcs12():
     w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
     out = signers.sign_pdf(
@@ -312,6 +468,265 @@ def test_sign_with_bitmap_bg():
     assert s.field_name == 'Sig1'
     val_trusted(s)
 
+
+def _three_signatures():
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL_TWO_FIELDS))
+    out = signers.sign_pdf(
+        w, signers.PdfSignatureMetadata(field_name='Sig1'), signer=FROM_CA,
+        existing_fields_only=True
+    )
+    w = IncrementalPdfFileWriter(out)
+    out = signers.sign_pdf(
+        w, signers.PdfSignatureMetadata(field_name='Sig2'), signer=FROM_CA,
+        existing_fields_only=True
+    )
+    w = IncrementalPdfFileWriter(out)
+    return signers.sign_pdf(
+        w, signers.PdfSignatureMetadata(field_name='Sig3'), signer=FROM_CA
+    )
+
+
+def test_shared_integrity_analysis(monkeypatch):
+    from pyhanko.sign import validation
+
+    split_calls = []
+    orig_split = validation._split_sig_fields
+
+    def _split(resolver, field_list):
+        split_calls.append(
+            (resolver.revision, tuple(f.reference for f in field_list))
+        )
+        return orig_split(resolver, field_list)
+
+    monkeypatch.setattr(validation, '_split_sig_fields', _split)
+
+    r = PdfFileReader(_three_signatures())
+    sigs = r.embedded_signatures
+    assert len({s.signed_revision for s in sigs}) == 3
+    session = sigs[0].session
+    assert all(s.session is session for s in sigs)
+    for s in sigs[:-1]:
+        val_trusted(s, extd=True)
+    val_trusted(sigs[-1])
+    # The first signature is compared with both later revisions, and the
+    # second one with the last revision. The field lists in every revision
+    # are only analysed once, even though they're involved in comparisons
+    # for different signatures.
+    assert split_calls
+    assert len(split_calls) == len(set(split_calls))
+
+    s = sigs[0]
+    diff = session.diff_revision(r, s.signed_revision, s.signed_revision + 1)
+    assert diff.modification_level == ModificationLevel.FORM_FILLING
+    assert diff.explained_refs_formfill
+
+    # a fresh signature object reuses the analysis done for the first one
+    def _fail(*_args, **_kwargs):
+        raise AssertionError
+
+    monkeypatch.setattr(validation, '_diff_revision', _fail)
+    fresh = validation.EmbeddedPdfSignature(r, s.sig_field, session=session)
+    fresh.compute_integrity_info()
+    assert fresh.modification_level == ModificationLevel.FORM_FILLING
+
+
+def test_validation_session_no_reader_refs():
+    import gc
+    import weakref
+    r = PdfFileReader(_three_signatures())
+    sigs = r.embedded_signatures
+    sigs[0].compute_integrity_info()
+    session = sigs[0].session
+    reader_ref = weakref.ref(r)
+    del r, sigs
+    gc.collect()
+    # the session's results outlive the reader
+    assert reader_ref() is None
+    assert session._diffs
+
+
+@pytest.mark.parametrize('executor_cls', [
+    None, futures.ThreadPoolExecutor, futures.ProcessPoolExecutor
+])
+def test_validate_all_signatures(executor_cls):
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL_TWO_FIELDS))
+    out = signers.sign_pdf(
+        w, signers.PdfSignatureMetadata(field_name='Sig2'), signer=FROM_CA,
+        existing_fields_only=True
+    )
+    w = IncrementalPdfFileWriter(out)
+    out = signers.sign_pdf(
+        w, signers.PdfSignatureMetadata(field_name='Sig1'), signer=FROM_CA,
+        existing_fields_only=True
+    )
+    r = PdfFileReader(out)
+    kwargs = {'trust_roots': [ROOT_CERT]}
+    if executor_cls is None:
+        results = validate_all_signatures(r, kwargs)
+    else:
+        with executor_cls(max_workers=2) as executor:
+            results = validate_all_signatures(r, kwargs, executor=executor)
+
+    # results are reported in field order, not in signing order
+    assert [res.field_name for res in results] == ['Sig1', 'Sig2']
+    sig1, sig2 = results
+    assert sig1.status.bottom_line
+    assert sig1.status.modification_level == ModificationLevel.NONE
+    assert sig2.status.bottom_line
+    assert sig2.status.coverage == SignatureCoverageLevel.ENTIRE_REVISION
+    assert sig2.error is None
+
+
+def _corrupt_digest_algorithm(data: bytes, start=0) -> bytes:
+    # replace the SHA-256 OID in the hex-encoded signature(s) after 'start'
+    # by an unknown one
+    sha256_oid = b'608648016503040201'
+    corrupted = re.sub(
+        sha256_oid, b'60864801650304027f', data[start:], flags=re.I
+    )
+    assert corrupted != data[start:]
+    return data[:start] + corrupted
+
+
+@pytest.mark.parametrize('executor_cls', [
+    None, futures.ThreadPoolExecutor, futures.ProcessPoolExecutor
+])
+def test_validate_all_signatures_malformed(executor_cls):
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL_TWO_FIELDS))
+    out = signers.sign_pdf(
+        w, signers.PdfSignatureMetadata(field_name='Sig1'), signer=FROM_CA,
+        existing_fields_only=True
+    )
+    first_revision_end = len(out.getvalue())
+    w = IncrementalPdfFileWriter(out)
+    out = signers.sign_pdf(
+        w, signers.PdfSignatureMetadata(field_name='Sig2'), signer=FROM_CA,
+        existing_fields_only=True
+    )
+    data = _corrupt_digest_algorithm(out.getvalue(), first_revision_end)
+    r = PdfFileReader(BytesIO(data))
+    kwargs = {'trust_roots': [ROOT_CERT]}
+    if executor_cls is None:
+        results = validate_all_signatures(r, kwargs)
+    else:
+        with executor_cls(max_workers=2) as executor:
+            results = validate_all_signatures(r, kwargs, executor=executor)
+
+    sig1, sig2 = results
+    assert sig1.status.bottom_line
+    assert sig2.status is None
+    assert sig2.error_code == 'MALFORMED'
+    assert not isinstance(sig2.error, ValueError)
+
+
+def test_validate_documents(tmp_path):
+    paths = []
+    for ix in range(3):
+        w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+        out = signers.sign_pdf(
+            w, signers.PdfSignatureMetadata(field_name='Sig1'),
+            signer=FROM_CA
+        )
+        path = str(tmp_path / ('signed%d.pdf' % ix))
+        with open(path, 'wb') as outf:
+            outf.write(out.getvalue())
+        paths.append(path)
+    unsigned = str(tmp_path / 'unsigned.pdf')
+    with open(unsigned, 'wb') as outf:
+        outf.write(MINIMAL)
+    garbage = str(tmp_path / 'garbage.pdf')
+    with open(garbage, 'wb') as outf:
+        outf.write(b'this is not a PDF file')
+    paths[1:1] = [unsigned, garbage]
+
+    kwargs = {'trust_roots': [ROOT_CERT]}
+    reports = list(validate_documents(
+        paths, kwargs, max_workers=2, max_pending=3
+    ))
+    assert [report.path for report in reports] == paths
+    assert [report.bottom_line for report in reports] == \
+        [True, False, False, True, True]
+
+    records = [
+        record for report in reports for record in report.as_json_records()
+    ]
+    assert [record['status'] for record in records] == \
+        ['VALID', 'UNSIGNED', 'UNREADABLE', 'VALID', 'VALID']
+    signed_record = records[0]
+    assert signed_record['field'] == 'Sig1'
+    assert signed_record['coverage'] == 'ENTIRE_FILE'
+    assert signed_record['modification_level'] == 'NONE'
+    assert signed_record['duration'] > 0
+    assert 'Lord Testerino' in signed_record['signer']
+
+    reports = list(validate_documents(
+        paths, kwargs, max_workers=2, fail_fast=True
+    ))
+    assert [report.path for report in reports] == paths[:2]
+
+
+def test_validate_documents_malformed(tmp_path):
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    signed = signers.sign_pdf(
+        w, signers.PdfSignatureMetadata(field_name='Sig1'), signer=FROM_CA
+    ).getvalue()
+    fields = b'/Fields [ 7 0 R ]'
+    assert fields in signed
+    contents = {
+        'first.pdf': signed,
+        'bad_digest.pdf': _corrupt_digest_algorithm(signed),
+        # malformed form, without shifting any offsets
+        'bad_fields.pdf': signed.replace(fields, b'/Fields [[7 0 R]]'),
+        'last.pdf': signed,
+    }
+    paths = []
+    for fname, data in contents.items():
+        path = str(tmp_path / fname)
+        with open(path, 'wb') as outf:
+            outf.write(data)
+        paths.append(path)
+
+    kwargs = {'trust_roots': [ROOT_CERT]}
+    reports = list(validate_documents(paths, kwargs, max_workers=2))
+    assert [report.path for report in reports] == paths
+    records = [
+        record for report in reports for record in report.as_json_records()
+    ]
+    assert [record['status'] for record in records] == \
+        ['VALID', 'MALFORMED', 'UNREADABLE', 'VALID']
+    assert reports[2].error
+
+
+def test_batch_worker_releases_readers(tmp_path, monkeypatch):
+    import gc
+    import weakref
+    from pyhanko.sign import validation
+
+    readers = []
+
+    class _TrackedReader(PdfFileReader):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            readers.append(weakref.ref(self))
+
+    monkeypatch.setattr(validation, 'PdfFileReader', _TrackedReader)
+    monkeypatch.setattr(validation, '_batch_settings', None)
+
+    path = str(tmp_path / 'signed.pdf')
+    with open(path, 'wb') as outf:
+        outf.write(_three_signatures().getvalue())
+
+    validation._init_batch_worker({'trust_roots': [ROOT_CERT]}, None, False)
+    reports = [
+        validation._validate_document_in_worker(path) for _ in range(2)
+    ]
+    assert all(report.bottom_line for report in reports)
+    assert len(reports[0].results) == 3
+    gc.collect()
+    assert len(readers) == 2
+    assert all(reader_ref() is None for reader_ref in readers)
+
+
 def test_sign_field_filled():
     w1 = IncrementalPdfFileWriter(BytesIO(MINIMAL_TWO_FIELDS))
 
@@ -404,6 +819,37 @@ def test_double_sig_add_field():
     val_trusted(s)
 
 
+def test_double_sig_auto_object_streams():
+    w = IncrementalPdfFileWriter(
+        BytesIO(MINIMAL_XREF), auto_object_streams=True
+    )
+    out = signers.sign_pdf(
+        w, signers.PdfSignatureMetadata(
+            field_name='Sig1', certify=True,
+            docmdp_permissions=fields.MDPPerm.FILL_FORMS
+        ),
+        signer=FROM_CA,
+    )
+    w = IncrementalPdfFileWriter(out, auto_object_streams=True)
+    out = signers.sign_pdf(
+        w, signers.PdfSignatureMetadata(field_name='Sig2'), signer=FROM_CA,
+    )
+
+    r = PdfFileReader(out)
+    s = r.embedded_signatures[0]
+    assert s.field_name == 'Sig1'
+    # the signature objects themselves must not end up in object streams
+    sig_obj_ref = s.sig_field.raw_get('/V')
+    assert sig_obj_ref.idnum not in r.xrefs.in_obj_stream
+    status = val_trusted(s, extd=True)
+    assert status.modification_level == ModificationLevel.FORM_FILLING
+    assert status.docmdp_ok
+
+    s = r.embedded_signatures[1]
+    assert s.field_name == 'Sig2'
+    val_trusted(s)
+
+
 def test_double_sig_add_visible_field():
     w = IncrementalPdfFileWriter(BytesIO(MINIMAL_ONE_FIELD))
     out = signers.sign_pdf(
@@ -534,6 +980,98 @@ def test_http_timestamp(requests_mock):
     assert validity.timestamp_validity.trusted
 
 
+def test_http_timestamp_metadata_cache(requests_mock, tmp_path):
+    requests_mock.post(
+        DUMMY_HTTP_TS.url, content=ts_response_callback,
+        headers={'Content-Type': 'application/timestamp-reply'}
+    )
+    cache = timestamps.TSAMetadataCache(str(tmp_path))
+
+    def _sign():
+        w = IncrementalPdfFileWriter(BytesIO(MINIMAL_ONE_FIELD))
+        ts = timestamps.HTTPTimeStamper(DUMMY_HTTP_TS.url, metadata_cache=cache)
+        out = signers.sign_pdf(
+            w, signers.PdfSignatureMetadata(), signer=FROM_CA, timestamper=ts,
+            existing_fields_only=True,
+        )
+        r = PdfFileReader(out)
+        assert val_trusted(r.embedded_signatures[0]).timestamp_validity.trusted
+        # the TSA certificates are known without probing
+        assert len(list(ts.validation_paths(SIMPLE_V_CONTEXT))) == 1
+
+    _sign()
+    # probe request + actual timestamp
+    assert requests_mock.call_count == 2
+    _sign()
+    # a fresh timestamper should be able to skip the probe
+    assert requests_mock.call_count == 3
+
+    assert cache.get(DUMMY_HTTP_TS.url, 'sha256') is not None
+    assert cache.get(DUMMY_HTTP_TS.url, 'sha512') is None
+    expired = timestamps.TSAMetadataCache(str(tmp_path), ttl=timedelta(0))
+    expired.put(
+        DUMMY_HTTP_TS.url, 'sha256', cache.get(DUMMY_HTTP_TS.url, 'sha256')
+    )
+    assert cache.get(DUMMY_HTTP_TS.url, 'sha256') is None
+
+
+class FailingTimeStamper(timestamps.TimeStamper):
+    def request_tsa_response(self, req):
+        raise timestamps.TimestampRequestError('TSA is down')
+
+
+class SlowTimeStamper(timestamps.TimeStamper):
+    def __init__(self, delay):
+        import threading
+        self.delay = delay
+        self.release = threading.Event()
+        super().__init__()
+
+    def request_tsa_response(self, req):
+        self.release.wait(self.delay)
+        return DUMMY_TS.request_tsa_response(req)
+
+
+def test_multi_timestamp_failover():
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL_ONE_FIELD))
+    ts = timestamps.MultiTimeStamper(
+        [FailingTimeStamper(), DUMMY_TS], hedge_delay=10
+    )
+    out = signers.sign_pdf(
+        w, signers.PdfSignatureMetadata(), signer=FROM_CA, timestamper=ts,
+        existing_fields_only=True,
+    )
+
+    r = PdfFileReader(out)
+    validity = val_trusted(r.embedded_signatures[0])
+    assert validity.timestamp_validity.trusted
+    assert ts.stats[0].errors > 0 and ts.stats[1].errors == 0
+    # the broken TSA should have been demoted
+    assert ts.ranked_timestampers() == [1, 0]
+    assert len(list(ts.validation_paths(SIMPLE_V_CONTEXT))) == 1
+
+    ts.close()
+
+    with pytest.raises(timestamps.TimestampRequestError):
+        with timestamps.MultiTimeStamper([FailingTimeStamper()]) as failing:
+            failing.timestamp(bytes(32), 'sha256')
+
+
+def test_multi_timestamp_hedged():
+    slow = SlowTimeStamper(delay=5)
+    ts = timestamps.MultiTimeStamper([slow, DUMMY_TS], hedge_delay=0.05)
+    import time
+    start = time.monotonic()
+    ts.timestamp(bytes(32), 'sha256')
+    assert time.monotonic() - start < 3
+    assert ts.stats[1].requests == 1
+    assert ts.ranked_timestampers() == [1, 0]
+    slow.release.set()
+    ts.close()
+    # the losing request was allowed to finish before shutting down
+    assert ts.stats[0].requests == 1
+
+
 # try both the user password and the owner password
 @pytest.mark.parametrize('password', [b'usersecret', b'ownersecret'])
 def test_sign_crypt_rc4(password):
@@ -784,6 +1322,229 @@ def test_cert_constraint_issuer(requests_mock):
     scc.satisfied_by(DUMMY_TS.tsa_cert, tsa_validation_path)
 
 
+def test_revinfo_cache(requests_mock, tmp_path):
+    live_testing_vc(requests_mock)
+    cache = RevocationInfoCache(cache_dir=str(tmp_path))
+
+    # prime the cache
+    ocsp_resp = cache.get_ocsp(FROM_CA.signing_cert, INTERM_CERT)
+    crls = cache.get_crls(INTERM_CERT)
+    assert len(crls) == 1
+    call_count = requests_mock.call_count
+    assert call_count == 2
+
+    def _validate():
+        vc = CachingValidationContext(
+            revinfo_cache=cache, trust_roots=TRUST_ROOTS, allow_fetching=True
+        )
+        CertificateValidator(
+            FROM_CA.signing_cert, FROM_CA.cert_registry, validation_context=vc
+        ).validate_usage(set())
+        return vc
+
+    # validation should be served from the in-memory cache
+    vc = _validate()
+    assert vc.ocsps == [ocsp_resp]
+    assert vc.crls == crls
+    _validate()
+    assert requests_mock.call_count == call_count
+
+    # ... and a fresh cache should be able to load everything from disk
+    cache = RevocationInfoCache(cache_dir=str(tmp_path))
+    _validate()
+    assert requests_mock.call_count == call_count
+
+
+def test_revinfo_cache_fetch_params(requests_mock, monkeypatch):
+    live_testing_vc(requests_mock)
+    from certvalidator import crl_client
+    crl_certs = []
+
+    def _fetch_certs(certificate_list, user_agent=None, timeout=10):
+        crl_certs.append((user_agent, timeout))
+        return [INTERM_CERT]
+
+    monkeypatch.setattr(crl_client, 'fetch_certs', _fetch_certs)
+    cache = RevocationInfoCache()
+
+    def _vc():
+        return CachingValidationContext(
+            revinfo_cache=cache, trust_roots=TRUST_ROOTS,
+            allow_fetching=True,
+            crl_fetch_params={'user_agent': 'test-agent', 'timeout': 3},
+            ocsp_fetch_params={'user_agent': 'test-agent', 'timeout': 4},
+        )
+    vc = _vc()
+    vc.retrieve_ocsps(FROM_CA.signing_cert, INTERM_CERT)
+    vc.retrieve_crls(INTERM_CERT)
+    ocsp_req, crl_req = requests_mock.request_history
+    assert ocsp_req.headers['User-Agent'] == 'test-agent'
+    assert ocsp_req.timeout == 4
+    assert crl_req.headers['User-Agent'] == 'test-agent'
+    assert crl_req.timeout == 3
+    # certificates referred to by CRLs should be registered
+    assert crl_certs == [('test-agent', 3)]
+    assert INTERM_CERT.dump() in [
+        c.dump() for c in vc.new_revocation_certs
+    ]
+
+    # the certificates are cached along with the CRL
+    vc = _vc()
+    vc.retrieve_crls(INTERM_CERT)
+    assert len(crl_certs) == 1
+    assert INTERM_CERT.dump() in [
+        c.dump() for c in vc.new_revocation_certs
+    ]
+
+
+def test_revinfo_cache_broken_crl_dp(requests_mock, monkeypatch):
+    import requests
+    live_testing_vc(requests_mock)
+    broken_url = 'http://broken.example.com/crl'
+    requests_mock.register_uri(
+        'GET', broken_url, exc=requests.exceptions.ConnectTimeout
+    )
+    (good_url,) = RevocationInfoCache.crl_urls(INTERM_CERT)
+    monkeypatch.setattr(
+        RevocationInfoCache, 'crl_urls',
+        staticmethod(lambda cert, use_deltas=True: [broken_url, good_url])
+    )
+
+    def _vc(mode):
+        return CachingValidationContext(
+            revinfo_cache=RevocationInfoCache(), trust_roots=TRUST_ROOTS,
+            allow_fetching=True, revocation_mode=mode
+        )
+
+    # one broken distribution point doesn't affect the others
+    crls = _vc('hard-fail').retrieve_crls(INTERM_CERT)
+    assert len(crls) == 1
+
+    monkeypatch.setattr(
+        RevocationInfoCache, 'crl_urls',
+        staticmethod(lambda cert, use_deltas=True: [broken_url])
+    )
+    vc = _vc('soft-fail')
+    with pytest.raises(SoftFailError):
+        vc.retrieve_crls(INTERM_CERT)
+    assert vc.retrieve_crls(INTERM_CERT) == []
+    with pytest.raises(RevocationInfoFetchError):
+        _vc('hard-fail').retrieve_crls(INTERM_CERT)
+
+
+def test_prefetch_ocsp(requests_mock):
+    live_testing_vc(requests_mock)
+    vc = CachingValidationContext(
+        revinfo_cache=RevocationInfoCache(), trust_roots=TRUST_ROOTS,
+        allow_fetching=True
+    )
+    prefetch_ocsp_responses(
+        vc, [FROM_CA.signing_cert, REVOKED_CERT],
+        intermediate_certs=FROM_CA.cert_registry
+    )
+    assert requests_mock.call_count == 2
+    assert len(vc.ocsps) == 2
+
+    # the validation context shouldn't need to go out again
+    vc.retrieve_ocsps(FROM_CA.signing_cert, INTERM_CERT)
+    prefetch_ocsp_responses(vc, [FROM_CA.signing_cert])
+    assert requests_mock.call_count == 2
+
+
+def test_validation_path_cache(requests_mock):
+    live_testing_vc(requests_mock)
+    revinfo_cache = RevocationInfoCache()
+    ocsp_resp = revinfo_cache.get_ocsp(FROM_CA.signing_cert, INTERM_CERT)
+    revinfo_cache.get_crls(INTERM_CERT)
+    call_count = requests_mock.call_count
+    path_cache = ValidationPathCache()
+
+    def _validate(cache):
+        vc = CachingValidationContext(
+            revinfo_cache=cache, trust_roots=TRUST_ROOTS, allow_fetching=True
+        )
+        path, = path_cache.validate(
+            [FROM_CA.signing_cert], vc,
+            intermediate_certs=FROM_CA.cert_registry,
+            key_usage={'non_repudiation'}
+        )
+        return vc, path
+
+    _, path = _validate(revinfo_cache)
+    assert path.first.issuer_serial == ROOT_CERT.issuer_serial
+    assert requests_mock.call_count == call_count
+
+    # the revocation info should come from the path cache now
+    vc, cached_path = _validate(RevocationInfoCache())
+    assert cached_path is path
+    assert vc.ocsps == [ocsp_resp]
+    assert len(vc.crls) == 1
+    assert requests_mock.call_count == call_count
+
+    # a different key usage requirement means a different cache entry
+    vc = CachingValidationContext(
+        revinfo_cache=revinfo_cache, trust_roots=TRUST_ROOTS,
+        allow_fetching=True
+    )
+    with pytest.raises(InvalidCertificateError):
+        path_cache.validate(
+            [FROM_CA.signing_cert], vc,
+            intermediate_certs=FROM_CA.cert_registry,
+            key_usage={'key_cert_sign'}
+        )
+
+
+def test_validation_path_cache_soft_fail(requests_mock):
+    import requests
+    live_testing_vc(requests_mock)
+    requests_mock.register_uri(
+        'POST', re.compile(r"^http://ocsp\.example\.com/"),
+        exc=requests.exceptions.ConnectTimeout
+    )
+    path_cache = ValidationPathCache()
+
+    def _validate():
+        vc = CachingValidationContext(
+            revinfo_cache=RevocationInfoCache(), trust_roots=TRUST_ROOTS,
+            allow_fetching=True, revocation_mode='soft-fail'
+        )
+        path_cache.validate(
+            [FROM_CA.signing_cert], vc,
+            intermediate_certs=FROM_CA.cert_registry,
+            key_usage={'non_repudiation'}
+        )
+        return vc
+
+    vc = _validate()
+    # the OCSP responder was unreachable while prefetching
+    assert vc.soft_fail_exceptions
+    assert not vc.ocsps
+    # ... so the result shouldn't be cached
+    call_count = requests_mock.call_count
+    _validate()
+    assert requests_mock.call_count > call_count
+
+
+def test_crl_store():
+    def _read_crl(path):
+        return pem.unarmor(read_all(TESTING_CA_DIR + path))[2]
+
+    interm_crl = _read_crl('/intermediate/crl/ca.crl.pem')
+    root_crl = _read_crl('/root/crl/ca.crl.pem')
+    store = CRLStore()
+    interm_crl_list = store.load(interm_crl)
+    assert store.load(bytes(interm_crl)) is interm_crl_list
+    assert store.size == len(interm_crl)
+
+    # the store only has room for one of these
+    store = CRLStore(max_size=len(interm_crl))
+    store.load(interm_crl)
+    root_crl_list = store.load(root_crl)
+    assert store.size == len(root_crl)
+    assert store.load(root_crl) is root_crl_list
+    assert store.load(interm_crl) is not interm_crl_list
+
+
 def test_cert_constraint_composite(requests_mock):
     vc = live_testing_vc(requests_mock)
     signer_validation_path = CertificateValidator(
@@ -1,6 +1,7 @@
 import pytest
 
 from pyhanko.pdf_utils import text
+from pyhanko.pdf_utils.font import SimpleFontEngine
 from pyhanko.pdf_utils.misc import BoxConstraints
 
 
@@ -18,3 +19,57 @@ def test_simple_textbox_render(with_border, natural_size):
     if not natural_size:
         assert abs(x1 - x2) == 1600
         assert abs(y1 - y2) == 900
+
+
+LOREM = (
+    'Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do '
+    'eiusmod tempor incididunt ut labore et dolore magna aliqua.'
+)
+
+
+def test_break_lines():
+    engine = text.TextLayoutEngine()
+    font = SimpleFontEngine('Courier', 0.5)
+    lines = engine.break_lines(font, LOREM, 20)
+    # each line should be filled as much as possible
+    for (line, width), (next_line, _) in zip(lines, lines[1:]):
+        assert width == len(line) * 0.5 <= 20
+        assert len(line) + 1 + len(next_line.split(' ')[0]) > 40
+    assert ' '.join(line for line, _ in lines) == LOREM
+    # the result should be cached
+    assert engine.break_lines(font, LOREM, 20) is lines
+
+    # overlong words are broken up
+    assert engine.break_lines(font, 'a ' + 'b' * 9, 2) \
+        == (('a', 0.5), ('bbbb', 2), ('bbbb', 2), ('b', 0.5))
+
+
+@pytest.mark.parametrize('alignment', list(text.TextAlignment))
+def test_textbox_word_wrap(alignment):
+    tbs = text.TextBoxStyle(word_wrap=True, alignment=alignment)
+    textbox = text.TextBox(
+        style=tbs, box=BoxConstraints(width=200),
+        layout_engine=text.TextLayoutEngine()
+    )
+    textbox.content = LOREM + '\nLast line'
+    assert len(textbox.content_lines) > 2
+    assert textbox.content_lines[-1] == 'Last line'
+    assert all(w <= 180 for w in textbox._line_widths)
+    assert textbox.box.height == textbox.get_text_height() + 20
+    rendered = textbox.render()
+    for line in textbox.content_lines:
+        assert f'({line})'.encode('latin-1') in rendered
+
+
+def test_textbox_shrink_to_fit():
+    tbs = text.TextBoxStyle(word_wrap=True, shrink_to_fit=True)
+    box = BoxConstraints(width=200, height=50)
+    textbox = text.TextBox(style=tbs, box=box)
+    textbox.content = LOREM
+    sf = textbox._scaling_factor
+    assert sf is not None and sf < 1
+    text_height = textbox.get_text_height() + 20
+    assert text_height * sf <= 50
+    # the box doesn't change size
+    assert (box.width, box.height) == (200, 50)
+    assert all(w * sf <= 180 for w in textbox._line_widths)
@@ -10,10 +10,15 @@ import pyhanko.pdf_utils.content
 from pyhanko.pdf_utils.generic import Reference
 from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
 from pyhanko.pdf_utils.misc import BoxConstraints, BoxSpecificationError
-from pyhanko.pdf_utils.reader import PdfFileReader
-from pyhanko.pdf_utils import writer, generic, misc
-from fontTools import ttLib
-from pyhanko.pdf_utils.font import GlyphAccumulator, pdf_name
+from pyhanko.pdf_utils.reader import PdfFileReader, PdfReaderSnapshot
+from pyhanko.pdf_utils import writer, generic, misc, filters
+from pyhanko.pdf_utils.filters import FlateDecode
+from fontTools import ttLib, cffLib
+from pyhanko.pdf_utils.font import (
+    GlyphAccumulator, pdf_name, FontSubsetCache, FontSubset, FontRegistry,
+    GlyphAccumulatorFactory,
+)
+from pyhanko.pdf_utils.text import TextBox, TextBoxStyle
 
 from .samples import *
 
@@ -56,6 +61,159 @@ def test_embed_subset():
     assert len(font_file.data) == 1919
 
 
+def test_embed_subset_cached():
+    cache = FontSubsetCache()
+    ffile = ttLib.TTFont(NOTO_SERIF_JP)
+    glyph_count = len(ffile.getGlyphOrder())
+    ga = GlyphAccumulator(ffile, subset_cache=cache)
+    ga.feed_string('テスト版')
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    font_ref = ga.embed_subset(w)
+    # the font passed in should not have been subsetted
+    assert len(ffile.getGlyphOrder()) == glyph_count
+    key = ga.subset_key()
+    assert cache.get(key) is not None
+
+    # a different accumulator with the same glyphs should hit the cache
+    ga2 = GlyphAccumulator(ttLib.TTFont(NOTO_SERIF_JP), subset_cache=cache)
+    ga2.feed_string('版テスト')
+    assert ga2.subset_key() == key
+    assert ga2.extract_subset() is cache.get(key)
+
+    # embedding in another writer should produce new objects
+    w2 = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    font_ref2 = ga.embed_subset(w2)
+    assert font_ref2.get_pdf_handler() is w2
+    df1 = font_ref.get_object()['/DescendantFonts'][0].get_object()
+    df2 = font_ref2.get_object()['/DescendantFonts'][0].get_object()
+    assert df1['/W'] == df2['/W']
+    assert df1['/FontDescriptor']['/FontFile3'].data \
+        == df2['/FontDescriptor']['/FontFile3'].data
+
+
+def test_font_registry():
+    registry = FontRegistry()
+    font = registry.get_font(NOTO_SERIF_JP)
+    assert registry.get_font(NOTO_SERIF_JP) is font
+
+    factory = GlyphAccumulatorFactory(NOTO_SERIF_JP, registry=registry)
+    assert factory.font is font
+    ga1 = factory.create_font_engine()
+    ga2 = factory.create_font_engine()
+    assert ga1 is not ga2 and ga1.font is ga2.font
+    assert ga1.feed_string('テスト') == ga2.feed_string('テスト')
+    assert ga1.feed_string('版')[0] == '66eb'
+    # the glyphs used are tracked separately
+    assert len(ga1._glyphs) == 4 and len(ga2._glyphs) == 3
+
+    # text boxes sharing a style should get separate accumulators
+    style = TextBoxStyle(font=factory)
+    tb1 = TextBox(style)
+    tb2 = TextBox(style)
+    assert tb1.font_engine is not tb2.font_engine
+
+
+def _name_keyed_font():
+    from fontTools.fontBuilder import FontBuilder
+    from fontTools.pens.t2CharStringPen import T2CharStringPen
+
+    glyph_names = ['.notdef', 'A', 'B', 'C']
+    widths = {'.notdef': 500, 'A': 600, 'B': 700, 'C': 800}
+    charstrings = {}
+    for name in glyph_names:
+        pen = T2CharStringPen(widths[name], None)
+        pen.moveTo((0, 0))
+        pen.lineTo((400, 0))
+        pen.lineTo((400, 400))
+        pen.closePath()
+        charstrings[name] = pen.getCharString()
+    fb = FontBuilder(1000, isTTF=False)
+    fb.setupGlyphOrder(glyph_names)
+    fb.setupCharacterMap({ord(x): x for x in 'ABC'})
+    fb.setupCFF('NameKeyed', {'FullName': 'Name Keyed'}, charstrings, {})
+    fb.setupHorizontalMetrics({k: (w, 0) for k, w in widths.items()})
+    fb.setupHorizontalHeader(ascent=800, descent=-200)
+    fb.setupNameTable({'familyName': 'NameKeyed', 'styleName': 'Regular'})
+    fb.setupOS2(sCapHeight=700)
+    fb.setupPost()
+    out = BytesIO()
+    fb.save(out)
+    out.seek(0)
+    return ttLib.TTFont(out)
+
+
+def test_name_keyed_font():
+    ga = GlyphAccumulator(_name_keyed_font(), subset_cache=FontSubsetCache())
+    assert not ga.font.cid_keyed
+    # CIDs are GIDs for name-keyed fonts
+    assert ga.feed_string('CAB') == ('000300010002', 2.1)
+    # unknown characters are rendered as .notdef
+    assert ga.feed_string('AZ') == ('00010000', 1.1)
+    assert ga.font.measure('CC') == 1600
+
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    df = ga.embed_subset(w).get_object()['/DescendantFonts'][0].get_object()
+    assert df['/W'] == [0, [500, 600, 700, 800]]
+
+    ga = GlyphAccumulator(ga.font, subset_cache=FontSubsetCache())
+    assert ga.feed_string('C')[0] == '0003'
+    df = ga.embed_subset(w).get_object()['/DescendantFonts'][0].get_object()
+    assert df['/W'] == [3, [800]]
+    cff = cffLib.CFFFontSet()
+    cff.decompile(BytesIO(df['/FontDescriptor']['/FontFile3'].data), None)
+    # glyph IDs must be retained when subsetting
+    assert cff[0].charset.index('C') == 3
+
+
+def test_font_subset_cache_persistence(tmp_path):
+    font_subset = FontSubset(
+        key='abcdef', ps_name='Dummy', ros=('Adobe', 'Identity', 0),
+        font_program=b'\x01\x00\x04\x02', metrics={
+            'ascent': 800, 'descent': -200, 'bbox': [0, -200, 1000, 800],
+            'stemv': 80, 'italic_angle': 0.0, 'cap_height': 700
+        }, widths=[1, [500, 600], 10, [1000]], to_unicode=b'dummy'
+    )
+    cache_dir = str(tmp_path / 'subsets')
+    FontSubsetCache(cache_dir).put(font_subset)
+    cache = FontSubsetCache(cache_dir)
+    assert cache.get('abcdef') == font_subset
+    assert cache.get('012345') is None
+
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    type0 = font_subset.embed(w).get_object()
+    assert type0['/BaseFont'] == '/Dummy-Identity-H'
+    df = type0['/DescendantFonts'][0].get_object()
+    assert df['/W'] == [1, [500, 600], 10, [1000]]
+    assert df['/FontDescriptor']['/FontFile3'].data == b'\x01\x00\x04\x02'
+
+
+def test_font_subset_cache_eviction(tmp_path):
+    def _subset(key):
+        return FontSubset(
+            key=key, ps_name='Dummy', ros=('Adobe', 'Identity', 0),
+            font_program=b'\x01\x00\x04\x02', metrics={}, widths=[],
+            to_unicode=b'dummy'
+        )
+
+    cache = FontSubsetCache(max_entries=2)
+    subsets = [_subset(key) for key in ('a', 'b', 'c')]
+    cache.put(subsets[0])
+    cache.put(subsets[1])
+    # make 'a' the most recently used entry
+    assert cache.get('a') is subsets[0]
+    cache.put(subsets[2])
+    assert cache.get('b') is None
+    assert cache.get('a') is subsets[0]
+    assert cache.get('c') is subsets[2]
+
+    # evicted entries can still be read back from disk
+    cache = FontSubsetCache(str(tmp_path / 'subsets'), max_entries=1)
+    cache.put(subsets[0])
+    cache.put(subsets[1])
+    assert list(cache._entries) == ['b']
+    assert cache.get('a') == subsets[0]
+
+
 def test_add_stream():
     w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
 
@@ -103,6 +261,38 @@ def test_add_stream():
     assert stream_ref.idnum in ids and new_stream_ref.idnum in ids
 
 
+def test_snapshot_sessions():
+    snapshot = PdfReaderSnapshot(MINIMAL)
+
+    def _add_stream(y):
+        w = IncrementalPdfFileWriter.from_snapshot(snapshot)
+        stream = generic.StreamObject(
+            stream_data=f'BT /F1 18 Tf 0 {y} Td (Test) Tj ET'.encode('ascii')
+        )
+        w.add_stream_to_page(0, w.add_object(stream))
+        w.trailer['/Info'] = w.add_object(generic.DictionaryObject())
+        out = BytesIO()
+        w.write(out)
+        out.seek(0)
+        return PdfFileReader(out)
+
+    r1 = _add_stream(50)
+    r2 = _add_stream(100)
+    for r in (r1, r2):
+        page_obj = r.root['/Pages']['/Kids'][0].get_object()
+        assert len(page_obj['/Contents']) == 2
+        assert '/Info' in r.trailer
+    data1 = r1.root['/Pages']['/Kids'][0].get_object()['/Contents'][1].get_object().data
+    data2 = r2.root['/Pages']['/Kids'][0].get_object()['/Contents'][1].get_object().data
+    assert data1 != data2
+
+    # the snapshot itself should not have been affected
+    r = snapshot.new_reader()
+    page_obj = r.root['/Pages']['/Kids'][0].get_object()
+    assert isinstance(page_obj['/Contents'], generic.StreamObject)
+    assert '/Info' not in r.trailer
+
+
 def test_add_stream_to_direct_arr():
     w = writer.PdfFileWriter()
     w.insert_page(simple_page(w, 'Test Test', extra_stream=True))
@@ -214,6 +404,238 @@ def test_write_embedded_string_objstream():
     assert font['/Type'] == pdf_name('/Font')
 
 
+@pytest.mark.parametrize('chunk_size', [1, 2, 100])
+def test_auto_object_streams(chunk_size):
+    w = IncrementalPdfFileWriter(
+        BytesIO(MINIMAL_XREF), auto_object_streams=True
+    )
+    w.object_stream_chunk_size = chunk_size
+    dict_refs = [
+        w.add_object(generic.DictionaryObject({
+            pdf_name('/Foo'): generic.NumberObject(i)
+        })) for i in range(5)
+    ]
+    stream = generic.StreamObject(
+        stream_data=b'BT /F1 18 Tf 0 50 Td (Test) Tj ET'
+    )
+    stream_ref = w.add_object(stream)
+    w.add_stream_to_page(0, stream_ref)
+    out = BytesIO()
+    w.write(out)
+    out.seek(0)
+
+    r = PdfFileReader(out)
+    for i, ref in enumerate(dict_refs):
+        assert ref.idnum in r.xrefs.in_obj_stream
+        assert r.get_object(ref)['/Foo'] == i
+    # the page object was updated, so it should be in an object stream too
+    page_ref = r.root['/Pages'].raw_get('/Kids')[0]
+    assert page_ref.idnum in r.xrefs.in_obj_stream
+    # streams can't be embedded in object streams
+    assert stream_ref.idnum not in r.xrefs.in_obj_stream
+    conts = page_ref.get_object()['/Contents']
+    assert len(conts) == 2
+    assert conts[1].get_object().data == stream.data
+    assert w.object_streams
+    assert all(
+        len(obj_stream._obj_refs) <= chunk_size
+        for obj_stream in w.object_streams
+    )
+
+
+def test_xref_stream_widths():
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL_XREF))
+    w.add_object(generic.NullObject())
+    out = BytesIO()
+    w.write(out)
+    out.seek(0)
+    r = PdfFileReader(out)
+    xref_stream = r.get_object(
+        generic.Reference(r.trailer['/Size'] - 1, 0)
+    )
+    assert xref_stream['/Type'] == pdf_name('/XRef')
+    # offsets fit into 2 bytes, and the generation number column needs
+    # 2 bytes for the null object
+    assert xref_stream['/W'] == [1, 2, 2]
+    assert xref_stream['/DecodeParms']['/Predictor'] == 12
+    assert xref_stream['/DecodeParms']['/Columns'] == 5
+    assert len(xref_stream.data) % 5 == 0
+    # the first subsection starts with the null object
+    assert xref_stream['/Index'][0] == 0
+    assert xref_stream.data[:5] == b'\x00\x00\x00\xff\xff'
+
+
+@pytest.mark.parametrize('predictor', [10, 11, 12])
+def test_png_predictor_round_trip(predictor):
+    data = bytes(range(256)) * 3 + bytes(reversed(range(256)))
+    params = generic.DictionaryObject({
+        pdf_name('/Predictor'): generic.NumberObject(predictor),
+        pdf_name('/Columns'): generic.NumberObject(8)
+    })
+    encoded = FlateDecode.encode(data, params)
+    assert FlateDecode.decode(encoded, params) == data
+
+
+@pytest.mark.parametrize('predictor', [10, 11, 12])
+@pytest.mark.parametrize('colors,bpc', [(3, 8), (1, 16)])
+def test_png_predictor_round_trip_multibyte(predictor, colors, bpc):
+    # rows of 8 pixels of 3 bytes / 2 bytes each
+    data = bytes(range(240)) * 4
+    params = generic.DictionaryObject({
+        pdf_name('/Predictor'): generic.NumberObject(predictor),
+        pdf_name('/Columns'): generic.NumberObject(8),
+        pdf_name('/Colors'): generic.NumberObject(colors),
+        pdf_name('/BitsPerComponent'): generic.NumberObject(bpc),
+    })
+    encoded = FlateDecode.encode(data, params)
+    assert FlateDecode.decode(encoded, params) == data
+
+
+def test_flate_compress_chunked():
+    data = b''.join(b'%d ' % i for i in range(500000))
+    chunked = filters.flate_compress(data, chunk_map=map, chunk_size=100000)
+    assert filters.FlateDecode.decode(chunked, None) == data
+    # compressing in chunks shouldn't cost too much in terms of size
+    assert len(chunked) < 1.05 * len(filters.flate_compress(data))
+
+
+def _write_with_streams(w, payloads, level=None):
+    refs = []
+    for payload in payloads:
+        stream = generic.StreamObject(stream_data=payload)
+        stream.compress()
+        if level is not None:
+            stream.compression_level = level
+        refs.append(w.add_object(stream))
+    out = BytesIO()
+    w.write(out)
+    out.seek(0)
+    return PdfFileReader(out), refs
+
+
+@pytest.mark.parametrize('workers', [1, None])
+def test_parallel_stream_compression(workers):
+    payloads = [
+        b''.join(b'%d ' % (i * j) for i in range(100000))
+        for j in range(1, 6)
+    ]
+    # this one is big enough to be compressed in chunks
+    payloads.append(b''.join(b'%d ' % i for i in range(300000)))
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    w.compression_workers = workers
+    w.parallel_compression_threshold = 0
+    r, refs = _write_with_streams(w, payloads)
+    for ref, payload in zip(refs, payloads):
+        assert r.get_object(ref).data == payload
+
+
+def test_stream_compression_level():
+    payload = b''.join(b'%d ' % i for i in range(10000))
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    w.compression_level = 0
+    r, (ref,) = _write_with_streams(w, [payload])
+    stored = r.get_object(ref)
+    assert stored.data == payload
+    assert len(stored.encoded_data) > len(payload)
+
+    # per-stream settings take precedence
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    w.compression_level = 0
+    r, (ref,) = _write_with_streams(w, [payload], level=9)
+    stored = r.get_object(ref)
+    assert stored.data == payload
+    assert len(stored.encoded_data) < len(payload) // 2
+
+
+def test_deduplicate_objects():
+    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+    w.deduplicate_objects = True
+
+    def _font():
+        font_file = generic.StreamObject(
+            {pdf_name('/Subtype'): pdf_name('/Type1C')},
+            stream_data=b'dummy font data'
+        )
+        return w.add_object(generic.DictionaryObject({
+            pdf_name('/Type'): pdf_name('/Font'),
+            pdf_name('/FontFile'): w.add_object(font_file)
+        }))
+
+    font1, font2 = _font(), _font()
+    # untyped dictionaries are left alone
+    untyped1 = w.add_object(generic.DictionaryObject())
+    untyped2 = w.add_object(generic.DictionaryObject())
+    # ... and so are arrays
+    array1 = w.add_object(generic.ArrayObject())
+    array2 = w.add_object(generic.ArrayObject())
+    # objects that are modified after being added shouldn't be merged
+    modified = generic.StreamObject(
+        {pdf_name('/Subtype'): pdf_name('/Type1C')},
+        stream_data=b'dummy font data'
+    )
+    modified_ref = w.add_object(modified)
+    modified._data = b'other data'
+    # untyped streams (e.g. content streams) are left alone
+    content1 = w.add_object(generic.StreamObject(stream_data=b'q Q'))
+    content2 = w.add_object(generic.StreamObject(stream_data=b'q Q'))
+
+    # ... as are annotation appearance streams
+    def _annot():
+        ap_stream = writer.init_xobject_dictionary(
+            b'q Q', 10, 10
+        )
+        return w.add_object(generic.DictionaryObject({
+            pdf_name('/Type'): pdf_name('/Annot'),
+            pdf_name('/Subtype'): pdf_name('/Square'),
+            pdf_name('/AP'): generic.DictionaryObject({
+                pdf_name('/N'): w.add_object(ap_stream)
+            })
+        }))
+
+    annot1, annot2 = _annot(), _annot()
+
+    stream = generic.StreamObject(
+        stream_data=b'BT /FDup1 18 Tf 0 50 Td (Test) Tj /FDup2 Tf (Test) Tj ET'
+    )
+    resources = generic.DictionaryObject({
+        pdf_name('/Font'): generic.DictionaryObject({
+            pdf_name('/FDup1'): font1, pdf_name('/FDup2'): font2,
+        }),
+        pdf_name('/Foo'): generic.ArrayObject(
+            [untyped1, untyped2, modified_ref, array1, array2,
+             content1, content2, annot1, annot2]
+        )
+    })
+    w.add_stream_to_page(0, w.add_object(stream), resources=resources)
+    # references to duplicates are still valid in the writer
+    assert font2.get_object()['/Type'] == '/Font'
+    out = BytesIO()
+    w.write(out)
+    assert font2.get_object()['/Type'] == '/Font'
+    out.seek(0)
+
+    r = PdfFileReader(out)
+    page_obj = r.root['/Pages']['/Kids'][0].get_object()
+    res = page_obj['/Resources']
+    fonts = res['/Font']
+    f1_ref = fonts.raw_get('/FDup1')
+    assert f1_ref.idnum == font1.idnum
+    assert fonts.raw_get('/FDup2').idnum == font1.idnum
+    new_refs = r.xrefs.explicit_refs_in_revision(1)
+    assert font2.idnum not in {ref.idnum for ref in new_refs}
+    assert f1_ref.get_object()['/FontFile'].data == b'dummy font data'
+    foo = res['/Foo']
+    assert [ref.idnum for ref in foo] == [
+        untyped1.idnum, untyped2.idnum, modified_ref.idnum,
+        array1.idnum, array2.idnum, content1.idnum, content2.idnum,
+        annot1.idnum, annot2.idnum
+    ]
+    assert foo[2].get_object().data == b'other data'
+    ap1 = foo[7].get_object()['/AP'].raw_get('/N')
+    ap2 = foo[8].get_object()['/AP'].raw_get('/N')
+    assert ap1.idnum != ap2.idnum
+
+
 TEST_STRING = b'\x74\x77\x74\x84\x66'
 
 
@@ -292,6 +714,176 @@ def test_page_import_with_fonts(inherit_filters):
     assert len(font_file.data) == 1424
 
 
+def test_page_import_memo():
+    image_input = PdfFileReader(BytesIO(FILE_WITH_EMBEDDED_FONT))
+    w = writer.PdfFileWriter()
+    xobj1 = w.import_page_as_xobject(image_input).get_object()
+    obj_count = len(w.objects)
+    xobj2 = w.import_page_as_xobject(image_input).get_object()
+    # only the new XObject itself should have been added
+    assert len(w.objects) == obj_count + 1
+    font1 = xobj1['/Resources']['/Font'].raw_get('/FEmb')
+    font2 = xobj2['/Resources']['/Font'].raw_get('/FEmb')
+    assert font1.idnum == font2.idnum
+
+    w.reset_import_memo()
+    xobj3 = w.import_page_as_xobject(image_input).get_object()
+    font3 = xobj3['/Resources']['/Font'].raw_get('/FEmb')
+    assert font3.idnum != font1.idnum
+
+
+def test_import_cycle():
+    r = PdfFileReader(BytesIO(MINIMAL))
+    w = writer.PdfFileWriter()
+    page_ref = r.root['/Pages'].raw_get('/Kids')[0]
+    # pages refer to their parent, and vice versa
+    new_page_ref = w.import_object(page_ref)
+    new_page = new_page_ref.get_object()
+    assert new_page['/Type'] == '/Page'
+    new_parent = new_page['/Parent']
+    assert new_parent['/Type'] == '/Pages'
+    assert new_parent['/Kids'][0].idnum == new_page_ref.idnum
+    assert new_parent['/Kids'][0].get_object() is new_page
+
+
+def _nested_page_tree_writer():
+    w = writer.PdfFileWriter()
+    root_ref = w.root.raw_get('/Pages')
+    root = root_ref.get_object()
+    subtree = generic.DictionaryObject({
+        pdf_name('/Type'): pdf_name('/Pages'),
+        pdf_name('/Parent'): root_ref,
+        pdf_name('/Kids'): generic.ArrayObject(),
+        pdf_name('/Count'): generic.NumberObject(0),
+        pdf_name('/MediaBox'): generic.ArrayObject(
+            map(generic.NumberObject, (0, 0, 100, 100))
+        ),
+    })
+    subtree_ref = w.add_object(subtree)
+    page_refs = []
+    for ix in range(3):
+        page = generic.DictionaryObject({
+            pdf_name('/Type'): pdf_name('/Page'),
+            pdf_name('/Parent'): subtree_ref,
+        })
+        if ix == 1:
+            page['/Resources'] = generic.DictionaryObject()
+        page_refs.append(w.add_object(page))
+    subtree['/Kids'].extend(page_refs)
+    subtree['/Count'] = generic.NumberObject(3)
+    root['/Kids'].append(subtree_ref)
+    root['/Count'] = generic.NumberObject(3)
+    return w, subtree_ref, page_refs
+
+
+def test_page_index_nested():
+    w, subtree_ref, page_refs = _nested_page_tree_writer()
+    for ix, page_ref in enumerate(page_refs):
+        info = w.find_page_info(ix)
+        assert info.page_ref.idnum == page_ref.idnum
+        assert info.parent_ref.idnum == subtree_ref.idnum
+        assert info.kid_index == ix
+        assert info.media_box == [0, 0, 100, 100]
+    assert w.find_page_info(1).resources == {}
+    with pytest.raises(ValueError):
+        w.find_page_info(3)
+
+    # modifications to the page itself should be picked up
+    page_refs[0].get_object()['/Resources'] = generic.DictionaryObject(
+        {pdf_name('/Font'): generic.DictionaryObject()}
+    )
+    _, resources = w.find_page_for_modification(0)
+    assert '/Font' in resources
+
+
+def test_page_index_one_off_lookup():
+    w, subtree_ref, page_refs = _nested_page_tree_writer()
+    info = w.find_page_info(2)
+    # the first lookup shouldn't index the page tree
+    assert w._page_index is None
+    assert info.page_ref.idnum == page_refs[2].idnum
+    assert info.kid_index == 2
+    assert info.media_box == [0, 0, 100, 100]
+    assert w.find_page_info(2) == info
+    assert w._page_index is not None
+
+
+def test_page_index_insert():
+    w, subtree_ref, page_refs = _nested_page_tree_writer()
+    # make sure the index is populated
+    w.find_page_info(0)
+    w.find_page_info(2)
+    new_page_ref = w.insert_page(
+        generic.DictionaryObject({pdf_name('/Type'): pdf_name('/Page')}),
+        after=0
+    )
+    assert w._page_index.complete
+    assert w.find_page_info(1).page_ref.idnum == new_page_ref.idnum
+    for ix, page_ref in zip((0, 2, 3), page_refs):
+        info = w.find_page_info(ix)
+        assert info.page_ref.idnum == page_ref.idnum
+        parent_ref, kid_ix, _ = w.find_page_container(ix)
+        assert subtree_ref.get_object()['/Kids'][kid_ix].idnum \
+            == page_ref.idnum
+
+    # the result should be consistent with a freshly built index
+    expected = [w.find_page_info(ix) for ix in range(4)]
+    w.invalidate_page_index()
+    assert [w.find_page_info(ix) for ix in range(4)] == expected
+
+
+def test_page_index_insert_mixed_kids():
+    # page tree root with Kids=[p0, Pages[p1], p2]
+    w = writer.PdfFileWriter()
+    root_ref = w.root.raw_get('/Pages')
+    root = root_ref.get_object()
+
+    def _page(parent_ref):
+        return w.add_object(generic.DictionaryObject({
+            pdf_name('/Type'): pdf_name('/Page'),
+            pdf_name('/Parent'): parent_ref,
+        }))
+
+    subtree = generic.DictionaryObject({
+        pdf_name('/Type'): pdf_name('/Pages'),
+        pdf_name('/Parent'): root_ref,
+        pdf_name('/Kids'): generic.ArrayObject(),
+        pdf_name('/Count'): generic.NumberObject(1),
+    })
+    subtree_ref = w.add_object(subtree)
+    subtree['/Kids'].append(_page(subtree_ref))
+    root['/Kids'].extend([_page(root_ref), subtree_ref, _page(root_ref)])
+    root['/Count'] = generic.NumberObject(3)
+
+    def _new_page():
+        return generic.DictionaryObject({pdf_name('/Type'): pdf_name('/Page')})
+
+    # populate the index
+    w.find_page_info(0)
+    w.find_page_info(2)
+    w.insert_page(_new_page(), after=0)
+    w.insert_page(_new_page(), after=3)
+    assert w._page_index is not None
+    for ix in range(5):
+        parent_ref, kid_ix, _ = w.find_page_container(ix)
+        info = w.find_page_info(ix)
+        assert parent_ref.get_object()['/Kids'][kid_ix].idnum \
+            == info.page_ref.idnum
+
+    expected = [w.find_page_info(ix) for ix in range(5)]
+    w.invalidate_page_index()
+    assert [w.find_page_info(ix) for ix in range(5)] == expected
+
+
+def test_pickle_reader_after_page_lookup():
+    import pickle
+    r = PdfFileReader(BytesIO(MINIMAL))
+    info = r.find_page_info(0)
+    r.find_page_info(0)
+    r2 = pickle.loads(pickle.dumps(r))
+    assert r2.find_page_info(0).page_ref.idnum == info.page_ref.idnum
+
+
 def test_deep_modify():
     w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
     obj3 = generic.Reference(3, 0, w)